@@ -1,13 +1,22 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
-import joblib
+import sys
+import copy
 import numpy as np
 import pandas as pd
 from pathlib import Path
 from functools import lru_cache
 import os
 
+# Add parent directory to path so pickled preprocessing objects can be loaded
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing.encode_categorical import (load_categorical_encoder, SparseOneHotEncoder, TargetEncoder,
+                                              UnknownCategoryError)
+from preprocessing.feature_expressions import feature_set_from_columns, load_feature_set
+from models.artifact_store import artifact_exists, load_artifact, load_artifact_path
+
 app = FastAPI(
     title="IPO Price Prediction API",
     description="API for predicting IPO offer prices and first day closing prices using ensemble models",
@@ -21,53 +30,86 @@ MODEL_DIR = Path(os.path.dirname(os.path.abspath(__file__))).parent / "models" /
 @lru_cache(maxsize=2)
 def load_model(target: str):
     try:
-        model_path = MODEL_DIR / f"ensemble_{target}.joblib"
-        if not model_path.exists():
-            raise FileNotFoundError(f"Model file not found: {model_path}")
-        return joblib.load(model_path)
+        return load_artifact(MODEL_DIR, f"ensemble_{target}.joblib")
     except Exception as e:
         raise RuntimeError(f"Failed to load model for {target}: {str(e)}")
 
 @lru_cache(maxsize=2)
 def load_imputer(target: str):
     try:
-        imputer_path = MODEL_DIR / f"imputer_{target}.joblib"
-        if not imputer_path.exists():
-            raise FileNotFoundError(f"Imputer file not found: {imputer_path}")
-        return joblib.load(imputer_path)
+        return load_artifact(MODEL_DIR, f"imputer_{target}.joblib")
     except Exception as e:
         raise RuntimeError(f"Failed to load imputer for {target}: {str(e)}")
 
 @lru_cache(maxsize=2)
 def load_scaler(target: str):
     try:
-        scaler_path = MODEL_DIR / f"scaler_{target}.joblib"
-        if not scaler_path.exists():
-            raise FileNotFoundError(f"Scaler file not found: {scaler_path}")
-        return joblib.load(scaler_path)
+        return load_artifact(MODEL_DIR, f"scaler_{target}.joblib")
     except Exception as e:
         raise RuntimeError(f"Failed to load scaler for {target}: {str(e)}")
 
 @lru_cache(maxsize=2)
 def load_feature_selector(target: str):
     try:
-        selector_path = MODEL_DIR / f"feature_selector_{target}.joblib"
-        if not selector_path.exists():
-            raise FileNotFoundError(f"Feature selector file not found: {selector_path}")
-        return joblib.load(selector_path)
+        return load_artifact(MODEL_DIR, f"feature_selector_{target}.joblib")
     except Exception as e:
         raise RuntimeError(f"Failed to load feature selector for {target}: {str(e)}")
 
 @lru_cache(maxsize=2)
 def load_poly(target: str):
     try:
-        poly_path = MODEL_DIR / f"poly_{target}.joblib"
-        if not poly_path.exists():
-            raise FileNotFoundError(f"Polynomial transformer file not found: {poly_path}")
-        return joblib.load(poly_path)
+        return load_artifact(MODEL_DIR, f"poly_{target}.joblib")
     except Exception as e:
         raise RuntimeError(f"Failed to load polynomial transformer for {target}: {str(e)}")
 
+@lru_cache(maxsize=1)
+def load_multi_output_bundle():
+    """Load the joint offerPrice/closeDay1 model bundle, or None if it was not trained."""
+    if not artifact_exists(MODEL_DIR, "multi_output_model.joblib"):
+        return None
+    try:
+        return load_artifact(MODEL_DIR, "multi_output_model.joblib")
+    except Exception as e:
+        raise RuntimeError(f"Failed to load multi-output model: {str(e)}")
+
+@lru_cache(maxsize=1)
+def load_encoder():
+    """
+    Load the categorical encoder saved at training time (default schema for older artifacts)
+    
+    Requests are validated strictly: a category outside the training schema raises
+    UnknownCategoryError (answered with 422) instead of being imputed silently.
+    """
+    encoder = copy.copy(load_categorical_encoder(str(MODEL_DIR / "categorical_encoder.joblib"), load_artifact_path))
+    encoder.handle_unknown = 'error'
+    return encoder
+
+@lru_cache(maxsize=2)
+def load_category_encoder(target: str):
+    """Load the one-hot or target encoder of a target, or None if it was trained with ordinal codes."""
+    if not artifact_exists(MODEL_DIR, f"category_encoder_{target}.joblib"):
+        return None
+    try:
+        return load_artifact(MODEL_DIR, f"category_encoder_{target}.joblib")
+    except Exception as e:
+        raise RuntimeError(f"Failed to load category encoder for {target}: {str(e)}")
+
+@lru_cache(maxsize=2)
+def load_missing_indicators(target: str):
+    """Load the missing-value indicators of a target, or None if it was trained without them."""
+    if not artifact_exists(MODEL_DIR, f"missing_indicators_{target}.joblib"):
+        return None
+    try:
+        return load_artifact(MODEL_DIR, f"missing_indicators_{target}.joblib")
+    except Exception as e:
+        raise RuntimeError(f"Failed to load missing-value indicators for {target}: {str(e)}")
+
+@lru_cache(maxsize=2)
+def load_features(target: str):
+    """Load the feature definitions saved at training time (rebuilt from the imputer for older artifacts)."""
+    return load_feature_set(str(MODEL_DIR / f"feature_set_{target}.joblib"),
+                            list(load_imputer(target).feature_names_in_), load_artifact_path)
+
 # --- Input/Output Schemas ---
 class IPOInput(BaseModel):
     age: Optional[float] = 0
@@ -117,61 +159,19 @@ class CombinedPredictionOutput(BaseModel):
     feature_importances: Dict[str, float]
 
 # --- Preprocessing ---
-def preprocess_input(df: pd.DataFrame, target: str = 'offerPrice') -> pd.DataFrame:
-    exchange_map = {'AMEX': 0, 'NASDQ': 1, 'NYSE': 2}
-    industry_map = {
-        'Business Equipment -- Computers, Software, and Electronic Equipment': 0,
-        'Chemicals and Allied Products': 1,
-        "Consumer Durables -- Cars, TV's, Furniture, Household Appliances": 2,
-        'Consumer NonDurables -- Food, Tobacco, Textiles, Apparel, Leather, Toys': 3,
-        'Finance': 4,
-        'Healthcare, Medical Equipment, and Drugs': 5,
-        'Manufacturing -- Machinery, Trucks, Planes, Off Furn, Paper, Com Printing': 6,
-        'Oil, Gas, and Coal Extraction and Products': 7,
-        'Other': 8,
-        'Telephone and Television Transmission': 9,
-        'Utilities': 10,
-        'Wholesale, Retail, and Some Services (Laundries, Repair Shops)': 11
-    }
-    df = df.copy()
-    
-    # Encode categorical features
-    df['exchange'] = df['exchange'].map(exchange_map)
-    df['industryFF12'] = df['industryFF12'].map(industry_map)
-    
-    # Create derived features
-    df['ipoSize_normalized'] = np.log(df['ipoSize'] + 1)
-    df = df.drop(columns=['ipoSize'])
-    
-    # Engineered features
-    df['revenue_per_asset'] = df['totalRevenue'] / (df['totalAssets'] + 1e-6)
-    df['income_per_revenue'] = df['netIncome'] / (df['totalRevenue'] + 1e-6)
-    df['equity_per_asset'] = df['commonEquity'] / (df['totalAssets'] + 1e-6)
-    df['investment_per_share'] = df['investmentReceived'] / (df['sharesOfferedPerc'] + 1e-6)
-    df['vc_to_exec_ratio'] = df['nVCs'] / (df['nExecutives'] + 1e-6)
-    df['patent_to_revenue'] = df['nPatents'] / (df['totalRevenue'] + 1e-6)
-    
-    # Remove features not present during model training
-    for col in ['book_to_market', 'leverage_ratio', 'roa_ratio']:
-        if col in df.columns:
-            df = df.drop(columns=[col])
-    
-    # Ensure missing features are present
-    for col in ['age', 'egc', 'highTech', 'year']:
-        if col not in df.columns:
-            df[col] = 0
-    
-    # Note: Don't force match to imputer features here as it drops engineered features
-    # The models were trained with the full feature set including engineered features
-    
-    return df
+def preprocess_input(df: pd.DataFrame, target: str = 'offerPrice', offer_predictions=None) -> pd.DataFrame:
+    """Build the model features for raw input rows with the compiled training feature definitions"""
+    extra = {'predicted_offerPrice': offer_predictions} if offer_predictions is not None else None
+    return load_features(target).transform_frame(df, extra, encoder=load_encoder())
 
-def get_predictions(features_df: pd.DataFrame, target: str) -> tuple:
-    """Helper function to get predictions for a specific target"""
+def get_predictions(features_df: pd.DataFrame, target: str, raw_df: Optional[pd.DataFrame] = None) -> tuple:
+    """Helper function to get predictions for a specific target (raw_df holds the nominal columns for one-hot models)"""
     try:
         model = load_model(target)
         imputer = load_imputer(target)
         scaler = load_scaler(target)
+        category_encoder = load_category_encoder(target)
+        missing_indicators = load_missing_indicators(target)
         feature_selector = None
         try:
             feature_selector = load_feature_selector(target)
@@ -183,16 +183,29 @@ def get_predictions(features_df: pd.DataFrame, target: str) -> tuple:
         except Exception:
             poly = None
         
+        # Target-encode the nominal columns before imputation
+        if isinstance(category_encoder, TargetEncoder):
+            features_df = category_encoder.transform(features_df)
+        
+        # Record the missing values before imputation fills them
+        indicators = missing_indicators.transform(features_df) if missing_indicators is not None else None
+        
         # Impute missing values
         features = imputer.transform(features_df)
         
         # Apply feature selection if available
         if feature_selector is not None:
             features = feature_selector.transform(features)
-            
+        
         # Scale features
         features = scaler.transform(features)
         
+        # Append the missing-value indicators and the sparse one-hot block of the nominal columns
+        if indicators is not None:
+            features = missing_indicators.append_to(features, indicators)
+        if isinstance(category_encoder, SparseOneHotEncoder):
+            features = category_encoder.append_to(features, raw_df if raw_df is not None else features_df)
+        
         # Apply polynomial features if available and expected by the model
         if poly is not None:
             # Determine the model's expected input shape
@@ -241,6 +254,22 @@ def get_predictions(features_df: pd.DataFrame, target: str) -> tuple:
     except Exception as e:
         raise RuntimeError(f"Error in prediction pipeline for {target}: {str(e)}")
 
+def get_multi_output_predictions(df: pd.DataFrame, bundle: dict) -> tuple:
+    """Helper function to predict all targets of the joint model in one pass"""
+    feature_set = bundle.get('feature_set') or feature_set_from_columns(bundle['feature_names'])
+    features = feature_set.transform_frame(df, encoder=load_encoder())
+    features = bundle['imputer'].transform(features)
+    features = bundle['scaler'].transform(features)
+    predictions = np.asarray(bundle['model'].predict(features)).reshape(len(features), -1)
+    
+    feature_importances = {}
+    if hasattr(bundle['model'], 'feature_importances_'):
+        feature_importances = {
+            name: float(imp) for name, imp in zip(bundle['feature_names'], bundle['model'].feature_importances_)
+        }
+    
+    return {target: predictions[:, idx] for idx, target in enumerate(bundle['targets'])}, feature_importances
+
 # --- Endpoints ---
 @app.get("/")
 async def root():
@@ -259,14 +288,14 @@ async def health_check():
                 feature_selector = load_feature_selector(target)
             except Exception as e:
                 missing_components.append(f"{target}: {str(e)}")
-                
+            
             # Check optional components (poly is optional)
             try:
                 poly = load_poly(target)
             except Exception:
                 # Polynomial transformer is optional, don't fail health check
                 pass
-                
+        
         if missing_components:
             return {"status": "unhealthy", "errors": missing_components}
         return {"status": "healthy", "message": "All required model components loaded successfully"}
@@ -278,6 +307,7 @@ async def metadata():
     return {
         "expected_features": list(IPOInput.schema()['properties'].keys()),
         "model_type": "ensemble",
+        "multi_output_available": load_multi_output_bundle() is not None,
         "preprocessing": ["imputer", "scaler", "feature_selector", "poly", "feature engineering"],
         "batch_prediction": True,
         "available_endpoints": [
@@ -292,7 +322,7 @@ async def predict_offer_price(batch: BatchIPOInput):
     try:
         df = pd.DataFrame([sample.dict() for sample in batch.samples])
         features_df = preprocess_input(df)
-        predictions, confidence, feature_importances = get_predictions(features_df, 'offerPrice')
+        predictions, confidence, feature_importances = get_predictions(features_df, 'offerPrice', df)
         
         return [
             PredictionOutput(
@@ -301,6 +331,8 @@ async def predict_offer_price(batch: BatchIPOInput):
                 feature_importances=feature_importances
             ) for i, pred in enumerate(predictions)
         ]
+    except UnknownCategoryError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -308,8 +340,11 @@ async def predict_offer_price(batch: BatchIPOInput):
 async def predict_close_day1(batch: BatchIPOInput):
     try:
         df = pd.DataFrame([sample.dict() for sample in batch.samples])
-        features_df = preprocess_input(df)
-        predictions, confidence, feature_importances = get_predictions(features_df, 'closeDay1')
+        
+        # The closeDay1 models take the predicted offer price as a feature
+        offer_predictions, _, _ = get_predictions(preprocess_input(df), 'offerPrice', df)
+        features_df = preprocess_input(df, 'closeDay1', offer_predictions)
+        predictions, confidence, feature_importances = get_predictions(features_df, 'closeDay1', df)
         
         return [
             PredictionOutput(
@@ -318,33 +353,41 @@ async def predict_close_day1(batch: BatchIPOInput):
                 feature_importances=feature_importances
             ) for i, pred in enumerate(predictions)
         ]
+    except UnknownCategoryError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/predict/combined", response_model=List[CombinedPredictionOutput])
-async def predict_combined(batch: BatchIPOInput):
+async def predict_combined(batch: BatchIPOInput, use_multi_output: bool = False):
+    """Predict both targets with the ensembles, or with the joint model if ?use_multi_output=true"""
+    if use_multi_output and load_multi_output_bundle() is None:
+        raise HTTPException(status_code=404, detail="No multi-output model trained (train.py --multi-output)")
     try:
         df = pd.DataFrame([sample.dict() for sample in batch.samples])
-        features_df = preprocess_input(df)
+        
+        # The joint model predicts both targets in a single traversal
+        if use_multi_output:
+            bundle = load_multi_output_bundle()
+            predictions, importances = get_multi_output_predictions(df, bundle)
+            return [
+                CombinedPredictionOutput(
+                    predicted_offer_price=float(offer_pred),
+                    predicted_close_day1=float(close_pred),
+                    offer_price_confidence=None,
+                    close_day1_confidence=None,
+                    feature_importances=importances
+                ) for offer_pred, close_pred in zip(predictions['offerPrice'], predictions['closeDay1'])
+            ]
         
         # Step 1: Get predictions for offerPrice
-        offer_predictions, offer_confidence, offer_importances = get_predictions(features_df.copy(), 'offerPrice')
+        offer_predictions, offer_confidence, offer_importances = get_predictions(preprocess_input(df), 'offerPrice', df)
         
         # Step 2: Add predicted_offerPrice as a feature for closeDay1 prediction
-        features_df_with_offer = features_df.copy()
-        features_df_with_offer['predicted_offerPrice'] = offer_predictions
-        
-        # Reorder columns to match imputer's expected order for closeDay1
-        imputer_close = load_imputer('closeDay1')
-        if hasattr(imputer_close, 'feature_names_in_'):
-            expected_features = list(imputer_close.feature_names_in_)
-            for col in expected_features:
-                if col not in features_df_with_offer.columns:
-                    features_df_with_offer[col] = 0
-            features_df_with_offer = features_df_with_offer[expected_features]
+        features_df_with_offer = preprocess_input(df, 'closeDay1', offer_predictions)
         
         # Step 3: Get predictions for closeDay1
-        close_predictions, close_confidence, close_importances = get_predictions(features_df_with_offer, 'closeDay1')
+        close_predictions, close_confidence, close_importances = get_predictions(features_df_with_offer, 'closeDay1', df)
         
         # Combine feature importances
         combined_importances = {**offer_importances, **{f"close_{k}": v for k, v in close_importances.items()}}
@@ -358,6 +401,8 @@ async def predict_combined(batch: BatchIPOInput):
                 feature_importances=combined_importances
             ) for i, (offer_pred, close_pred) in enumerate(zip(offer_predictions, close_predictions))
         ]
+    except UnknownCategoryError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         error_msg = str(e)
         if "XGBoost Library" in error_msg:
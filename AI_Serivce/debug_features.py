@@ -1,7 +1,7 @@
 import pandas as pd
 import numpy as np
 from api.main import preprocess_input
-import joblib
+from models.artifact_store import load_artifact
 
 # Test data
 data = {
@@ -28,8 +28,8 @@ print(f"Processed columns: {list(processed.columns)}")
 
 print("\n=== Model Expectations ===")
 # Load model components
-imputer = joblib.load('models/trained/imputer_offerPrice.joblib')
-feature_selector = joblib.load('models/trained/feature_selector_offerPrice.joblib')
+imputer = load_artifact('models/trained', 'imputer_offerPrice.joblib')
+feature_selector = load_artifact('models/trained', 'feature_selector_offerPrice.joblib')
 
 print(f"Imputer expects: {len(imputer.feature_names_in_)} features")
 print(f"Imputer features: {list(imputer.feature_names_in_)}")
@@ -0,0 +1,387 @@
+import io
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import weakref
+import numpy as np
+from joblib import load
+from sklearn.base import BaseEstimator
+from xgboost import XGBModel, XGBRegressor
+
+from .xgboost_model import xgboost_to_raw, xgboost_from_raw
+
+# Artifacts whose filename contains one of these targets go to that target's manifest
+ARTIFACT_TARGETS = ['offerPrice', 'closeDay1']
+
+# Blocks already loaded in this process, per store directory and content hash. Held
+# weakly, so the blocks of models no longer in use (e.g. replaced by a retrained model
+# in a long-running process) are freed
+_LOADED_BLOCKS = {}
+
+def _store_dir(model_dir):
+    return os.path.join(str(model_dir), 'artifacts')
+
+def _manifest_name(filename):
+    """Return the manifest that records an artifact filename ('shared' for artifacts of no single target)."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    for target in ARTIFACT_TARGETS:
+        if stem.endswith(f'_{target}') or stem.startswith(f'{target}_'):
+            return target
+    return 'shared'
+
+def _is_block(obj):
+    """
+    Estimators (including single trees) are stored as separate blocks. So are random
+    states, which Gradient Boosting shares between all of its stage trees.
+    """
+    return isinstance(obj, (BaseEstimator, XGBModel, np.random.RandomState))
+
+class _BlockPickler(pickle.Pickler):
+    """Pickler that writes nested estimators as content-addressed blocks and refers to them by hash."""
+    def __init__(self, file, store, root, hashes):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.store = store
+        self.root = root
+        self.hashes = hashes
+    
+    def persistent_id(self, obj):
+        if obj is self.root or not _is_block(obj):
+            return None
+        return self.store.put(obj, self.hashes)
+    
+    def reducer_override(self, obj):
+        # Trained XGBoost models are stored as their native UBJ booster, which loads faster
+        # than the wrapper's pickle and stays readable across XGBoost versions
+        if isinstance(obj, XGBRegressor) and obj.__sklearn_is_fitted__():
+            return xgboost_from_raw, xgboost_to_raw(obj)
+        # The padding bytes of structured arrays (e.g. sklearn tree nodes) are uninitialized;
+        # zero them so equal trees get equal hashes
+        if isinstance(obj, np.ndarray) and obj.dtype.names and \
+                obj.dtype.itemsize > sum(obj.dtype.fields[name][0].itemsize for name in obj.dtype.names):
+            clean = np.zeros(obj.shape, dtype=obj.dtype)
+            for name in obj.dtype.names:
+                clean[name] = obj[name]
+            return clean.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+        return NotImplemented
+
+class _BlockUnpickler(pickle.Unpickler):
+    """Unpickler that resolves block references through the store's block cache."""
+    def __init__(self, file, store, cache):
+        super().__init__(file)
+        self.store = store
+        self.cache = cache
+    
+    def persistent_load(self, pid):
+        return self.store.get(pid, self.cache)
+
+class _LoadCache(dict):
+    """
+    Blocks of one load, backed by the blocks loaded earlier in this process
+    
+    Blocks read by this load are held strongly until it finishes, and are also
+    published to the process-wide weak map. Blocks that cannot be weakly
+    referenced (random states) are shared within this load only.
+    """
+    def __init__(self, loaded):
+        super().__init__()
+        self.loaded = loaded
+    
+    def get(self, digest, default=None):
+        block = super().get(digest)
+        if block is None:
+            block = self.loaded.get(digest)
+        return default if block is None else block
+    
+    def __setitem__(self, digest, block):
+        super().__setitem__(digest, block)
+        try:
+            self.loaded[digest] = block
+        except TypeError:
+            pass
+
+class ArtifactStore:
+    """
+    Content-addressed store of model artifacts
+    
+    Every estimator nested in an artifact (base models, trees, meta-learners and
+    preprocessors) is pickled on its own and written once to
+    objects/<hash[:2]>/<hash>.pkl, with its nested estimators replaced by their
+    hashes. The ensemble's base models, the {target}_models bundle and the
+    standalone model files therefore share the same blocks on disk. Per-target
+    JSON manifests in manifests/ map each artifact filename to its root block.
+    
+    Parameters:
+    -----------
+    path : str
+        Store directory (usually <model_dir>/artifacts)
+    """
+    def __init__(self, path):
+        self.path = path
+    
+    def _object_path(self, digest):
+        return os.path.join(self.path, 'objects', digest[:2], f'{digest}.pkl')
+    
+    def _manifest_path(self, name):
+        return os.path.join(self.path, 'manifests', f'{name}.json')
+    
+    def _write_atomic(self, path, payload):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    
+    def put(self, obj, hashes=None):
+        """
+        Write an object and its nested estimators as blocks
+        
+        Parameters:
+        -----------
+        obj : object
+            Picklable object
+        hashes : dict, optional
+            Hashes of objects already written in this save, by id(), updated in place
+        
+        Returns:
+        --------
+        str
+            Content hash of the object's block
+        """
+        hashes = {} if hashes is None else hashes
+        if id(obj) in hashes:
+            return hashes[id(obj)][0]
+        buffer = io.BytesIO()
+        pickler = _BlockPickler(buffer, self, obj, hashes)
+        # Without the memo, the bytes do not depend on which equal strings happen to be the
+        # same object (a trained model and its reloaded copy differ there)
+        pickler.fast = True
+        try:
+            pickler.dump(obj)
+        except ValueError:
+            # Fast mode cannot pickle self-referencing objects
+            buffer = io.BytesIO()
+            _BlockPickler(buffer, self, obj, hashes).dump(obj)
+        payload = buffer.getvalue()
+        digest = hashlib.sha256(payload).hexdigest()
+        # Keep obj referenced so its id() is not reused during this save
+        hashes[id(obj)] = (digest, obj)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            self._write_atomic(path, payload)
+        return digest
+    
+    def get(self, digest, cache=None):
+        """
+        Load a block, resolving its nested blocks
+        
+        Parameters:
+        -----------
+        digest : str
+            Content hash
+        cache : dict, optional
+            Blocks loaded so far, by hash; blocks found there are not read again
+        
+        Returns:
+        --------
+        object
+            Loaded object
+        """
+        cache = {} if cache is None else cache
+        block = cache.get(digest)
+        if block is None:
+            with open(self._object_path(digest), 'rb') as f:
+                block = _BlockUnpickler(f, self, cache).load()
+            cache[digest] = block
+        return block
+    
+    def read_manifest(self, name):
+        """Return the artifact filename -> root hash mapping of a manifest ({} if it does not exist)."""
+        path = self._manifest_path(name)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+    
+    def write_manifest(self, name, entries):
+        """Replace the entries of a manifest."""
+        self._write_atomic(self._manifest_path(name), json.dumps(entries, indent=2, sort_keys=True).encode())
+    
+    def referenced_blocks(self, roots=None):
+        """Return the hashes of all blocks reachable from the given root hashes (default: all manifests)."""
+        if roots is None:
+            roots = []
+            manifest_dir = os.path.join(self.path, 'manifests')
+            if os.path.isdir(manifest_dir):
+                for name in os.listdir(manifest_dir):
+                    if name.endswith('.json'):
+                        roots.extend(self.read_manifest(name[:-5]).values())
+        pending = list(roots)
+        referenced = set()
+        while pending:
+            digest = pending.pop()
+            if digest in referenced:
+                continue
+            referenced.add(digest)
+            with open(self._object_path(digest), 'rb') as f:
+                unpickler = pickle.Unpickler(f)
+                children = []
+                unpickler.persistent_load = lambda pid: children.append(pid)
+                unpickler.load()
+            pending.extend(children)
+        return referenced
+    
+    def collect_garbage(self):
+        """
+        Delete blocks no manifest refers to (e.g. models replaced by a new training run)
+        
+        Returns:
+        --------
+        tuple
+            (number of blocks deleted, bytes freed)
+        """
+        referenced = self.referenced_blocks()
+        objects_dir = os.path.join(self.path, 'objects')
+        n_deleted, n_bytes = 0, 0
+        if not os.path.isdir(objects_dir):
+            return n_deleted, n_bytes
+        for prefix in os.listdir(objects_dir):
+            for name in os.listdir(os.path.join(objects_dir, prefix)):
+                if name.endswith('.pkl') and name[:-4] not in referenced:
+                    path = os.path.join(objects_dir, prefix, name)
+                    n_bytes += os.path.getsize(path)
+                    os.remove(path)
+                    n_deleted += 1
+        return n_deleted, n_bytes
+
+def save_artifact(model_dir, filename, obj):
+    """
+    Save an artifact to the store of a model directory
+    
+    A legacy file of the same name in model_dir is removed, so the store is the
+    only copy.
+    
+    Parameters:
+    -----------
+    model_dir : str
+        Model directory, e.g. models/trained
+    filename : str
+        Artifact name, e.g. 'xgboost_offerPrice.joblib'
+    obj : object
+        Object to save
+    
+    Returns:
+    --------
+    str
+        Content hash of the artifact
+    """
+    store = ArtifactStore(_store_dir(model_dir))
+    digest = store.put(obj)
+    manifest = _manifest_name(filename)
+    entries = store.read_manifest(manifest)
+    entries[filename] = digest
+    store.write_manifest(manifest, entries)
+    legacy_path = os.path.join(str(model_dir), filename)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+    return digest
+
+def load_artifact(model_dir, filename, shared=True):
+    """
+    Load an artifact from the store of a model directory
+    
+    Parameters:
+    -----------
+    model_dir : str
+        Model directory, e.g. models/trained
+    filename : str
+        Artifact name, e.g. 'xgboost_offerPrice.joblib'
+    shared : bool, default=True
+        Reuse blocks still loaded in this process, so models that share base
+        estimators or trees hold one copy in memory. Pass False when the loaded
+        objects will be modified (e.g. incremental retraining)
+    
+    Returns:
+    --------
+    object
+        Loaded artifact (read from model_dir/filename for directories saved before the store)
+    
+    Raises:
+    -------
+    FileNotFoundError
+        If the artifact is neither in the store nor a file in model_dir
+    """
+    store_dir = _store_dir(model_dir)
+    store = ArtifactStore(store_dir)
+    digest = store.read_manifest(_manifest_name(filename)).get(filename)
+    if digest is None:
+        legacy_path = os.path.join(str(model_dir), filename)
+        if not os.path.exists(legacy_path):
+            raise FileNotFoundError(f"Artifact not found: {legacy_path}")
+        return load(legacy_path)
+    if not shared:
+        return store.get(digest)
+    loaded = _LOADED_BLOCKS.setdefault(os.path.realpath(store_dir), weakref.WeakValueDictionary())
+    return store.get(digest, _LoadCache(loaded))
+
+def artifact_exists(model_dir, filename):
+    """Return whether an artifact is in the store or saved as a legacy file."""
+    store = ArtifactStore(_store_dir(model_dir))
+    return (filename in store.read_manifest(_manifest_name(filename))
+            or os.path.exists(os.path.join(str(model_dir), filename)))
+
+def load_artifact_path(path):
+    """
+    Load the artifact saved under a path in a model directory, None if there is none
+    
+    Loader for the preprocessing functions that fall back to defaults for models
+    trained before an artifact was saved (load_categorical_encoder, load_feature_set).
+    """
+    model_dir, filename = os.path.split(str(path))
+    if not artifact_exists(model_dir, filename):
+        return None
+    return load_artifact(model_dir, filename)
+
+def remove_artifact(model_dir, filename):
+    """Remove an artifact from the manifests (and its legacy file); its blocks go with the next garbage collection."""
+    store = ArtifactStore(_store_dir(model_dir))
+    manifest = _manifest_name(filename)
+    entries = store.read_manifest(manifest)
+    if entries.pop(filename, None) is not None:
+        store.write_manifest(manifest, entries)
+    legacy_path = os.path.join(str(model_dir), filename)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+def artifact_size(model_dir, filename=None):
+    """
+    Bytes on disk of an artifact's blocks, or of all saved artifacts
+    
+    Blocks shared with other artifacts are counted in full, so the sizes of
+    artifacts that share base models add up to more than the store.
+    
+    Parameters:
+    -----------
+    model_dir : str
+        Model directory, e.g. models/trained
+    filename : str, optional
+        Artifact name (all artifacts if None)
+    
+    Returns:
+    --------
+    int or None
+        Size in bytes (None if the artifact is not in the store)
+    """
+    store = ArtifactStore(_store_dir(model_dir))
+    roots = None
+    if filename is not None:
+        digest = store.read_manifest(_manifest_name(filename)).get(filename)
+        if digest is None:
+            return None
+        roots = [digest]
+    return sum(os.path.getsize(store._object_path(digest)) for digest in store.referenced_blocks(roots))
+
+def collect_garbage(model_dir):
+    """Delete the unreferenced blocks of a model directory's store, see ArtifactStore.collect_garbage."""
+    return ArtifactStore(_store_dir(model_dir)).collect_garbage()
@@ -4,9 +4,9 @@ from sklearn.ensemble import StackingRegressor
 from sklearn.linear_model import LinearRegression
 from joblib import dump, load
 
-from .xgboost_model import create_xgboost_model
-from .random_forest_model import create_random_forest_model
-from .gradient_boost_model import create_gradient_boost_model
+from .xgboost_model import create_xgboost_model, update_xgboost_model
+from .random_forest_model import create_random_forest_model, update_random_forest_model
+from .gradient_boost_model import create_gradient_boost_model, update_gradient_boost_model
 
 def create_ensemble_model(xgb_params=None, rf_params=None, gb_params=None, final_estimator=None):
     """
@@ -71,6 +71,66 @@ def train_ensemble_model(X_train, y_train, xgb_params=None, rf_params=None, gb_p
     model.fit(X_train, y_train)
     return model
 
+def refit_meta_learner(model, X, y):
+    """
+    Refit only the final estimator of a stacking ensemble on base model predictions
+    
+    The base estimators are left untouched, so X should contain rows they have
+    not been trained on (e.g. a newly arrived batch).
+    
+    Parameters:
+    -----------
+    model : sklearn.ensemble.StackingRegressor
+        Trained stacking ensemble model
+    X : pandas.DataFrame or numpy.ndarray
+        Features to predict on with the base estimators
+    y : pandas.Series or numpy.ndarray
+        Target values
+        
+    Returns:
+    --------
+    sklearn.ensemble.StackingRegressor
+        Ensemble with the refitted final estimator
+    """
+    base_predictions = model.transform(X)
+    model.final_estimator_.fit(base_predictions, y)
+    return model
+
+def update_ensemble_model(model, X_train, y_train, n_rounds=10):
+    """
+    Grow the base estimators of a trained stacking ensemble
+    
+    XGBoost continues from its booster, while Random Forest and Gradient Boosting
+    add trees/stages with warm start. The final estimator is not changed.
+    
+    Parameters:
+    -----------
+    model : sklearn.ensemble.StackingRegressor
+        Trained stacking ensemble model
+    X_train : pandas.DataFrame
+        Training features
+    y_train : pandas.Series
+        Target values
+    n_rounds : int, default=10
+        Number of trees/boosting rounds to add to each base estimator
+        
+    Returns:
+    --------
+    sklearn.ensemble.StackingRegressor
+        Ensemble with the updated base estimators
+    """
+    updaters = {
+        'xgb': update_xgboost_model,
+        'rf': update_random_forest_model,
+        'gb': update_gradient_boost_model
+    }
+    
+    for name, estimator in model.named_estimators_.items():
+        if name in updaters:
+            updaters[name](estimator, X_train, y_train, n_rounds)
+    
+    return model
+
 def predict_ensemble(model, X):
     """
     Make predictions using a stacking ensemble model
@@ -0,0 +1,274 @@
+import copy
+import math
+import pickle
+import time
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from xgboost import XGBRegressor
+
+def _tree_sizes(estimator):
+    """Return the node count of every tree (boosting round) of a base estimator, or None."""
+    if isinstance(estimator, RandomForestRegressor):
+        return np.array([tree.tree_.node_count for tree in estimator.estimators_])
+    if isinstance(estimator, GradientBoostingRegressor):
+        return np.array([stage[0].tree_.node_count for stage in estimator.estimators_])
+    if isinstance(estimator, XGBRegressor):
+        return np.array([sum(1 for line in tree.splitlines() if line.strip())
+                         for tree in estimator.get_booster().get_dump()])
+    return None
+
+def _staged_predictions(estimator, X):
+    """
+    Cumulative predictions of the first k trees (boosting rounds) of a base estimator
+    
+    Returns:
+    --------
+    numpy.ndarray
+        One row per k = 1..n_trees; a single row for estimators without trees
+    """
+    if isinstance(estimator, RandomForestRegressor):
+        X_array = np.asarray(X, dtype=np.float32)
+        trees = np.array([tree.predict(X_array) for tree in estimator.estimators_])
+        return np.cumsum(trees, axis=0) / np.arange(1, len(trees) + 1)[:, np.newaxis]
+    if isinstance(estimator, GradientBoostingRegressor):
+        return np.array(list(estimator.staged_predict(np.asarray(X))))
+    if isinstance(estimator, XGBRegressor):
+        n_rounds = estimator.get_booster().num_boosted_rounds()
+        return np.array([estimator.predict(X, iteration_range=(0, k)) for k in range(1, n_rounds + 1)])
+    return estimator.predict(X)[np.newaxis, :]
+
+def _meta_rmse(columns, y):
+    """Leave-one-out RMSE of a least-squares linear combination (with intercept) of the base predictions."""
+    design = np.column_stack([np.ones(len(y))] + columns)
+    q, r = np.linalg.qr(design)
+    residuals = y - q @ (q.T @ y)
+    leverage = np.sum(q ** 2, axis=1)
+    return math.sqrt(np.mean((residuals / (1 - leverage)) ** 2))
+
+def _model_size(model):
+    """Serialized size of a model in bytes."""
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+def _composition(model):
+    """Number of trees (boosting rounds) kept per base estimator."""
+    composition = {}
+    for name, estimator in model.named_estimators_.items():
+        sizes = _tree_sizes(estimator)
+        composition[name] = None if sizes is None else int(len(sizes))
+    return composition
+
+def measure_ensemble(model, X, y, n_repeats=5, n_single=50):
+    """
+    Measure accuracy, size and prediction latency of a stacking ensemble
+    
+    Parameters:
+    -----------
+    model : sklearn.ensemble.StackingRegressor
+        Trained stacking ensemble model
+    X : numpy.ndarray
+        Evaluation features
+    y : numpy.ndarray
+        Evaluation targets
+    n_repeats : int, default=5
+        Batch predictions timed (the fastest is reported)
+    n_single : int, default=50
+        Single-row predictions timed (the median is reported)
+    
+    Returns:
+    --------
+    dict
+        rmse, mse, r2, model_bytes, batch_us_per_row, single_row_ms and trees per base estimator
+    """
+    batch_times = []
+    for _ in range(n_repeats):
+        start_time = time.perf_counter()
+        predictions = model.predict(X)
+        batch_times.append(time.perf_counter() - start_time)
+    single_times = []
+    for idx in range(n_single):
+        row = X[idx % len(X):idx % len(X) + 1]
+        start_time = time.perf_counter()
+        model.predict(row)
+        single_times.append(time.perf_counter() - start_time)
+    mse = float(np.mean((predictions - y) ** 2))
+    return {
+        'rmse': math.sqrt(mse),
+        'mse': mse,
+        'r2': 1 - mse / float(np.var(y)) if np.var(y) > 0 else float('nan'),
+        'model_bytes': _model_size(model),
+        'batch_us_per_row': min(batch_times) / len(X) * 1e6,
+        'single_row_ms': float(np.median(single_times)) * 1e3,
+        'trees': _composition(model)
+    }
+
+def _apply_pruning(model, kept, active):
+    """Return a copy of the ensemble keeping the first kept[i] trees of every active base estimator."""
+    pruned = copy.deepcopy(model)
+    names = list(model.named_estimators_)
+    for idx, name in enumerate(names):
+        estimator = pruned.named_estimators_[name]
+        n_trees = int(kept[idx])
+        if not active[idx]:
+            continue
+        if isinstance(estimator, RandomForestRegressor):
+            estimator.estimators_ = estimator.estimators_[:n_trees]
+            estimator.n_estimators = n_trees
+        elif isinstance(estimator, GradientBoostingRegressor):
+            estimator.estimators_ = estimator.estimators_[:n_trees]
+            estimator.train_score_ = estimator.train_score_[:n_trees]
+            if hasattr(estimator, 'oob_improvement_'):
+                estimator.oob_improvement_ = estimator.oob_improvement_[:n_trees]
+            estimator.n_estimators = n_trees
+            estimator.n_estimators_ = n_trees
+        elif isinstance(estimator, XGBRegressor):
+            estimator._Booster = estimator.get_booster()[:n_trees]
+            estimator.n_estimators = n_trees
+    
+    # Remove the dropped base estimators from the fitted stack
+    keep_positions = [idx for idx in range(len(names)) if active[idx]]
+    pruned.estimators_ = [pruned.estimators_[idx] for idx in keep_positions]
+    pruned.stack_method_ = [pruned.stack_method_[idx] for idx in keep_positions]
+    pruned.estimators = [pruned.estimators[idx] for idx in keep_positions]
+    for idx, name in enumerate(names):
+        if not active[idx]:
+            del pruned.named_estimators_[name]
+    return pruned
+
+def prune_ensemble_model(model, X_holdout, y_holdout, tolerance=0.01, validation_fraction=0.5, random_state=42):
+    """
+    Greedily remove trees and whole base estimators from a trained stacking ensemble
+    
+    The held-out rows are split in two. On the validation part, every step
+    evaluates removing the last tree (boosting round) of each base estimator or a
+    whole base estimator, scored by the leave-one-out RMSE of the linear
+    meta-learner refitted to the remaining base predictions. The removal that
+    saves the most tree nodes per unit of RMSE increase is applied, as long as
+    that RMSE stays within (1 + tolerance) times the validation RMSE of the
+    original ensemble. Random Forest trees are interchangeable, so trailing trees
+    are removed rather than the ones that happen to fit the validation rows best.
+    The meta-learner of the pruned ensemble is then refitted on the validation
+    part, and both ensembles are measured on the untouched evaluation part.
+    
+    Parameters:
+    -----------
+    model : sklearn.ensemble.StackingRegressor
+        Trained stacking ensemble with a linear final estimator
+    X_holdout : numpy.ndarray
+        Rows not used to train the ensemble
+    y_holdout : numpy.ndarray
+        Target values of the held-out rows
+    tolerance : float, default=0.01
+        Allowed relative increase of the validation RMSE
+    validation_fraction : float, default=0.5
+        Share of the held-out rows used to make the pruning decisions
+    random_state : int, default=42
+        Seed of the validation/evaluation split
+    
+    Returns:
+    --------
+    tuple
+        (pruned StackingRegressor, report dict with the before/after measurements)
+    """
+    X_holdout = np.asarray(X_holdout)
+    y_holdout = np.asarray(y_holdout, dtype=np.float64)
+    order = np.random.RandomState(random_state).permutation(len(y_holdout))
+    n_valid = int(round(len(order) * validation_fraction))
+    valid_rows, eval_rows = np.sort(order[:n_valid]), np.sort(order[n_valid:])
+    X_valid, y_valid = X_holdout[valid_rows], y_holdout[valid_rows]
+    
+    names = list(model.named_estimators_)
+    staged, sizes = [], []
+    for name in names:
+        estimator = model.named_estimators_[name]
+        staged.append(_staged_predictions(estimator, X_valid))
+        member_sizes = _tree_sizes(estimator)
+        sizes.append(member_sizes if member_sizes is not None else np.array([1]))
+    
+    # Pruning state: number of leading trees kept and whether the base estimator is still stacked
+    kept = [len(predictions) for predictions in staged]
+    active = [True] * len(names)
+    
+    def stacked(replace_idx=None, n_trees=None):
+        columns = []
+        for idx in range(len(names)):
+            if idx == replace_idx:
+                if n_trees:
+                    columns.append(staged[idx][n_trees - 1])
+            elif active[idx]:
+                columns.append(staged[idx][kept[idx] - 1])
+        return columns
+    
+    original_rmse = math.sqrt(np.mean((model.predict(X_valid) - y_valid) ** 2))
+    rmse_limit = original_rmse * (1 + tolerance)
+    current_rmse = _meta_rmse(stacked(), y_valid)
+    removed_trees = 0
+    
+    while True:
+        best = None
+        for idx in range(len(names)):
+            if not active[idx]:
+                continue
+            # (trees kept afterwards, tree nodes saved); 0 trees drops the base estimator
+            candidates = []
+            if kept[idx] > 1:
+                candidates.append((kept[idx] - 1, sizes[idx][kept[idx] - 1]))
+            if sum(active) > 1:
+                candidates.append((0, sizes[idx][:kept[idx]].sum()))
+            for n_trees, n_nodes in candidates:
+                rmse = _meta_rmse(stacked(idx, n_trees), y_valid)
+                if rmse > rmse_limit:
+                    continue
+                score = (rmse - current_rmse) / max(n_nodes, 1)
+                if best is None or score < best[0]:
+                    best = (score, idx, n_trees, rmse)
+        
+        if best is None:
+            break
+        _, idx, n_trees, current_rmse = best
+        if n_trees:
+            kept[idx] = n_trees
+            removed_trees += 1
+        else:
+            active[idx] = False
+            print(f"Dropped base estimator '{names[idx]}' (validation RMSE {current_rmse:.4f})")
+    
+    pruned = _apply_pruning(model, kept, active)
+    # Reweight the meta-learner for the remaining, pruned base estimators
+    pruned.final_estimator_.fit(np.column_stack(stacked()), y_valid)
+    
+    X_eval, y_eval = X_holdout[eval_rows], y_holdout[eval_rows]
+    before = measure_ensemble(model, X_eval, y_eval)
+    after = measure_ensemble(pruned, X_eval, y_eval)
+    before['validation_rmse'] = original_rmse
+    after['validation_rmse'] = math.sqrt(np.mean((pruned.predict(X_valid) - y_valid) ** 2))
+    report = {
+        'tolerance': tolerance,
+        'validation_rows': int(len(valid_rows)),
+        'evaluation_rows': int(len(eval_rows)),
+        'removed_trees': removed_trees,
+        'dropped_estimators': [name for idx, name in enumerate(names) if not active[idx]],
+        'meta_weights': dict(zip([name for idx, name in enumerate(names) if active[idx]],
+                                 pruned.final_estimator_.coef_.tolist())),
+        'before': before,
+        'after': after
+    }
+    return pruned, report
+
+def format_pruning_report(report):
+    """Render the before/after measurements of prune_ensemble_model as a table."""
+    rows = [
+        ('validation RMSE', 'validation_rmse', '{:.4f}'),
+        ('evaluation RMSE', 'rmse', '{:.4f}'),
+        ('model size (kB)', 'model_bytes', '{:.1f}'),
+        ('batch us/row', 'batch_us_per_row', '{:.2f}'),
+        ('single row ms', 'single_row_ms', '{:.3f}')
+    ]
+    lines = [f"{'':>18} {'before':>10} {'after':>10}"]
+    for label, key, fmt in rows:
+        before, after = report['before'][key], report['after'][key]
+        if key == 'model_bytes':
+            before, after = before / 1024, after / 1024
+        lines.append(f"{label:>18} {fmt.format(before):>10} {fmt.format(after):>10}")
+    for name, n_trees in report['before']['trees'].items():
+        lines.append(f"{name + ' trees':>18} {str(n_trees):>10} {str(report['after']['trees'].get(name, 'dropped')):>10}")
+    return '\n'.join(lines)
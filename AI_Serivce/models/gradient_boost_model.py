@@ -51,6 +51,31 @@ def train_gradient_boost_model(X_train, y_train, params=None):
     model.fit(X_train, y_train)
     return model
 
+def update_gradient_boost_model(model, X_train, y_train, n_stages=10):
+    """
+    Fit additional boosting stages on a trained Gradient Boosting model using warm start
+    
+    Parameters:
+    -----------
+    model : sklearn.ensemble.GradientBoostingRegressor
+        Trained Gradient Boosting model
+    X_train : pandas.DataFrame
+        Training features
+    y_train : pandas.Series
+        Target values
+    n_stages : int, default=10
+        Number of boosting stages to add
+        
+    Returns:
+    --------
+    sklearn.ensemble.GradientBoostingRegressor
+        Model with the additional stages
+    """
+    model.set_params(warm_start=True, n_estimators=model.n_estimators_ + n_stages)
+    model.fit(X_train, y_train)
+    model.set_params(warm_start=False)
+    return model
+
 def predict_gradient_boost(model, X):
     """
     Make predictions using a Gradient Boosting model
@@ -0,0 +1,80 @@
+import numpy as np
+from sklearn.multioutput import MultiOutputRegressor
+
+from .xgboost_model import create_xgboost_model
+from .random_forest_model import create_random_forest_model
+from .gradient_boost_model import create_gradient_boost_model
+
+MULTI_OUTPUT_TARGETS = ['offerPrice', 'closeDay1']
+
+def create_multi_output_model(model_type='random_forest', params=None):
+    """
+    Create a regression model that predicts several targets at once
+    
+    XGBoost grows multi-output trees (one tree structure with a vector leaf per
+    target) and Random Forest supports multiple outputs natively. Gradient Boosting
+    has no multi-output trees, so it is wrapped in a MultiOutputRegressor with one
+    model per target.
+    
+    Parameters:
+    -----------
+    model_type : str, default='random_forest'
+        One of 'xgboost', 'random_forest', 'gradient_boost'
+    params : dict, optional
+        Parameters for the underlying model factory
+    
+    Returns:
+    --------
+    estimator object
+        Configured multi-output model
+    """
+    if model_type == 'xgboost':
+        model = create_xgboost_model(params)
+        return model.set_params(tree_method='hist', multi_strategy='multi_output_tree')
+    if model_type == 'random_forest':
+        return create_random_forest_model(params)
+    if model_type == 'gradient_boost':
+        return MultiOutputRegressor(create_gradient_boost_model(params))
+    raise ValueError(f"Unsupported multi-output model type '{model_type}'")
+
+def train_multi_output_model(X_train, Y_train, model_type='random_forest', params=None):
+    """
+    Train a multi-output regression model
+    
+    Parameters:
+    -----------
+    X_train : pandas.DataFrame
+        Training features
+    Y_train : pandas.DataFrame
+        Target values, one column per target
+    model_type : str, default='random_forest'
+        One of 'xgboost', 'random_forest', 'gradient_boost'
+    params : dict, optional
+        Parameters for the underlying model factory
+    
+    Returns:
+    --------
+    estimator object
+        Trained multi-output model
+    """
+    model = create_multi_output_model(model_type, params)
+    model.fit(X_train, np.asarray(Y_train))
+    return model
+
+def predict_multi_output(model, X):
+    """
+    Make predictions for all targets using a multi-output model
+    
+    Parameters:
+    -----------
+    model : estimator object
+        Trained multi-output model
+    X : pandas.DataFrame or numpy.ndarray
+        Features to predict on
+    
+    Returns:
+    --------
+    numpy.ndarray
+        Predicted values of shape (n_samples, n_targets)
+    """
+    return np.asarray(model.predict(X)).reshape(len(X), -1)
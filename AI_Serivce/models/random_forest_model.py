@@ -51,6 +51,31 @@ def train_random_forest_model(X_train, y_train, params=None):
     model.fit(X_train, y_train)
     return model
 
+def update_random_forest_model(model, X_train, y_train, n_trees=10):
+    """
+    Grow additional trees on a trained Random Forest model using warm start
+    
+    Parameters:
+    -----------
+    model : sklearn.ensemble.RandomForestRegressor
+        Trained Random Forest model
+    X_train : pandas.DataFrame
+        Training features
+    y_train : pandas.Series
+        Target values
+    n_trees : int, default=10
+        Number of trees to add
+        
+    Returns:
+    --------
+    sklearn.ensemble.RandomForestRegressor
+        Model with the additional trees
+    """
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_trees)
+    model.fit(X_train, y_train)
+    model.set_params(warm_start=False)
+    return model
+
 def predict_random_forest(model, X):
     """
     Make predictions using a Random Forest model
@@ -1,9 +1,15 @@
+import os
+import json
 import numpy as np
 import pandas as pd
+import xgboost
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
-from xgboost import XGBRegressor
-from joblib import dump, load
+from xgboost import XGBModel, XGBRegressor, Booster
+from joblib import load
+
+# Version of the metadata written next to natively saved models
+XGBOOST_METADATA_VERSION = 1
 
 def create_xgboost_model(params=None):
     """
@@ -13,7 +19,7 @@ def create_xgboost_model(params=None):
     -----------
     params : dict, optional
         Parameters for XGBRegressor
-        
+    
     Returns:
     --------
     xgboost.XGBRegressor
@@ -43,7 +49,7 @@ def train_xgboost_model(X_train, y_train, params=None):
         Target values
     params : dict, optional
         Parameters for XGBRegressor
-        
+    
     Returns:
     --------
     xgboost.XGBRegressor
@@ -53,49 +59,165 @@ def train_xgboost_model(X_train, y_train, params=None):
     model.fit(X_train, y_train)
     return model
 
+def update_xgboost_model(model, X_train, y_train, n_rounds=10):
+    """
+    Continue training an XGBoost model from its current booster
+    
+    Parameters:
+    -----------
+    model : xgboost.XGBRegressor
+        Trained XGBoost model
+    X_train : pandas.DataFrame
+        Training features
+    y_train : pandas.Series
+        Target values
+    n_rounds : int, default=10
+        Number of additional boosting rounds
+    
+    Returns:
+    --------
+    xgboost.XGBRegressor
+        Model with the additional boosting rounds appended
+    """
+    total_rounds = model.get_booster().num_boosted_rounds() + n_rounds
+    model.set_params(n_estimators=n_rounds)
+    model.fit(X_train, y_train, xgb_model=model.get_booster())
+    model.set_params(n_estimators=total_rounds)
+    return model
+
 def predict_xgboost(model, X):
     """
     Make predictions using an XGBoost model
     
+    Predicts with the booster's inplace_predict on the underlying array, without
+    the sklearn wrapper's input validation and feature name checks.
+    
     Parameters:
     -----------
     model : xgboost.XGBRegressor
         Trained XGBoost model
-    X : pandas.DataFrame
-        Features to predict on
-        
+    X : pandas.DataFrame, numpy.ndarray or scipy.sparse.csr_matrix
+        Features to predict on, in training column order
+    
     Returns:
     --------
     numpy.ndarray
         Predicted values
     """
-    return model.predict(X)
+    booster = model.get_booster()
+    if isinstance(X, pd.DataFrame):
+        X = X.to_numpy()
+    iteration_range = (0, 0)
+    if booster.attr('best_iteration') is not None:
+        iteration_range = (0, int(booster.attr('best_iteration')) + 1)
+    return booster.inplace_predict(X, iteration_range=iteration_range, missing=model.missing,
+                                   validate_features=False)
+
+def xgboost_metadata(model):
+    """
+    Describe an XGBoost model for restoring it from its native booster
+    
+    Returns:
+    --------
+    dict
+        Metadata version, XGBoost version, JSON-serializable constructor parameters,
+        number of features and boosting rounds
+    """
+    params = {name: value for name, value in model.get_params().items()
+              if value is None or isinstance(value, (bool, int, float, str))}
+    booster = model.get_booster()
+    return {
+        'metadata_version': XGBOOST_METADATA_VERSION,
+        'xgboost_version': xgboost.__version__,
+        'estimator': type(model).__name__,
+        'params': params,
+        'n_features': int(booster.num_features()),
+        'num_boosted_rounds': int(booster.num_boosted_rounds())
+    }
+
+def xgboost_to_raw(model, model_format='ubj'):
+    """Return the native serialization ('ubj' or 'json') of a model's booster and its metadata."""
+    return bytes(model.get_booster().save_raw(raw_format=model_format)), xgboost_metadata(model)
+
+def xgboost_from_raw(raw, metadata):
+    """
+    Rebuild an XGBoost model from its native booster and metadata
+    
+    Parameters:
+    -----------
+    raw : bytes
+        Booster saved in XGBoost's UBJ or JSON model format
+    metadata : dict
+        Metadata returned by xgboost_metadata
+    
+    Returns:
+    --------
+    xgboost.XGBRegressor
+        Model ready for prediction and further boosting rounds
+    """
+    booster = Booster()
+    booster.load_model(bytearray(raw))
+    model = create_xgboost_model(metadata['params'])
+    model._Booster = booster
+    return model
+
+def _metadata_path(filename):
+    return os.path.splitext(filename)[0] + '.meta.json'
 
 def save_xgboost_model(model, filename):
     """
-    Save XGBoost model to file
+    Save XGBoost model to file in XGBoost's native format
+    
+    The booster is written as UBJ, or as JSON if filename ends with '.json'.
+    The constructor parameters and versions go to a <name>.meta.json sidecar.
+    Unlike a pickle of the sklearn wrapper, the native format can be read by
+    other XGBoost versions.
     
     Parameters:
     -----------
     model : xgboost.XGBRegressor
         Trained XGBoost model
     filename : str
-        Path to save the model
+        Path to save the model, e.g. xgboost_offerPrice.ubj
     """
-    dump(model, filename)
+    model_format = 'json' if filename.endswith('.json') else 'ubj'
+    raw, metadata = xgboost_to_raw(model, model_format)
+    metadata['format'] = model_format
+    with open(filename, 'wb') as f:
+        f.write(raw)
+    with open(_metadata_path(filename), 'w') as f:
+        json.dump(metadata, f, indent=2)
 
 def load_xgboost_model(filename):
     """
-    Load XGBoost model from file
+    Load XGBoost model from a file written by save_xgboost_model
+    
+    Files without a .meta.json sidecar are read as the joblib pickles that
+    save_xgboost_model wrote before models were saved natively. Saving such a
+    model again with save_xgboost_model converts it.
     
     Parameters:
     -----------
     filename : str
         Path to the saved model
-        
+    
     Returns:
     --------
     xgboost.XGBRegressor
         Loaded XGBoost model
+    
+    Raises:
+    -------
+    ValueError
+        If a file without sidecar does not hold a pickled XGBoost model
     """
-    return load(filename)
+    if not os.path.exists(_metadata_path(filename)):
+        model = load(filename)
+        if not isinstance(model, XGBModel):
+            raise ValueError(f"{filename} has no {os.path.basename(_metadata_path(filename))} "
+                             f"and is not a joblib-pickled XGBoost model")
+        return model
+    with open(_metadata_path(filename)) as f:
+        metadata = json.load(f)
+    with open(filename, 'rb') as f:
+        return xgboost_from_raw(f.read(), metadata)
@@ -0,0 +1,332 @@
+import io
+import collections
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler, RobustScaler
+
+from .clean_data import clean_data
+from .encode_categorical import encode_categorical_features
+from .impute_missing import StreamingImputer
+from .float32_pipeline import Float32Imputer, Float32Scaler
+
+def read_csv_chunks(path, chunk_size, usecols=None):
+    """
+    Stream a CSV file as DataFrames of at most chunk_size rows
+    
+    Parameters:
+    -----------
+    path : str or file
+        Path to the CSV file, or an open file
+    chunk_size : int
+        Rows per chunk
+    usecols : list, optional
+        Columns to read (all if None)
+    
+    Yields:
+    -------
+    pandas.DataFrame
+        Consecutive row chunks
+    """
+    with pd.read_csv(path, chunksize=chunk_size, usecols=usecols) as reader:
+        for chunk in reader:
+            yield chunk
+
+def read_csv_shards(source, shard_size):
+    """
+    Split an open CSV file into shards of raw records without parsing them
+    
+    Each shard is parsed where it is scored (e.g. in a worker process) with
+    parse_csv_shard. Shards end on record boundaries: a quoted field may span
+    lines, and blank lines are not records, as in pandas.read_csv. Shards
+    therefore hold the same rows as read_csv_chunks with the same size.
+    
+    Parameters:
+    -----------
+    source : file
+        CSV file opened in binary mode
+    shard_size : int
+        Records per shard
+    
+    Yields:
+    -------
+    tuple
+        (header line, bytes of the shard's lines, number of records)
+    """
+    header = source.readline()
+    lines, n_records, quoted = [], 0, False
+    for line in source:
+        lines.append(line)
+        # An odd number of quotes opens or closes a field that continues on the next line
+        if line.count(b'"') % 2:
+            quoted = not quoted
+        if quoted or not line.strip():
+            continue
+        n_records += 1
+        if n_records == shard_size:
+            yield header, b''.join(lines), n_records
+            lines, n_records = [], 0
+    if n_records:
+        yield header, b''.join(lines), n_records
+
+def parse_csv_shard(header, block, n_records=None):
+    """
+    Parse a shard from read_csv_shards into a DataFrame
+    
+    Raises:
+    -------
+    ValueError
+        If the shard does not parse into n_records rows (when given)
+    """
+    chunk = pd.read_csv(io.BytesIO(header + block))
+    if n_records is not None and len(chunk) != n_records:
+        raise ValueError(f"Shard parsed into {len(chunk)} rows, expected {n_records}")
+    return chunk
+
+def ordered_map(executor, function, tasks, window):
+    """
+    Run tasks on a pool and yield their results in task order
+    
+    At most window tasks are in flight, so finished results waiting for an
+    earlier task do not pile up in memory.
+    
+    Parameters:
+    -----------
+    executor : concurrent.futures.Executor
+        Pool to run the tasks on
+    function : callable
+        Function called as function(*task)
+    tasks : iterable
+        Argument tuples, consumed lazily
+    window : int
+        Maximum number of submitted, unconsumed tasks
+    
+    Yields:
+    -------
+    object
+        Result of each task
+    """
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(executor.submit(function, *task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def read_csv_column(path, column, chunk_size):
+    """Read one numeric column of a CSV file chunk by chunk (NaN for every row if it is absent)."""
+    header = pd.read_csv(path, nrows=0).columns
+    if column not in header:
+        n_rows = sum(len(chunk) for chunk in read_csv_chunks(path, chunk_size, usecols=[header[0]]))
+        return np.full(n_rows, np.nan)
+    parts = [chunk[column].to_numpy(dtype=np.float64) for chunk in read_csv_chunks(path, chunk_size, usecols=[column])]
+    return np.concatenate(parts) if parts else np.empty(0)
+
+def clean_chunks(chunks):
+    """Apply clean_data to every chunk."""
+    for chunk in chunks:
+        yield clean_data(chunk)
+
+def encode_chunks(chunks, encoder=None):
+    """Encode the categorical columns of every chunk with the fitted encoder."""
+    for chunk in chunks:
+        yield encode_categorical_features(chunk, encoder)
+
+def build_feature_chunks(chunks, feature_set, extra=None, dtype=np.float64):
+    """
+    Compute the feature matrix of every chunk
+    
+    Parameters:
+    -----------
+    chunks : iterable
+        Cleaned and encoded DataFrames
+    feature_set : FeatureSet
+        Compiled feature definitions
+    extra : dict, optional
+        Additional input columns for all rows (e.g. {'predicted_offerPrice': array}),
+        sliced to the rows of each chunk
+    dtype : numpy dtype, default=numpy.float64
+        Matrix dtype
+    
+    Yields:
+    -------
+    tuple
+        (chunk: pandas.DataFrame, X: numpy.ndarray)
+    """
+    offset = 0
+    for chunk in chunks:
+        chunk_extra = None
+        if extra:
+            chunk_extra = {name: np.asarray(values)[offset:offset + len(chunk)] for name, values in extra.items()}
+        yield chunk, feature_set.transform(chunk, chunk_extra, dtype=dtype)
+        offset += len(chunk)
+
+def transform_chunk(transformer, X):
+    """
+    Apply a fitted imputer, selector or scaler to a chunk matrix
+    
+    The streaming and float32 preprocessors work in place. Fitted sklearn objects
+    get the column names they were fitted with, so no feature name warnings are raised.
+    
+    Returns:
+    --------
+    numpy.ndarray
+        Transformed matrix (X itself where the transform is in place)
+    """
+    if isinstance(transformer, (StreamingImputer, Float32Imputer, Float32Scaler)):
+        return transformer.transform(X, copy=False)
+    names = getattr(transformer, 'feature_names_in_', None)
+    if names is not None and len(names) == X.shape[1]:
+        X_named = pd.DataFrame(X, columns=list(names), copy=False)
+    else:
+        X_named = X
+    if isinstance(transformer, (StandardScaler, RobustScaler)):
+        result = transformer.transform(X_named, copy=False)
+    else:
+        result = transformer.transform(X_named)
+    return np.asarray(result, dtype=X.dtype)
+
+def impute_chunks(items, imputer):
+    """Fill the missing values of every (chunk, X) pair."""
+    for chunk, X in items:
+        yield chunk, transform_chunk(imputer, X)
+
+def select_chunks(items, feature_selector):
+    """Keep the selected columns of every (chunk, X) pair."""
+    for chunk, X in items:
+        yield chunk, np.asarray(feature_selector.transform(X), dtype=X.dtype)
+
+def scale_chunks(items, scaler):
+    """Scale every (chunk, X) pair."""
+    for chunk, X in items:
+        yield chunk, transform_chunk(scaler, X)
+
+class ChunkedPipeline:
+    """
+    Fitted preprocessing applied to a stream of row chunks
+    
+    Chains clean -> encode -> engineer -> impute -> select -> scale as generators,
+    so only one chunk is in memory at a time regardless of the input size.
+    
+    Parameters:
+    -----------
+    feature_set : FeatureSet
+        Compiled feature definitions
+    imputer : fitted imputer
+        SimpleImputer, StreamingImputer or Float32Imputer
+    scaler : fitted scaler or None
+        StandardScaler, RobustScaler or Float32Scaler; None leaves the matrices
+        unscaled (e.g. while the scaler is still to be fitted on them)
+    encoder : CategoricalEncoder, optional
+        Fitted categorical encoder (default schema if None)
+    feature_selector : fitted selector, optional
+        Applied between imputation and scaling
+    dtype : numpy dtype, default=numpy.float64
+        Dtype of the feature matrices
+    """
+    def __init__(self, feature_set, imputer, scaler, encoder=None, feature_selector=None, dtype=np.float64):
+        self.feature_set = feature_set
+        self.imputer = imputer
+        self.scaler = scaler
+        self.encoder = encoder
+        self.feature_selector = feature_selector
+        self.dtype = dtype
+    
+    @property
+    def n_features_out(self):
+        """Number of columns of the transformed matrix."""
+        if self.scaler is not None:
+            return self.scaler.n_features_in_
+        if self.feature_selector is not None:
+            return int(np.sum(self.feature_selector.get_support()))
+        return len(self.feature_set.output_columns_)
+    
+    def transform(self, chunk, extra=None):
+        """
+        Transform one cleaned and encoded chunk
+        
+        Parameters:
+        -----------
+        chunk : pandas.DataFrame
+            Cleaned and encoded rows
+        extra : dict, optional
+            Additional input columns for the rows of this chunk (e.g. {'predicted_offerPrice': array})
+        
+        Returns:
+        --------
+        numpy.ndarray
+            Scaled feature matrix
+        """
+        X = transform_chunk(self.imputer, self.feature_set.transform(chunk, extra, dtype=self.dtype))
+        if self.feature_selector is not None:
+            X = np.asarray(self.feature_selector.transform(X), dtype=X.dtype)
+        return X if self.scaler is None else transform_chunk(self.scaler, X)
+    
+    def stream(self, chunks, extra=None):
+        """
+        Transform raw row chunks
+        
+        Parameters:
+        -----------
+        chunks : iterable
+            Raw DataFrames, e.g. from read_csv_chunks
+        extra : dict, optional
+            Additional input columns for all rows, see build_feature_chunks
+        
+        Yields:
+        -------
+        tuple
+            (chunk: cleaned and encoded pandas.DataFrame, X: scaled numpy.ndarray)
+        """
+        items = build_feature_chunks(encode_chunks(clean_chunks(chunks), self.encoder), self.feature_set,
+                                     extra, self.dtype)
+        items = impute_chunks(items, self.imputer)
+        if self.feature_selector is not None:
+            items = select_chunks(items, self.feature_selector)
+        return items if self.scaler is None else scale_chunks(items, self.scaler)
+    
+    def transform_to_memmap(self, chunks, n_rows, output_path, extra=None, slots=None):
+        """
+        Write the transformed matrix of all chunks to a memory-mapped .npy file
+        
+        Parameters:
+        -----------
+        chunks : iterable
+            Raw DataFrames
+        n_rows : int
+            Number of rows of the output matrix
+        output_path : str
+            Path of the .npy file to create
+        extra : dict, optional
+            Additional input columns for all rows, see build_feature_chunks
+        slots : numpy.ndarray, optional
+            Output row of every input row, -1 to leave the row out (e.g. to lay
+            out training rows before test rows). Rows are written in input order if None
+        
+        Returns:
+        --------
+        numpy.memmap
+            Transformed matrix of shape (n_rows, n_features_out)
+        """
+        X_out = np.lib.format.open_memmap(output_path, mode='w+', dtype=self.dtype,
+                                          shape=(n_rows, self.n_features_out))
+        offset, written = 0, 0
+        for _, X in self.stream(chunks, extra):
+            if slots is None:
+                X_out[offset:offset + len(X)] = X
+                written += len(X)
+            else:
+                chunk_slots = slots[offset:offset + len(X)]
+                keep = chunk_slots >= 0
+                X_out[chunk_slots[keep]] = X[keep]
+                written += int(keep.sum())
+            offset += len(X)
+        if written != n_rows:
+            raise ValueError(f"Expected {n_rows} rows, got {written}")
+        X_out.flush()
+        return X_out
+
+def iter_row_blocks(X, block_size):
+    """Yield consecutive row blocks of a (memory-mapped) matrix as in-memory arrays."""
+    for start in range(0, X.shape[0], block_size):
+        yield np.asarray(X[start:start + block_size])
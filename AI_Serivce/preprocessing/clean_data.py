@@ -1,6 +1,15 @@
 import numpy as np
 import pandas as pd
 
+from .feature_expressions import FEATURE_EXPRESSIONS, RATIO_FEATURES, evaluate_expression
+from .impute_missing import QuantileSketch
+
+# Heavy-tailed continuous fields and the engineered ratios. Binary flags and
+# category codes are never winsorized: a quantile bound could erase a rare category
+WINSORIZE_COLUMNS = ['investmentReceived', 'amountOnProspectus', 'commonEquity', 'blueSky', 'managementFee',
+                     'bookValue', 'totalAssets', 'totalRevenue', 'netIncome', 'roa', 'leverage',
+                     'priorFinancing', 'nPatents'] + [name for name, _ in RATIO_FEATURES]
+
 def normalize_ipo_size(data):
     """
     Apply log transformation to normalize IPO size
@@ -9,7 +18,7 @@ def normalize_ipo_size(data):
     -----------
     data : pandas.DataFrame
         DataFrame containing 'ipoSize' column
-        
+    
     Returns:
     --------
     pandas.DataFrame
@@ -18,11 +27,111 @@ def normalize_ipo_size(data):
     data_copy = data.copy()
     
     if 'ipoSize' in data_copy.columns:
-        data_copy['ipoSize_normalized'] = np.log(data_copy['ipoSize'] + 1)
+        data_copy['ipoSize_normalized'] = evaluate_expression(FEATURE_EXPRESSIONS['ipoSize_normalized'], data_copy)
         data_copy = data_copy.drop(columns=['ipoSize'])
     
     return data_copy
 
+class Winsorizer:
+    """
+    Per-column clipping bounds learned from mergeable quantile sketches
+    
+    The bounds are the lower and upper quantiles of each winsorized column,
+    estimated with one QuantileSketch per column, so they can be fitted over
+    chunks or merged from shards. Other columns get infinite bounds, and
+    transform clips the whole matrix with a single vectorized np.clip.
+    
+    Parameters:
+    -----------
+    quantile : float, default=0.01
+        Clip below the quantile and above 1 - quantile
+    columns : list, optional
+        Columns to winsorize (default: WINSORIZE_COLUMNS)
+    sketch_capacity : int, default=2048
+        Items per level of the quantile sketches
+    """
+    def __init__(self, quantile=0.01, columns=None, sketch_capacity=2048):
+        if not 0 < quantile < 0.5:
+            raise ValueError(f"quantile must be between 0 and 0.5, got {quantile}")
+        self.quantile = quantile
+        self.columns = list(columns or WINSORIZE_COLUMNS)
+        self.sketch_capacity = sketch_capacity
+    
+    def partial_fit(self, X, feature_names=None):
+        """
+        Add a chunk of rows to the quantile sketches
+        
+        Parameters:
+        -----------
+        X : pandas.DataFrame or numpy.ndarray
+            Chunk with the columns of the first chunk
+        feature_names : list, optional
+            Column names when X is an array
+        
+        Returns:
+        --------
+        Winsorizer
+            self
+        """
+        if not hasattr(self, 'feature_names_in_'):
+            names = list(X.columns) if isinstance(X, pd.DataFrame) else list(feature_names)
+            self.feature_names_in_ = np.asarray(names, dtype=object)
+            self.sketches_ = {col: QuantileSketch(self.sketch_capacity) for col in names if col in self.columns}
+            self._bounds = None
+        values = X.to_numpy(dtype=np.float64) if isinstance(X, pd.DataFrame) else np.asarray(X)
+        for idx, col in enumerate(self.feature_names_in_):
+            if col in self.sketches_:
+                self.sketches_[col].update(values[:, idx])
+        self._bounds = None
+        return self
+    
+    def fit(self, X, feature_names=None):
+        """Fit the bounds on X from scratch."""
+        for attribute in ['feature_names_in_', 'sketches_']:
+            self.__dict__.pop(attribute, None)
+        return self.partial_fit(X, feature_names)
+    
+    def merge(self, other):
+        """Add the sketches of a winsorizer fitted on other rows with the same columns."""
+        if not hasattr(self, 'feature_names_in_'):
+            self.feature_names_in_ = other.feature_names_in_
+            self.sketches_ = {col: QuantileSketch(self.sketch_capacity) for col in other.sketches_}
+        for col, sketch in other.sketches_.items():
+            self.sketches_[col].merge(sketch)
+        self._bounds = None
+        return self
+    
+    @property
+    def bounds_(self):
+        """(lower, upper) arrays aligned with feature_names_in_."""
+        if self._bounds is None:
+            lower = np.full(len(self.feature_names_in_), -np.inf)
+            upper = np.full(len(self.feature_names_in_), np.inf)
+            for idx, col in enumerate(self.feature_names_in_):
+                sketch = self.sketches_.get(col)
+                if sketch is not None and sketch.count > 0:
+                    lower[idx] = sketch.quantile(self.quantile)
+                    upper[idx] = sketch.quantile(1 - self.quantile)
+            self._bounds = (lower, upper)
+        return self._bounds
+    
+    def transform(self, X, copy=True):
+        """
+        Clip X to the fitted bounds (in place for float arrays with copy=False)
+        
+        Returns:
+        --------
+        pandas.DataFrame or numpy.ndarray
+            Clipped data, a DataFrame if X is one
+        """
+        lower, upper = self.bounds_
+        if isinstance(X, pd.DataFrame):
+            values = np.clip(X.to_numpy(dtype=np.float64), lower, upper)
+            return pd.DataFrame(values, columns=X.columns, index=X.index)
+        if copy:
+            return np.clip(X, lower, upper)
+        return np.clip(X, lower, upper, out=X)
+
 def clean_data(data):
     """
     Apply all data cleaning operations
@@ -31,7 +140,7 @@ def clean_data(data):
     -----------
     data : pandas.DataFrame
         Input data to be cleaned
-        
+    
     Returns:
     --------
     pandas.DataFrame
@@ -1,5 +1,443 @@
+import os
+import warnings
 import numpy as np
 import pandas as pd
+from scipy import sparse
+from sklearn.model_selection import KFold
+from joblib import load
+
+EXCHANGE_MAP = {
+    'AMEX': 0,
+    'NASDQ': 1,
+    'NYSE': 2
+}
+
+INDUSTRY_MAP = {
+    'Business Equipment -- Computers, Software, and Electronic Equipment': 0,
+    'Chemicals and Allied Products': 1,
+    "Consumer Durables -- Cars, TV's, Furniture, Household Appliances": 2,
+    'Consumer NonDurables -- Food, Tobacco, Textiles, Apparel, Leather, Toys': 3,
+    'Finance': 4,
+    'Healthcare, Medical Equipment, and Drugs': 5,
+    'Manufacturing -- Machinery, Trucks, Planes, Off Furn, Paper, Com Printing': 6,
+    'Oil, Gas, and Coal Extraction and Products': 7,
+    'Other': 8,
+    'Telephone and Television Transmission': 9,
+    'Utilities': 10,
+    'Wholesale, Retail, and Some Services (Laundries, Repair Shops)': 11
+}
+
+BOOLEAN_MAP = {
+    'FALSE': 0,
+    'TRUE': 1,
+    'false': 0,
+    'true': 1
+}
+
+# Flag columns that may arrive as TRUE/FALSE strings
+BOOLEAN_COLUMNS = ['egc', 'highTech', 'vc', 'pe', 'prominence']
+
+# Declared categories per column; codes are fixed by the schema, never inferred from data
+CATEGORICAL_SCHEMA = {
+    'exchange': EXCHANGE_MAP,
+    'industryFF12': INDUSTRY_MAP,
+    **{col: BOOLEAN_MAP for col in BOOLEAN_COLUMNS}
+}
+
+# Nominal columns that can be one-hot or target encoded instead of kept as ordinal codes
+NOMINAL_COLUMNS = ['exchange', 'industryFF12']
+
+def encode_values(values, mapping):
+    """
+    Encode raw values with a fixed category-to-code mapping
+    
+    The values are matched against the declared categories with one hash
+    lookup (pandas.Index.get_indexer) and the positions are mapped to codes
+    through a NumPy table, so the pass is linear in the number of rows. Numeric input is assumed to be
+    encoded already and is returned as float.
+    
+    Parameters:
+    -----------
+    values : array-like
+        Raw column values
+    mapping : dict
+        Category to integer code
+    
+    Returns:
+    --------
+    tuple
+        (codes: numpy.ndarray of float with NaN for missing or unknown values,
+         unknown: numpy.ndarray of bool marking non-missing values outside the schema)
+    """
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if values.dtype.kind in 'biuf':
+        return values.to_numpy(dtype=np.float64), np.zeros(len(values), dtype=bool)
+    
+    positions = pd.Index(list(mapping)).get_indexer(values)
+    table = np.append(np.fromiter(mapping.values(), dtype=np.float64, count=len(mapping)), np.nan)
+    unknown = (positions < 0) & values.notna().to_numpy()
+    return table[positions], unknown
+
+class UnknownCategoryError(ValueError):
+    """Raised for values outside the declared categories when handle_unknown='error'."""
+
+class CategoricalEncoder:
+    """
+    Schema-driven encoder for the categorical and TRUE/FALSE columns
+    
+    Only the columns declared in the schema are touched. Values outside the
+    declared categories are detected explicitly and either become NaN (with a
+    warning) or raise, depending on handle_unknown. The fitted encoder is saved
+    with the model artifacts so serving uses the categories seen in training.
+    
+    Parameters:
+    -----------
+    schema : dict, optional
+        Column to category-to-code mapping (default: CATEGORICAL_SCHEMA)
+    handle_unknown : str, default='nan'
+        'nan' encodes unknown categories as missing, 'error' raises UnknownCategoryError
+    """
+    def __init__(self, schema=None, handle_unknown='nan'):
+        if handle_unknown not in ['nan', 'error']:
+            raise ValueError(f"handle_unknown must be 'nan' or 'error', got '{handle_unknown}'")
+        self.schema = {col: dict(mapping) for col, mapping in (schema or CATEGORICAL_SCHEMA).items()}
+        self.handle_unknown = handle_unknown
+    
+    def fit(self, data):
+        """Record the per-category training counts of the declared columns present in data."""
+        self.columns_ = [col for col in self.schema if col in data.columns]
+        self.category_counts_ = {}
+        return self.partial_fit(data)
+    
+    def partial_fit(self, data):
+        """Add the per-category counts of a chunk of training rows."""
+        if not hasattr(self, 'columns_'):
+            return self.fit(data)
+        for col in self.columns_:
+            codes, unknown = encode_values(data[col], self.schema[col])
+            known = codes[~np.isnan(codes)].astype(np.int64)
+            counts = np.bincount(known, minlength=len(set(self.schema[col].values())))
+            previous = self.category_counts_.get(col, {'counts': np.zeros_like(counts).tolist(), 'unknown': 0})
+            self.category_counts_[col] = {
+                'counts': (counts + np.asarray(previous['counts'], dtype=np.int64)).tolist(),
+                'unknown': previous['unknown'] + int(unknown.sum())
+            }
+        return self
+    
+    def find_unknown_categories(self, data):
+        """
+        Return the values of each declared column that are not in the schema
+        
+        Returns:
+        --------
+        dict
+            Column name to array of unique unknown values (only columns with unknowns)
+        """
+        unknown_values = {}
+        for col in self.schema:
+            if col in data.columns:
+                _, unknown = encode_values(data[col], self.schema[col])
+                if unknown.any():
+                    unknown_values[col] = pd.unique(data[col].to_numpy()[unknown])
+        return unknown_values
+    
+    def encode_column(self, col, values, mapping=None):
+        """
+        Encode the raw values of one column, handling unknown categories
+        
+        Parameters:
+        -----------
+        col : str
+            Column name (used in the message)
+        values : array-like
+            Raw column values
+        mapping : dict, optional
+            Category to code mapping (default: the schema entry of col)
+        
+        Returns:
+        --------
+        numpy.ndarray
+            Float codes, NaN for missing values (and unknown ones with handle_unknown='nan')
+        
+        Raises:
+        -------
+        UnknownCategoryError
+            If values holds unknown categories and handle_unknown='error'
+        """
+        codes, unknown = encode_values(values, mapping if mapping is not None else self.schema[col])
+        if unknown.any():
+            examples = list(pd.unique(np.asarray(values, dtype=object)[unknown])[:5])
+            message = f"{int(unknown.sum())} unknown categories in '{col}': {examples}"
+            if self.handle_unknown == 'error':
+                raise UnknownCategoryError(message)
+            warnings.warn(message + " (encoded as missing)")
+        return codes
+    
+    def transform(self, data):
+        """
+        Encode the declared columns present in data
+        
+        Parameters:
+        -----------
+        data : pandas.DataFrame
+            Input data
+        
+        Returns:
+        --------
+        pandas.DataFrame
+            Copy of data with the declared columns encoded as float codes
+        """
+        data_copy = data.copy()
+        for col, mapping in self.schema.items():
+            # Numeric columns are encoded already
+            if col not in data_copy.columns or data_copy[col].dtype.kind in 'biuf':
+                continue
+            data_copy[col] = self.encode_column(col, data_copy[col], mapping)
+        return data_copy
+    
+    def fit_transform(self, data):
+        """Fit on data and return it encoded."""
+        return self.fit(data).transform(data)
+
+def _nominal_codes(data, col, mapping):
+    """Return integer codes of a nominal column, -1 for missing or unknown values."""
+    codes, _ = encode_values(data[col], mapping)
+    n_categories = len(set(mapping.values()))
+    valid = ~np.isnan(codes) & (codes >= 0) & (codes < n_categories)
+    return np.where(valid, codes, -1).astype(np.int64)
+
+class SparseOneHotEncoder:
+    """
+    One-hot encoder for the nominal columns producing CSR matrices
+    
+    Works on the schema codes (or raw category strings), so every category has a
+    fixed output column. Missing and unknown values have no active column.
+    
+    Parameters:
+    -----------
+    columns : list, optional
+        Columns to encode (default: NOMINAL_COLUMNS)
+    schema : dict, optional
+        Column to category-to-code mapping (default: CATEGORICAL_SCHEMA)
+    sparse_output : 'auto' or bool, default='auto'
+        Whether append_to returns a CSR matrix; 'auto' decides with use_sparse
+    """
+    def __init__(self, columns=None, schema=None, sparse_output='auto'):
+        self.columns = list(columns or NOMINAL_COLUMNS)
+        self.schema = schema or CATEGORICAL_SCHEMA
+        self.sparse_output = sparse_output
+    
+    def fit(self, data):
+        """Fix the output layout for the encoded columns present in data."""
+        self.columns_ = [col for col in self.columns if col in data.columns]
+        self.n_categories_ = [len(set(self.schema[col].values())) for col in self.columns_]
+        self.offsets_ = np.concatenate([[0], np.cumsum(self.n_categories_)]).astype(np.int64)
+        self.feature_names_ = []
+        for col in self.columns_:
+            names = {}
+            for category, code in self.schema[col].items():
+                names.setdefault(code, f'{col}={category}')
+            self.feature_names_.extend(names[code] for code in sorted(names))
+        return self
+    
+    def transform(self, data):
+        """
+        Encode the nominal columns of data
+        
+        Returns:
+        --------
+        scipy.sparse.csr_matrix
+            One-hot matrix of shape (n_rows, total categories)
+        """
+        n_rows = len(data)
+        codes = np.column_stack([
+            _nominal_codes(data, col, self.schema[col]) for col in self.columns_
+        ]) if self.columns_ else np.empty((n_rows, 0), dtype=np.int64)
+        
+        # Row-major scan keeps the column indices of every row sorted
+        active = codes >= 0
+        indices = (codes + self.offsets_[:-1])[active]
+        indptr = np.concatenate([[0], np.cumsum(active.sum(axis=1))])
+        values = np.ones(len(indices), dtype=np.float64)
+        return sparse.csr_matrix((values, indices, indptr), shape=(n_rows, int(self.offsets_[-1])))
+    
+    def use_sparse(self, n_dense):
+        """
+        Whether append_to joins the features as CSR for n_dense numeric columns
+        
+        XGBoost reads an absent sparse entry as missing, not as zero, so the
+        numeric values must be stored as explicit CSR entries: about 12 bytes per
+        numeric value and active category, against 8 bytes per column in a dense
+        row. CSR is smaller only when the one-hot block is wider than about half
+        the numeric columns plus 1.5 columns per nominal column, e.g. with
+        high-cardinality categories. With the default schema (15 categories for
+        ~30 numeric features) the dense matrix is smaller, so 'auto' stays dense.
+        The layout only depends on the column counts, so training and prediction
+        agree.
+        """
+        # Encoders saved before sparse_output existed always built CSR matrices
+        sparse_output = getattr(self, 'sparse_output', True)
+        if sparse_output != 'auto':
+            return bool(sparse_output)
+        dense_bytes = 8 * (n_dense + int(self.offsets_[-1]))
+        sparse_bytes = 12 * (n_dense + len(self.columns_)) + 4
+        return sparse_bytes < dense_bytes
+    
+    def append_to(self, X, data):
+        """
+        Append the one-hot block of data to a dense feature matrix
+        
+        The result stays dense unless use_sparse finds the CSR layout smaller. In
+        a CSR result the dense values are stored explicitly, including zeros, so
+        models that treat absent sparse entries as missing (XGBoost) see the same
+        numeric features.
+        
+        Parameters:
+        -----------
+        X : numpy.ndarray
+            Dense features, one row per row of data
+        data : pandas.DataFrame
+            Rows holding the nominal columns
+        
+        Returns:
+        --------
+        numpy.ndarray or scipy.sparse.csr_matrix
+            Matrix of shape (n_rows, n_dense + total categories)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        one_hot = self.transform(data)
+        n_rows, n_dense = X.shape
+        if not self.use_sparse(n_dense):
+            return np.hstack([X, one_hot.toarray()])
+        
+        # Every numeric value as an explicit entry, then the one-hot block
+        numeric = sparse.csr_matrix((X.ravel(), np.tile(np.arange(n_dense), n_rows),
+                                     np.arange(0, n_rows * n_dense + 1, n_dense)), shape=X.shape)
+        return sparse.hstack([numeric, one_hot], format='csr')
+
+class TargetEncoder:
+    """
+    Out-of-fold target encoder for the nominal columns
+    
+    Each category is replaced by a smoothed mean of the target:
+    (sum + smoothing * prior) / (count + smoothing). Training rows get
+    out-of-fold encodings, so a row's own target never contributes to its
+    feature. The per-category sums and counts are computed once with
+    np.bincount and the full-data encodings are saved for serving. Missing and
+    unknown categories get the prior.
+    
+    Parameters:
+    -----------
+    columns : list, optional
+        Columns to encode (default: NOMINAL_COLUMNS)
+    n_folds : int, default=5
+        Number of folds for the out-of-fold encodings
+    smoothing : float, default=10.0
+        Weight of the prior, in rows
+    random_state : int, default=42
+        Random seed for the fold assignment
+    schema : dict, optional
+        Column to category-to-code mapping (default: CATEGORICAL_SCHEMA)
+    """
+    def __init__(self, columns=None, n_folds=5, smoothing=10.0, random_state=42, schema=None):
+        self.columns = list(columns or NOMINAL_COLUMNS)
+        self.n_folds = n_folds
+        self.smoothing = smoothing
+        self.random_state = random_state
+        self.schema = schema or CATEGORICAL_SCHEMA
+    
+    def _statistics(self, codes, y, n_categories):
+        """Per-category target sums and counts of the rows with a known category."""
+        known = codes >= 0
+        sums = np.bincount(codes[known], weights=y[known], minlength=n_categories)
+        counts = np.bincount(codes[known], minlength=n_categories).astype(np.float64)
+        return sums, counts
+    
+    def _encode(self, codes, sums, counts, prior):
+        encodings = np.append((sums + self.smoothing * prior) / (counts + self.smoothing), prior)
+        return encodings[np.where(codes >= 0, codes, len(sums))]
+    
+    def fit(self, X, y):
+        """Compute and store the full-data per-category statistics."""
+        self.fit_transform(X, y)
+        return self
+    
+    def fit_transform(self, X, y):
+        """
+        Fit the encoder and return X with out-of-fold encodings
+        
+        Parameters:
+        -----------
+        X : pandas.DataFrame
+            Features holding the nominal columns
+        y : pandas.Series or numpy.ndarray
+            Target variable
+        
+        Returns:
+        --------
+        pandas.DataFrame
+            Copy of X with the nominal columns replaced by their encodings
+        """
+        y = np.asarray(y, dtype=np.float64)
+        self.columns_ = [col for col in self.columns if col in X.columns]
+        self.prior_ = float(y.mean())
+        self.sums_, self.counts_, self.encodings_ = {}, {}, {}
+        
+        folds = list(KFold(n_splits=self.n_folds, shuffle=True, random_state=self.random_state).split(y))
+        X_encoded = X.copy()
+        for col in self.columns_:
+            mapping = self.schema[col]
+            n_categories = len(set(mapping.values()))
+            codes = _nominal_codes(X, col, mapping)
+            sums, counts = self._statistics(codes, y, n_categories)
+            
+            # Out-of-fold statistics are the full statistics minus the fold's own rows
+            encoded = np.empty(len(y), dtype=np.float64)
+            for _, fold_idx in folds:
+                fold_sums, fold_counts = self._statistics(codes[fold_idx], y[fold_idx], n_categories)
+                out_of_fold_prior = (y.sum() - y[fold_idx].sum()) / (len(y) - len(fold_idx))
+                encoded[fold_idx] = self._encode(codes[fold_idx], sums - fold_sums, counts - fold_counts,
+                                                 out_of_fold_prior)
+            X_encoded[col] = encoded
+            
+            self.sums_[col] = sums
+            self.counts_[col] = counts
+            self.encodings_[col] = (sums + self.smoothing * self.prior_) / (counts + self.smoothing)
+        return X_encoded
+    
+    def transform(self, X):
+        """Return a copy of X with the nominal columns replaced by the full-data encodings."""
+        X_encoded = X.copy()
+        for col in self.columns_:
+            if col in X_encoded.columns:
+                codes = _nominal_codes(X_encoded, col, self.schema[col])
+                table = np.append(self.encodings_[col], self.prior_)
+                X_encoded[col] = table[np.where(codes >= 0, codes, len(table) - 1)]
+        return X_encoded
+
+def load_categorical_encoder(filename, loader=None):
+    """
+    Load the encoder saved with the model artifacts
+    
+    Parameters:
+    -----------
+    filename : str
+        Path to categorical_encoder.joblib in the model directory
+    loader : callable, optional
+        Returns the object saved at a path, or None if there is none (e.g.
+        models.artifact_store.load_artifact_path). Default: the joblib file at filename
+    
+    Returns:
+    --------
+    CategoricalEncoder
+        Saved encoder, or an encoder with the default schema for artifacts
+        trained before the encoder was saved
+    """
+    if loader is None:
+        encoder = load(filename) if os.path.exists(filename) else None
+    else:
+        encoder = loader(filename)
+    return encoder if encoder is not None else CategoricalEncoder()
 
 def encode_exchange(data):
     """
@@ -9,24 +447,13 @@ def encode_exchange(data):
     -----------
     data : pandas.DataFrame
         DataFrame containing 'exchange' column
-        
+    
     Returns:
     --------
     pandas.DataFrame
         DataFrame with encoded 'exchange' column
     """
-    if 'exchange' not in data.columns:
-        return data
-        
-    exchange_map = {
-        'AMEX': 0,
-        'NASDQ': 1,
-        'NYSE': 2
-    }
-    
-    data_copy = data.copy()
-    data_copy['exchange'] = data_copy['exchange'].map(exchange_map)
-    return data_copy
+    return CategoricalEncoder({'exchange': EXCHANGE_MAP}).transform(data)
 
 def encode_industry(data):
     """
@@ -36,61 +463,34 @@ def encode_industry(data):
     -----------
     data : pandas.DataFrame
         DataFrame containing 'industryFF12' column
-        
+    
     Returns:
     --------
     pandas.DataFrame
         DataFrame with encoded 'industryFF12' column
     """
-    if 'industryFF12' not in data.columns:
-        return data
-        
-    industry_map = {
-        'Business Equipment -- Computers, Software, and Electronic Equipment': 0,
-        'Chemicals and Allied Products': 1,
-        "Consumer Durables -- Cars, TV's, Furniture, Household Appliances": 2,
-        'Consumer NonDurables -- Food, Tobacco, Textiles, Apparel, Leather, Toys': 3,
-        'Finance': 4,
-        'Healthcare, Medical Equipment, and Drugs': 5,
-        'Manufacturing -- Machinery, Trucks, Planes, Off Furn, Paper, Com Printing': 6,
-        'Oil, Gas, and Coal Extraction and Products': 7,
-        'Other': 8,
-        'Telephone and Television Transmission': 9,
-        'Utilities': 10,
-        'Wholesale, Retail, and Some Services (Laundries, Repair Shops)': 11
-    }
-    
-    data_copy = data.copy()
-    data_copy['industryFF12'] = data_copy['industryFF12'].map(industry_map)
-    return data_copy
+    return CategoricalEncoder({'industryFF12': INDUSTRY_MAP}).transform(data)
 
-def encode_boolean_columns(data):
+def encode_boolean_columns(data, columns=None):
     """
-    Convert boolean columns to numeric (1/0)
+    Convert the declared TRUE/FALSE columns to numeric (1/0)
     
     Parameters:
     -----------
     data : pandas.DataFrame
-        DataFrame with potential boolean columns
-        
+        DataFrame with boolean columns
+    columns : list, optional
+        Columns to convert (default: BOOLEAN_COLUMNS)
+    
     Returns:
     --------
     pandas.DataFrame
         DataFrame with boolean columns converted to 1/0
     """
-    data_copy = data.copy()
-    
-    for col in data_copy.columns:
-        if data_copy[col].dtype == object:
-            unique_vals = set(data_copy[col].dropna().unique())
-            if unique_vals == {'TRUE', 'FALSE'}:
-                data_copy[col] = data_copy[col].map({'TRUE': 1, 'FALSE': 0})
-            elif unique_vals == {'true', 'false'}:
-                data_copy[col] = data_copy[col].map({'true': 1, 'false': 0})
-                
-    return data_copy
+    schema = {col: BOOLEAN_MAP for col in (columns or BOOLEAN_COLUMNS)}
+    return CategoricalEncoder(schema).transform(data)
 
-def encode_categorical_features(data):
+def encode_categorical_features(data, encoder=None):
     """
     Apply all categorical encoding transformations
     
@@ -98,14 +498,14 @@ def encode_categorical_features(data):
     -----------
     data : pandas.DataFrame
         Input data
-        
+    encoder : CategoricalEncoder, optional
+        Fitted encoder saved with the model artifacts. The default schema is
+        used if None
+    
     Returns:
     --------
     pandas.DataFrame
         DataFrame with all categorical features encoded
     """
-    data = encode_exchange(data)
-    data = encode_industry(data)
-    data = encode_boolean_columns(data)
-    
-    return data
+    encoder = encoder or CategoricalEncoder()
+    return encoder.transform(data)
@@ -1,7 +1,12 @@
+import os
+import json
+import hashlib
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.feature_selection import SelectFromModel
+from sklearn.inspection import permutation_importance
+from sklearn.model_selection import train_test_split
+
+from .feature_expressions import FeatureSet, RATIO_FEATURES
 
 def create_interaction_features(X):
     """
@@ -11,48 +16,172 @@ def create_interaction_features(X):
     -----------
     X : pandas.DataFrame
         Input feature DataFrame
-        
+    
     Returns:
     --------
     pandas.DataFrame
         DataFrame with added interaction features
     """
-    X_copy = X.copy()
+    # Ratio features are declared in feature_expressions and computed into one block
+    ratios = FeatureSet(RATIO_FEATURES).transform_frame(X)
+    return pd.concat([X, ratios], axis=1)
+
+class FeatureMask:
+    """
+    Fixed boolean feature mask with the transform interface of a fitted sklearn selector
     
-    # Create interaction features
-    X_copy['revenue_per_asset'] = X_copy['totalRevenue'] / (X_copy['totalAssets'] + 1e-6)
-    X_copy['income_per_revenue'] = X_copy['netIncome'] / (X_copy['totalRevenue'] + 1e-6)
-    X_copy['equity_per_asset'] = X_copy['commonEquity'] / (X_copy['totalAssets'] + 1e-6)
-    X_copy['investment_per_share'] = X_copy['investmentReceived'] / (X_copy['sharesOfferedPerc'] + 1e-6)
+    Parameters:
+    -----------
+    support : array-like of bool
+        Mask of the selected features
+    feature_names : list, optional
+        Names of all input features
+    provenance : dict, optional
+        How the mask was computed (method, estimator, threshold, data hash, importances)
+    """
+    def __init__(self, support, feature_names=None, provenance=None):
+        self.support_ = np.asarray(support, dtype=bool)
+        self.n_features_in_ = len(self.support_)
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.provenance = provenance or {}
     
-    # Create ratio features
-    X_copy['vc_to_exec_ratio'] = X_copy['nVCs'] / (X_copy['nExecutives'] + 1e-6)
-    X_copy['patent_to_revenue'] = X_copy['nPatents'] / (X_copy['totalRevenue'] + 1e-6)
+    def get_support(self, indices=False):
+        """Return the mask, or the indices of the selected features if indices=True."""
+        return np.flatnonzero(self.support_) if indices else self.support_
     
-    return X_copy
+    def transform(self, X):
+        """Keep only the selected columns of X."""
+        return np.asarray(X)[:, self.support_]
+
+def hash_training_data(X, y):
+    """Return a SHA-256 digest identifying a feature matrix and target vector."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(np.asarray(X, dtype=np.float64)).tobytes())
+    digest.update(np.ascontiguousarray(np.asarray(y, dtype=np.float64)).tobytes())
+    return digest.hexdigest()
 
-def select_features(X, y, threshold='median'):
+def compute_feature_importances(estimator, X, y, method='model', cache_dir=None, n_repeats=5, random_state=42):
     """
-    Select important features using Random Forest feature importance
+    Compute feature importances from a quick fit of the given estimator
     
     Parameters:
     -----------
+    estimator : estimator object
+        Unfitted regressor, typically a reduced-budget version of the model being trained
     X : pandas.DataFrame or numpy.ndarray
         Features
     y : pandas.Series or numpy.ndarray
         Target variable
+    method : str, default='model'
+        'model' uses the estimator's feature_importances_, 'permutation' computes
+        permutation importances on a held-out split in parallel
+    cache_dir : str, optional
+        Directory to cache importances in, keyed by data hash, estimator and method
+    n_repeats : int, default=5
+        Number of permutations per feature for the 'permutation' method
+    random_state : int, default=42
+        Random seed for the held-out split and permutations
+    
+    Returns:
+    --------
+    tuple
+        (importances: numpy.ndarray, provenance: dict)
+    """
+    data_hash = hash_training_data(X, y)
+    params = {key: repr(value) for key, value in sorted(estimator.get_params().items()) if value is not None}
+    provenance = {
+        'method': method,
+        'estimator': type(estimator).__name__,
+        'estimator_params': params,
+        'n_rows': int(len(y)),
+        'data_hash': data_hash,
+        'random_state': random_state
+    }
+    
+    cache_path = None
+    if cache_dir is not None:
+        key = hashlib.sha256(json.dumps(provenance, sort_keys=True).encode()).hexdigest()[:16]
+        cache_path = os.path.join(cache_dir, f'importances_{key}.npy')
+        if os.path.exists(cache_path):
+            provenance['cached'] = True
+            return np.load(cache_path), provenance
+    
+    if method == 'model':
+        estimator.fit(X, y)
+        importances = np.asarray(estimator.feature_importances_, dtype=np.float64)
+    elif method == 'permutation':
+        X_fit, X_valid, y_fit, y_valid = train_test_split(X, y, test_size=0.2, random_state=random_state)
+        estimator.fit(X_fit, y_fit)
+        result = permutation_importance(estimator, X_valid, y_valid, n_repeats=n_repeats,
+                                        random_state=random_state, n_jobs=-1)
+        importances = result.importances_mean
+    else:
+        raise ValueError(f"Unknown importance method '{method}'")
+    
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(cache_path, importances)
+    
+    provenance['cached'] = False
+    return importances, provenance
+
+def select_features(X, y, estimator, threshold='median', method='model', cache_dir=None, random_state=42,
+                    feature_names=None):
+    """
+    Select important features using importances from a quick fit of the given estimator
+    
+    Parameters:
+    -----------
+    X : pandas.DataFrame or numpy.ndarray
+        Features
+    y : pandas.Series or numpy.ndarray
+        Target variable
+    estimator : estimator object
+        Unfitted regressor used for the quick importance pass
     threshold : str or float, default='median'
-        Threshold for feature selection
-        
+        Features with importance >= threshold are kept. 'median' and 'mean' use
+        the median/mean importance
+    method : str, default='model'
+        Importance method, see compute_feature_importances
+    cache_dir : str, optional
+        Directory to cache importances in
+    random_state : int, default=42
+        Random seed for the permutation method
+    feature_names : list, optional
+        Column names when X is a numpy array
+    
     Returns:
     --------
-    sklearn.feature_selection.SelectFromModel
-        Fitted feature selector
+    FeatureMask
+        Fitted feature selector with its provenance
     """
-    selector = RandomForestRegressor(n_estimators=100, random_state=42)
-    selector = SelectFromModel(selector, threshold=threshold)
-    selector.fit(X, y)
-    return selector
+    importances, provenance = compute_feature_importances(
+        estimator, X, y, method=method, cache_dir=cache_dir, random_state=random_state
+    )
+    
+    if threshold == 'median':
+        threshold_value = float(np.median(importances))
+    elif threshold == 'mean':
+        threshold_value = float(np.mean(importances))
+    else:
+        threshold_value = float(threshold)
+    
+    if hasattr(X, 'columns'):
+        feature_names = list(X.columns)
+    named = feature_names is not None
+    if not named:
+        feature_names = [f'feature_{i}' for i in range(X.shape[1])]
+    support = importances >= threshold_value
+    
+    provenance.update({
+        'threshold': threshold,
+        'threshold_value': threshold_value,
+        'importances': {name: float(value) for name, value in zip(feature_names, importances)},
+        'selected_features': [name for name, keep in zip(feature_names, support) if keep]
+    })
+    
+    return FeatureMask(support, feature_names if named else None, provenance)
 
 def apply_feature_engineering(X):
     """
@@ -62,7 +191,7 @@ def apply_feature_engineering(X):
     -----------
     X : pandas.DataFrame
         Input features
-        
+    
     Returns:
     --------
     pandas.DataFrame
@@ -0,0 +1,355 @@
+import os
+import ast
+import numpy as np
+import pandas as pd
+from joblib import load
+
+from .encode_categorical import BOOLEAN_MAP, CategoricalEncoder
+
+# Derived features declared once for training, batch prediction and the API
+SIZE_FEATURES = [
+    ('ipoSize_normalized', 'log1p(ipoSize)')
+]
+
+RATIO_FEATURES = [
+    ('revenue_per_asset', 'totalRevenue / (totalAssets + 1e-6)'),
+    ('income_per_revenue', 'netIncome / (totalRevenue + 1e-6)'),
+    ('equity_per_asset', 'commonEquity / (totalAssets + 1e-6)'),
+    ('investment_per_share', 'investmentReceived / (sharesOfferedPerc + 1e-6)'),
+    ('vc_to_exec_ratio', 'nVCs / (nExecutives + 1e-6)'),
+    ('patent_to_revenue', 'nPatents / (totalRevenue + 1e-6)')
+]
+
+FEATURE_EXPRESSIONS = dict(SIZE_FEATURES + RATIO_FEATURES)
+
+_BINARY_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Pow: np.power
+}
+
+_UNARY_OPS = {
+    ast.USub: np.negative
+}
+
+_FUNCTIONS = {
+    'log1p': np.log1p,
+    'log': np.log,
+    'exp': np.exp,
+    'sqrt': np.sqrt,
+    'abs': np.abs
+}
+
+def _compile_node(node, inputs):
+    """Turn an expression node into a function (env, out=None) -> array or scalar."""
+    if isinstance(node, ast.Name):
+        name = node.id
+        inputs.append(name)
+        return lambda env, out=None: env[name]
+    
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        value = float(node.value)
+        return lambda env, out=None: value
+    
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        ufunc = _BINARY_OPS[type(node.op)]
+        left = _compile_node(node.left, inputs)
+        right = _compile_node(node.right, inputs)
+        return lambda env, out=None: ufunc(left(env), right(env), out=out)
+    
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        ufunc = _UNARY_OPS[type(node.op)]
+        operand = _compile_node(node.operand, inputs)
+        return lambda env, out=None: ufunc(operand(env), out=out)
+    
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS
+            and len(node.args) == 1 and not node.keywords):
+        ufunc = _FUNCTIONS[node.func.id]
+        argument = _compile_node(node.args[0], inputs)
+        return lambda env, out=None: ufunc(argument(env), out=out)
+    
+    raise ValueError(f"Unsupported feature expression element: {ast.dump(node)}")
+
+def compile_expression(expression):
+    """
+    Compile a feature expression into a vectorized NumPy kernel
+    
+    Expressions may use column names, numeric constants, + - * / ** and the
+    functions log1p, log, exp, sqrt and abs. Every operation is a NumPy ufunc,
+    and the outermost one writes straight into the output column.
+    
+    Parameters:
+    -----------
+    expression : str
+        Feature expression, e.g. 'netIncome / (totalRevenue + 1e-6)'
+    
+    Returns:
+    --------
+    tuple
+        (kernel: function (env, out) filling out from the input columns in env,
+         inputs: list of the referenced column names)
+    """
+    inputs = []
+    evaluate = _compile_node(ast.parse(expression, mode='eval').body, inputs)
+    
+    def kernel(env, out):
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            result = evaluate(env, out)
+        if result is not out:
+            out[...] = result
+        return out
+    
+    return kernel, list(dict.fromkeys(inputs))
+
+def evaluate_expression(expression, data):
+    """
+    Evaluate a feature expression on the numeric columns of a DataFrame
+    
+    Parameters:
+    -----------
+    expression : str
+        Feature expression
+    data : pandas.DataFrame
+        Input data containing every referenced column
+    
+    Returns:
+    --------
+    numpy.ndarray
+        Feature values
+    """
+    kernel, inputs = compile_expression(expression)
+    env = {name: data[name].to_numpy(dtype=np.float64) for name in inputs}
+    return kernel(env, np.empty(len(data), dtype=np.float64))
+
+class FeatureSet:
+    """
+    Ordered feature definitions compiled into kernels that fill one matrix
+    
+    Each feature is either passed through from the input data (expression None)
+    or computed from an expression. Only the definitions and the optional
+    winsorization bounds are pickled; the kernels are recompiled on load, so a
+    saved FeatureSet reproduces the training features exactly.
+    
+    Parameters:
+    -----------
+    features : list
+        (name, expression or None) pairs in output order
+    """
+    def __init__(self, features):
+        self.features = [(name, expression) for name, expression in features]
+        self.clip_bounds = None
+        self._compile()
+    
+    def _compile(self):
+        self.output_columns_ = [name for name, _ in self.features]
+        self._kernels = {
+            name: compile_expression(expression)[0]
+            for name, expression in self.features if expression is not None
+        }
+    
+    def __getstate__(self):
+        return {'features': self.features, 'clip_bounds': self.clip_bounds}
+    
+    def __setstate__(self, state):
+        self.features = state['features']
+        self.clip_bounds = state.get('clip_bounds')
+        self._compile()
+    
+    def set_clip_bounds(self, lower, upper):
+        """
+        Clip every computed matrix to per-column bounds
+        
+        Parameters:
+        -----------
+        lower, upper : numpy.ndarray
+            Bounds aligned with output_columns_ (-inf/inf for unclipped columns),
+            or None to disable clipping
+        """
+        if lower is None:
+            self.clip_bounds = None
+        else:
+            self.clip_bounds = (np.asarray(lower, dtype=np.float64), np.asarray(upper, dtype=np.float64))
+    
+    def transform(self, data, extra=None, rows=None, dtype=np.float64, encoder=None):
+        """
+        Compute all features into a preallocated Fortran-ordered matrix
+        
+        Non-numeric input columns are encoded on the fly with the categorical
+        encoder, so raw data can be passed directly. Unknown categories are
+        handled by the encoder's handle_unknown (warning or UnknownCategoryError). A derived feature that is
+        already a column of data is passed through unchanged. If clip bounds are
+        set, the finished matrix is winsorized with one np.clip call.
+        
+        Parameters:
+        -----------
+        data : pandas.DataFrame
+            Input rows
+        extra : dict, optional
+            Additional input columns aligned with data, e.g. {'predicted_offerPrice': array}
+        rows : numpy.ndarray, optional
+            Row positions to take from data, in output order. All rows if None
+        dtype : numpy dtype, default=numpy.float64
+            Output dtype
+        encoder : CategoricalEncoder, optional
+            Fitted encoder saved with the model artifacts (default: CATEGORICAL_SCHEMA,
+            unknown categories encoded as missing with a warning)
+        
+        Returns:
+        --------
+        numpy.ndarray
+            Feature matrix of shape (n_rows, len(output_columns_))
+        """
+        extra = extra or {}
+        encoder = encoder or CategoricalEncoder()
+        n_rows = len(data) if rows is None else len(rows)
+        X = np.empty((n_rows, len(self.features)), dtype=dtype, order='F')
+        env = {}
+        
+        def column(name):
+            if name not in env:
+                if name in extra:
+                    values = np.asarray(extra[name], dtype=np.float64)
+                elif name in data.columns:
+                    values = data[name].to_numpy()
+                    if values.dtype.kind not in 'biuf':
+                        values = encoder.encode_column(name, values, encoder.schema.get(name, BOOLEAN_MAP))
+                else:
+                    values = np.full(len(data), np.nan)
+                env[name] = values if rows is None else values[rows]
+            return env[name]
+        
+        for idx, (name, expression) in enumerate(self.features):
+            out = X[:, idx]
+            if expression is None or name in extra or name in data.columns:
+                out[:] = column(name)
+            else:
+                self._kernels[name](_ColumnLookup(column), out)
+            # Later expressions may refer to this feature
+            env[name] = out
+        
+        if self.clip_bounds is not None:
+            np.clip(X, self.clip_bounds[0], self.clip_bounds[1], out=X)
+        return X
+    
+    def missing_inputs(self, columns, extra=()):
+        """
+        Input columns needed by the features that are absent from columns
+        
+        transform fills absent inputs with NaN; callers that must not score such
+        rows (e.g. a file with none of the model's columns) check with this first.
+        
+        Parameters:
+        -----------
+        columns : iterable
+            Columns of the input data
+        extra : iterable, default=()
+            Names that will be passed as extra columns, e.g. 'predicted_offerPrice'
+        
+        Returns:
+        --------
+        list
+            Missing input column names, in feature order
+        """
+        available = set(columns) | set(extra)
+        missing = []
+        for name, expression in self.features:
+            if name in available:
+                continue
+            inputs = [name] if expression is None else compile_expression(expression)[1]
+            absent = [col for col in inputs if col not in available]
+            if absent:
+                missing.extend(col for col in absent if col not in missing)
+            else:
+                # Later expressions may refer to this feature
+                available.add(name)
+        return missing
+    
+    def transform_frame(self, data, extra=None, dtype=np.float64, encoder=None):
+        """Compute all features and wrap the matrix in a DataFrame indexed like data."""
+        X = self.transform(data, extra, dtype=dtype, encoder=encoder)
+        return pd.DataFrame(X, columns=self.output_columns_, index=data.index, copy=False)
+
+class _ColumnLookup:
+    """Mapping interface over a column getter, used as the kernel environment."""
+    def __init__(self, getter):
+        self.getter = getter
+    
+    def __getitem__(self, name):
+        return self.getter(name)
+
+def build_feature_set(columns, apply_fe=False, with_offer_predictions=False):
+    """
+    Feature definitions used by training
+    
+    The order matches the original pipeline: input columns, ipoSize_normalized,
+    the predicted offer price, then the engineered ratios.
+    
+    Parameters:
+    -----------
+    columns : list
+        Input feature names ('ipoSize' or 'ipoSize_normalized' adds the size feature)
+    apply_fe : bool, default=False
+        Whether to add the engineered ratio features
+    with_offer_predictions : bool, default=False
+        Whether to add 'predicted_offerPrice'
+    
+    Returns:
+    --------
+    FeatureSet
+        Compiled feature definitions
+    """
+    features = [(col, None) for col in columns if col not in ['ipoSize', 'ipoSize_normalized']]
+    if 'ipoSize' in columns or 'ipoSize_normalized' in columns:
+        features.extend(SIZE_FEATURES)
+    if with_offer_predictions:
+        features.append(('predicted_offerPrice', None))
+    if apply_fe:
+        features.extend(RATIO_FEATURES)
+    return FeatureSet(features)
+
+def feature_set_from_columns(columns):
+    """
+    FeatureSet producing exactly the given columns
+    
+    Registered derived features are computed from their expressions, every
+    other column is passed through. Used for artifacts saved without a FeatureSet.
+    
+    Parameters:
+    -----------
+    columns : list
+        Feature names expected by the fitted preprocessors, in order
+    
+    Returns:
+    --------
+    FeatureSet
+        Compiled feature definitions
+    """
+    return FeatureSet([(col, FEATURE_EXPRESSIONS.get(col)) for col in columns])
+
+def load_feature_set(filename, columns, loader=None):
+    """
+    Load the FeatureSet saved with the model artifacts
+    
+    Parameters:
+    -----------
+    filename : str
+        Path to feature_set_{target}.joblib in the model directory
+    columns : list
+        Feature names expected by the fitted preprocessors, used to rebuild the
+        feature set for artifacts trained before it was saved
+    loader : callable, optional
+        Returns the object saved at a path, or None if there is none (e.g.
+        models.artifact_store.load_artifact_path). Default: the joblib file at filename
+    
+    Returns:
+    --------
+    FeatureSet
+        Compiled feature definitions
+    """
+    if loader is None:
+        feature_set = load(filename) if os.path.exists(filename) else None
+    else:
+        feature_set = loader(filename)
+    return feature_set if feature_set is not None else feature_set_from_columns(columns)
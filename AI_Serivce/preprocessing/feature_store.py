@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+from .clean_data import clean_data
+from .encode_categorical import encode_categorical_features
+from .feature_expressions import build_feature_set
+
+FEATURE_STORE_VERSION = 1
+
+# Source files whose changes invalidate stored matrices
+_PREPROCESSING_MODULES = ['clean_data.py', 'encode_categorical.py', 'feature_expressions.py', 'feature_store.py']
+
+def preprocessing_version():
+    """Return a digest of the preprocessing source code that produced a stored matrix."""
+    digest = hashlib.sha256()
+    for name in _PREPROCESSING_MODULES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def take_rows(X, indices):
+    """
+    Read a row subset of a (memory-mapped) matrix or vector
+    
+    A contiguous ascending run of indices is returned as a zero-copy view;
+    any other subset is gathered into a new array holding only those rows.
+    
+    Parameters:
+    -----------
+    X : numpy.ndarray or numpy.memmap
+        Matrix or vector to read from
+    indices : array-like
+        Row positions
+    
+    Returns:
+    --------
+    numpy.ndarray
+        Selected rows
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if len(indices) == 0:
+        return X[:0]
+    start = indices[0]
+    if indices[-1] - start + 1 == len(indices) and np.all(np.diff(indices) == 1):
+        return X[start:start + len(indices)]
+    return np.take(X, indices, axis=0)
+
+class FeatureStore:
+    """
+    Preprocessed feature matrix and targets persisted as memory-mapped .npy files
+    
+    The store holds the cleaned, encoded and engineered feature matrix (before
+    imputation, whose statistics must come from each experiment's own training
+    rows), the target vectors, the IPO year and the original row positions.
+    Rows are sorted by year, so walk-forward folds are contiguous row ranges.
+    All arrays open with mmap_mode='r', so parallel workers share one copy of
+    the data through the page cache.
+    
+    Parameters:
+    -----------
+    path : str
+        Store directory containing manifest.json
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self._arrays = {}
+    
+    @property
+    def columns(self):
+        """Feature column names in matrix order."""
+        return self.manifest['columns']
+    
+    @property
+    def n_rows(self):
+        """Number of stored rows."""
+        return self.manifest['n_rows']
+    
+    def _open(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+    
+    def features(self):
+        """Return the read-only memory-mapped feature matrix."""
+        return self._open('X')
+    
+    def target(self, name):
+        """Return the read-only memory-mapped vector of a target (NaN where unknown)."""
+        if name not in self.manifest['targets']:
+            raise KeyError(f"Target '{name}' is not in the feature store")
+        return self._open(f'y_{name}')
+    
+    def years(self):
+        """Return the IPO year of every row."""
+        return self._open('year')
+    
+    def row_ids(self):
+        """Return the position of every stored row in the input file."""
+        return self._open('row_ids')
+    
+    def year_range(self, year):
+        """Return the (start, stop) row range of an IPO year (empty range if absent)."""
+        start, stop = self.manifest['year_offsets'].get(str(int(year)), (0, 0))
+        return start, stop
+    
+    def frame(self, indices=None):
+        """Return the feature matrix (or a row subset of it) as a DataFrame without copying contiguous rows."""
+        X = self.features() if indices is None else take_rows(self.features(), indices)
+        return pd.DataFrame(X, columns=self.columns, copy=False)
+
+def build_feature_store(path, input_path, apply_fe=False, feature_columns=None,
+                        targets=('offerPrice', 'closeDay1')):
+    """
+    Preprocess a training file once and write it as a feature store
+    
+    The arrays are written to a temporary directory next to path and moved into
+    place when complete, so readers never see a partial store.
+    
+    Parameters:
+    -----------
+    path : str
+        Store directory to create
+    input_path : str
+        Raw training CSV
+    apply_fe : bool, default=False
+        Whether to add the engineered ratio features
+    feature_columns : list, optional
+        Candidate input columns (all non-target columns if None)
+    targets : tuple, default=('offerPrice', 'closeDay1')
+        Target columns to store
+    
+    Returns:
+    --------
+    FeatureStore
+        The opened store
+    """
+    start_time = time.time()
+    data = encode_categorical_features(clean_data(pd.read_csv(input_path)))
+    if feature_columns is None:
+        feature_columns = [col for col in data.columns if col not in targets]
+    columns = [col for col in list(feature_columns) + ['ipoSize_normalized'] if col in data.columns]
+    feature_set = build_feature_set(list(dict.fromkeys(columns)), apply_fe)
+    
+    years = data['year'].to_numpy(dtype=np.float64) if 'year' in data.columns else np.zeros(len(data))
+    order = np.argsort(years, kind='stable')
+    sorted_years = years[order]
+    
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix='.feature_store_')
+    try:
+        X = np.lib.format.open_memmap(os.path.join(staging, 'X.npy'), mode='w+', dtype=np.float64,
+                                      shape=(len(data), len(feature_set.output_columns_)))
+        X[:] = feature_set.transform(data, rows=order)
+        X.flush()
+        del X
+        stored_targets = [target for target in targets if target in data.columns]
+        for target in stored_targets:
+            np.save(os.path.join(staging, f'y_{target}.npy'), data[target].to_numpy(dtype=np.float64)[order])
+        np.save(os.path.join(staging, 'year.npy'), sorted_years)
+        np.save(os.path.join(staging, 'row_ids.npy'), order.astype(np.int64))
+        
+        unique_years, starts = np.unique(sorted_years, return_index=True)
+        stops = np.append(starts[1:], len(sorted_years))
+        with open(input_path, 'rb') as f:
+            input_hash = hashlib.sha256(f.read()).hexdigest()
+        manifest = {
+            'version': FEATURE_STORE_VERSION,
+            'preprocessing_version': preprocessing_version(),
+            # File name only, so the manifest does not depend on the machine it was built on
+            'input_file': os.path.basename(input_path),
+            'input_hash': input_hash,
+            'apply_feature_engineering': bool(apply_fe),
+            'columns': list(feature_set.output_columns_),
+            'features': [[name, expression] for name, expression in feature_set.features],
+            'targets': stored_targets,
+            'n_rows': int(len(data)),
+            'dtype': 'float64',
+            'sorted_by': 'year',
+            'year_offsets': {str(int(year)): [int(start), int(stop)]
+                             for year, start, stop in zip(unique_years, starts, stops) if not np.isnan(year)},
+            'build_seconds': round(time.time() - start_time, 3)
+        }
+        with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(staging, path)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return FeatureStore(path)
+
+def open_feature_store(store_dir, input_path, apply_fe=False, feature_columns=None, rebuild=False):
+    """
+    Open the feature store for a training file, building it if needed
+    
+    Stores live in store_dir under a key derived from the input file contents,
+    the feature settings and the preprocessing version, so a changed input or
+    preprocessing code gets a fresh store while unchanged runs reuse the old one.
+    
+    Parameters:
+    -----------
+    store_dir : str
+        Directory holding the stores
+    input_path : str
+        Raw training CSV
+    apply_fe : bool, default=False
+        Whether to add the engineered ratio features
+    feature_columns : list, optional
+        Candidate input columns (all non-target columns if None)
+    rebuild : bool, default=False
+        Rebuild even if a matching store exists
+    
+    Returns:
+    --------
+    FeatureStore
+        The opened store
+    """
+    digest = hashlib.sha256()
+    with open(input_path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(json.dumps([FEATURE_STORE_VERSION, preprocessing_version(), bool(apply_fe),
+                              list(feature_columns) if feature_columns is not None else None]).encode())
+    path = os.path.join(store_dir, f'store_{digest.hexdigest()[:16]}')
+    
+    if not rebuild and os.path.exists(os.path.join(path, 'manifest.json')):
+        print(f"Using feature store {path}")
+        return FeatureStore(path)
+    print(f"Building feature store {path}")
+    return build_feature_store(path, input_path, apply_fe, feature_columns)
@@ -0,0 +1,118 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+class Float32Imputer:
+    """
+    Mean imputer fitted column by column that fills float32 matrices in place
+    
+    Exposes the attributes and transform interface used by the prediction
+    scripts and the API, so it can be saved in place of a SimpleImputer.
+    """
+    def __init__(self, strategy='mean'):
+        if strategy not in ['mean', 'median']:
+            raise ValueError(f"Unsupported strategy '{strategy}'")
+        self.strategy = strategy
+    
+    def fit(self, X, feature_names=None):
+        """Compute the per-column fill values with float64 accumulators."""
+        statistics = np.empty(X.shape[1], dtype=np.float64)
+        n_observed = np.empty(X.shape[1], dtype=np.int64)
+        for idx in range(X.shape[1]):
+            column = X[:, idx]
+            observed = ~np.isnan(column)
+            n_observed[idx] = observed.sum()
+            if self.strategy == 'mean':
+                statistics[idx] = np.nansum(column, dtype=np.float64) / n_observed[idx] if n_observed[idx] else 0.0
+            else:
+                statistics[idx] = np.median(column[observed]) if n_observed[idx] else 0.0
+        
+        self.statistics_ = statistics
+        self.n_observed_ = n_observed
+        self.n_features_in_ = X.shape[1]
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        return self
+    
+    def transform(self, X, copy=True):
+        """Replace NaNs with the fitted statistics (in place for float32 arrays with copy=False)."""
+        X = _as_float32(X, getattr(self, 'feature_names_in_', None), copy)
+        for idx, value in enumerate(self.statistics_):
+            column = X[:, idx]
+            np.copyto(column, np.float32(value), where=np.isnan(column))
+        return X
+
+class Float32Scaler:
+    """
+    Standard or robust scaler fitted column by column that scales float32 matrices in place
+    """
+    def __init__(self, method='standard'):
+        if method not in ['standard', 'robust']:
+            raise ValueError(f"Unsupported scaling method '{method}'")
+        self.method = method
+    
+    def fit(self, X, feature_names=None):
+        """Compute per-column centers and scales with float64 accumulators."""
+        center = np.empty(X.shape[1], dtype=np.float64)
+        scale = np.empty(X.shape[1], dtype=np.float64)
+        for idx in range(X.shape[1]):
+            column = X[:, idx]
+            if self.method == 'standard':
+                center[idx] = np.mean(column, dtype=np.float64)
+                scale[idx] = np.std(column, dtype=np.float64)
+            else:
+                q25, center[idx], q75 = np.percentile(column, [25, 50, 75])
+                scale[idx] = q75 - q25
+        scale[scale == 0] = 1.0
+        
+        self.mean_ = center
+        self.scale_ = scale
+        self.n_features_in_ = X.shape[1]
+        self.n_samples_seen_ = X.shape[0]
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        return self
+    
+    def transform(self, X, copy=True):
+        """Center and scale X (in place for float32 arrays with copy=False)."""
+        X = _as_float32(X, getattr(self, 'feature_names_in_', None), copy)
+        for idx in range(X.shape[1]):
+            column = X[:, idx]
+            column -= np.float32(self.mean_[idx])
+            column /= np.float32(self.scale_[idx])
+        return X
+
+def _as_float32(X, feature_names, copy):
+    """Convert X to a float32 array, aligning DataFrame columns to the fitted feature names."""
+    if isinstance(X, pd.DataFrame):
+        if feature_names is not None:
+            X = X.reindex(columns=list(feature_names))
+        return X.to_numpy(dtype=np.float32, copy=True)
+    if copy or not isinstance(X, np.ndarray) or X.dtype != np.float32:
+        return np.array(X, dtype=np.float32, order='F')
+    return X
+
+@contextmanager
+def measure_resources(stats):
+    """
+    Record wall time and peak traced memory of a block into the stats dict
+    
+    Parameters:
+    -----------
+    stats : dict
+        Receives 'seconds' and 'peak_bytes'
+    """
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_time = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats['seconds'] = time.perf_counter() - start_time
+        stats['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        if not already_tracing:
+            tracemalloc.stop()
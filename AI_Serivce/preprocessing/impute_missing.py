@@ -1,8 +1,375 @@
 import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
 from sklearn.impute import SimpleImputer
 
-def create_imputer(strategy='mean'):
+class QuantileSketch:
+    """
+    Mergeable quantile sketch for one numeric column
+    
+    Values are kept in levels of at most `capacity` items, where an item on level h
+    stands for 2**h observations. A full level is sorted and every other item is
+    promoted to the next level (alternating the starting item), so memory stays
+    O(capacity * log(n / capacity)). Until the first compaction the sketch holds
+    every value and quantiles are exact; afterwards the rank error is a small
+    fraction of a percent for the default capacity. Two sketches are merged by
+    concatenating their levels and compacting again.
+    
+    Parameters:
+    -----------
+    capacity : int, default=2048
+        Maximum number of items per level
+    """
+    def __init__(self, capacity=2048):
+        self.capacity = capacity
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self.offsets = [0]
+        self.count = 0
+    
+    def update(self, values):
+        """Add the non-missing values of a chunk."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.count += len(values)
+            self._compress()
+        return self
+    
+    def merge(self, other):
+        """Add the observations summarized by another sketch."""
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+                self.offsets.append(0)
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+    
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity:
+                items = np.sort(items)
+                # An odd item stays on its level so the total weight is preserved
+                keep = items[:len(items) % 2]
+                promoted = items[len(keep) + self.offsets[level]::2]
+                self.offsets[level] ^= 1
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                    self.offsets.append(0)
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+    
+    def quantile(self, q):
+        """Return the q-quantile of the summarized values (NaN if empty)."""
+        if self.count == 0:
+            return np.nan
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q))
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = min(np.searchsorted(cumulative, q * cumulative[-1]), len(values) - 1)
+        return float(values[order][position])
+
+class StreamingImputer:
+    """
+    Mean or median imputer fitted from chunks with mergeable statistics
+    
+    Means are computed exactly from running per-column sums and counts, medians
+    from one QuantileSketch per column. Imputers fitted on different chunks or
+    file shards are combined with merge, so the data never has to be in memory
+    at once. Exposes the attributes and transform interface of a fitted
+    SimpleImputer, so it can be saved in its place.
+    
+    Parameters:
+    -----------
+    strategy : str, default='mean'
+        'mean' or 'median'
+    sketch_capacity : int, default=2048
+        Items per level of the median sketches
+    """
+    def __init__(self, strategy='mean', sketch_capacity=2048):
+        if strategy not in ['mean', 'median']:
+            raise ValueError(f"Unsupported strategy '{strategy}'")
+        self.strategy = strategy
+        self.sketch_capacity = sketch_capacity
+    
+    def _initialize(self, n_features, feature_names=None):
+        self.n_features_in_ = n_features
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_observed_ = np.zeros(self.n_features_in_, dtype=np.int64)
+        self.sums_ = np.zeros(self.n_features_in_, dtype=np.float64)
+        self.sketches_ = ([QuantileSketch(self.sketch_capacity) for _ in range(self.n_features_in_)]
+                          if self.strategy == 'median' else None)
+        self._statistics = None
+    
+    def partial_fit(self, X):
+        """
+        Update the statistics with a chunk of rows
+        
+        Parameters:
+        -----------
+        X : pandas.DataFrame or numpy.ndarray
+            Chunk with the columns of the first chunk
+        
+        Returns:
+        --------
+        StreamingImputer
+            self
+        """
+        if not hasattr(self, 'n_observed_'):
+            self._initialize(X.shape[1], X.columns if isinstance(X, pd.DataFrame) else None)
+        values = self._as_array(X, copy=False)
+        observed = ~np.isnan(values)
+        self.n_observed_ += observed.sum(axis=0)
+        self.sums_ += np.nansum(values, axis=0, dtype=np.float64)
+        if self.sketches_ is not None:
+            for idx, sketch in enumerate(self.sketches_):
+                sketch.update(values[:, idx])
+        self._statistics = None
+        return self
+    
+    def fit(self, X, y=None):
+        """Fit the statistics on X from scratch."""
+        self._initialize(X.shape[1], X.columns if isinstance(X, pd.DataFrame) else None)
+        return self.partial_fit(X)
+    
+    def merge(self, other):
+        """
+        Combine the statistics of an imputer fitted on other rows
+        
+        Parameters:
+        -----------
+        other : StreamingImputer
+            Imputer with the same strategy and columns
+        
+        Returns:
+        --------
+        StreamingImputer
+            self
+        """
+        if not hasattr(other, 'n_observed_'):
+            return self
+        if not hasattr(self, 'n_observed_'):
+            self._initialize(other.n_features_in_, getattr(other, 'feature_names_in_', None))
+        if other.strategy != self.strategy or other.n_features_in_ != self.n_features_in_:
+            raise ValueError("Cannot merge imputers with different strategies or columns")
+        self.n_observed_ = self.n_observed_ + other.n_observed_
+        self.sums_ = self.sums_ + other.sums_
+        if self.sketches_ is not None:
+            for sketch, other_sketch in zip(self.sketches_, other.sketches_):
+                sketch.merge(other_sketch)
+        self._statistics = None
+        return self
+    
+    @property
+    def statistics_(self):
+        """Per-column fill values (0 for columns without observations)."""
+        if self._statistics is None:
+            if self.strategy == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    statistics = self.sums_ / self.n_observed_
+            else:
+                statistics = np.array([sketch.quantile(0.5) for sketch in self.sketches_])
+            self._statistics = np.where(self.n_observed_ > 0, statistics, 0.0)
+        return self._statistics
+    
+    def transform(self, X, copy=True):
+        """
+        Replace missing values with the fitted statistics
+        
+        Float arrays are filled in place with copy=False; DataFrames are aligned to
+        the fitted columns and always copied.
+        
+        Returns:
+        --------
+        numpy.ndarray
+            Imputed values
+        """
+        X = self._as_array(X, copy)
+        for idx, value in enumerate(self.statistics_):
+            column = X[:, idx]
+            np.copyto(column, value, where=np.isnan(column), casting='unsafe')
+        return X
+    
+    def fit_transform(self, X, y=None):
+        """Fit on X and return the imputed copy."""
+        return self.fit(X).transform(X)
+    
+    def _as_array(self, X, copy):
+        if isinstance(X, pd.DataFrame):
+            if hasattr(self, 'feature_names_in_'):
+                X = X.reindex(columns=list(self.feature_names_in_))
+            return X.to_numpy(dtype=np.float64, copy=True)
+        if copy or not isinstance(X, np.ndarray) or X.dtype.kind != 'f':
+            return np.array(X, dtype=np.float64)
+        return X
+
+def fit_streaming_imputer(chunks, strategy='mean', n_jobs=1, sketch_capacity=2048):
+    """
+    Fit a StreamingImputer over chunks or shards, optionally in parallel
+    
+    Each worker fits a partial imputer on its chunks and the partial states are
+    merged, so no worker needs more than one chunk in memory.
+    
+    Parameters:
+    -----------
+    chunks : iterable
+        DataFrames or arrays with the same columns (e.g. from pandas.read_csv(chunksize=...)),
+        or callables returning such an iterable for one shard each
+    strategy : str, default='mean'
+        'mean' or 'median'
+    n_jobs : int, default=1
+        Number of parallel workers (-1 for all cores)
+    sketch_capacity : int, default=2048
+        Items per level of the median sketches
+    
+    Returns:
+    --------
+    StreamingImputer
+        Fitted imputer
+    """
+    def fit_part(part):
+        imputer = StreamingImputer(strategy, sketch_capacity)
+        for chunk in (part() if callable(part) else [part]):
+            imputer.partial_fit(chunk)
+        return imputer
+    
+    if n_jobs == 1:
+        partials = (fit_part(part) for part in chunks)
+    else:
+        partials = Parallel(n_jobs=n_jobs)(delayed(fit_part)(part) for part in chunks)
+    
+    imputer = StreamingImputer(strategy, sketch_capacity)
+    for partial in partials:
+        imputer.merge(partial)
+    if not hasattr(imputer, 'n_observed_'):
+        raise ValueError("No data to fit the imputer on")
+    return imputer
+
+class MissingIndicators:
+    """
+    Missing-value indicator features backed by a packed bitmask
+    
+    fit records which cells of the training matrix are missing before imputation
+    overwrites them, one bit per cell (np.packbits per column). select then fixes
+    the columns that get a 0/1 indicator feature; only those are ever expanded,
+    with expand for the fitted rows and transform for new rows. The bitmask itself
+    is not pickled, only the selected columns.
+    """
+    def fit(self, X):
+        """
+        Pack the missing-value mask of X column by column
+        
+        Parameters:
+        -----------
+        X : pandas.DataFrame or numpy.ndarray
+            Features before imputation
+        
+        Returns:
+        --------
+        MissingIndicators
+            self
+        """
+        values = X.to_numpy(dtype=np.float64) if isinstance(X, pd.DataFrame) else np.asarray(X, dtype=np.float64)
+        self.feature_names_in_ = np.asarray(X.columns if isinstance(X, pd.DataFrame) else range(X.shape[1]),
+                                            dtype=object)
+        self.n_rows_ = values.shape[0]
+        self.bits_ = np.empty((values.shape[1], (self.n_rows_ + 7) // 8), dtype=np.uint8)
+        self.missing_counts_ = np.empty(values.shape[1], dtype=np.int64)
+        for idx in range(values.shape[1]):
+            missing = np.isnan(values[:, idx])
+            self.bits_[idx] = np.packbits(missing)
+            self.missing_counts_[idx] = missing.sum()
+        self.columns_ = []
+        return self
+    
+    def select(self, columns):
+        """
+        Choose the columns that get an indicator feature
+        
+        Columns without any missing training value are skipped, since no split
+        could use their indicator, and so are columns whose missing pattern equals
+        that of an earlier selected column (e.g. a ratio and its input). Packed
+        masks are compared as bytes.
+        
+        Parameters:
+        -----------
+        columns : list
+            Candidate feature names, e.g. the features the trees split on
+        
+        Returns:
+        --------
+        MissingIndicators
+            self
+        """
+        candidates = set(columns)
+        patterns = set()
+        self.columns_ = []
+        for idx, col in enumerate(self.feature_names_in_):
+            if col not in candidates or self.missing_counts_[idx] == 0:
+                continue
+            pattern = self.bits_[idx].tobytes()
+            if pattern not in patterns:
+                patterns.add(pattern)
+                self.columns_.append(col)
+        self.feature_names_ = [f'{col}_missing' for col in self.columns_]
+        return self
+    
+    def expand(self, rows=None):
+        """
+        Unpack the selected columns of the fitted mask into 0/1 features
+        
+        Parameters:
+        -----------
+        rows : numpy.ndarray, optional
+            Row positions to take, in output order. All fitted rows if None
+        
+        Returns:
+        --------
+        numpy.ndarray
+            Indicator matrix of shape (n_rows, len(columns_))
+        """
+        names = list(self.feature_names_in_)
+        n_rows = self.n_rows_ if rows is None else len(rows)
+        indicators = np.empty((n_rows, len(self.columns_)), dtype=np.float64, order='F')
+        for out_idx, col in enumerate(self.columns_):
+            column = np.unpackbits(self.bits_[names.index(col)], count=self.n_rows_)
+            indicators[:, out_idx] = column if rows is None else column[rows]
+        return indicators
+    
+    def transform(self, X):
+        """Return the 0/1 indicators of the selected columns for new rows (before imputation)."""
+        if isinstance(X, pd.DataFrame):
+            columns = [X[col].to_numpy(dtype=np.float64) if col in X.columns else np.full(len(X), np.nan)
+                       for col in self.columns_]
+        else:
+            names = list(self.feature_names_in_)
+            columns = [np.asarray(X, dtype=np.float64)[:, names.index(col)] for col in self.columns_]
+        indicators = np.empty((len(X), len(self.columns_)), dtype=np.float64, order='F')
+        for out_idx, column in enumerate(columns):
+            indicators[:, out_idx] = np.isnan(column)
+        return indicators
+    
+    def append_to(self, X, indicators):
+        """Append indicator features to a dense feature matrix."""
+        if indicators.shape[1] == 0:
+            return X
+        return np.hstack([np.asarray(X, dtype=np.float64), indicators])
+    
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('bits_', None)
+        return state
+
+def create_imputer(strategy='mean', streaming=False):
     """
     Create a SimpleImputer with the specified strategy
     
@@ -10,12 +377,16 @@ def create_imputer(strategy='mean'):
     -----------
     strategy : str, default='mean'
         The imputation strategy. One of 'mean', 'median', 'most_frequent', 'constant'
-        
+    streaming : bool, default=False
+        Create a StreamingImputer ('mean' or 'median') instead
+    
     Returns:
     --------
-    sklearn.impute.SimpleImputer
+    sklearn.impute.SimpleImputer or StreamingImputer
         Configured imputer
     """
+    if streaming:
+        return StreamingImputer(strategy=strategy)
     return SimpleImputer(strategy=strategy)
 
 def fit_imputer(imputer, data):
@@ -28,16 +399,69 @@ def fit_imputer(imputer, data):
         Imputer to fit
     data : pandas.DataFrame
         Data to fit the imputer on
-        
+    
     Returns:
     --------
     sklearn.impute.SimpleImputer
         Fitted imputer
     """
     imputer.fit(data)
+    if isinstance(imputer, StreamingImputer):
+        return imputer
+    
+    # Keep per-column observation counts so the statistics can be updated later
+    values = np.asarray(data, dtype=float)
+    imputer.n_observed_ = (~np.isnan(values)).sum(axis=0)
+    
     return imputer
 
-def impute_numeric_features(data, imputer=None, strategy='mean'):
+def update_imputer(imputer, data):
+    """
+    Merge new rows into the statistics of a fitted mean imputer
+    
+    Uses the stored per-column observation counts to compute the running mean,
+    so the previously seen data does not need to be revisited.
+    
+    Parameters:
+    -----------
+    imputer : sklearn.impute.SimpleImputer or StreamingImputer
+        Imputer fitted with fit_imputer using the 'mean' strategy, or a StreamingImputer
+        with either strategy
+    data : pandas.DataFrame
+        New rows with the same columns the imputer was fitted on
+    
+    Returns:
+    --------
+    sklearn.impute.SimpleImputer
+        Imputer with updated statistics
+    """
+    if isinstance(imputer, StreamingImputer):
+        return imputer.partial_fit(data)
+    
+    if imputer.strategy != 'mean':
+        raise ValueError(f"Only the 'mean' strategy can be updated incrementally, got '{imputer.strategy}'")
+    
+    n_observed = getattr(imputer, 'n_observed_', None)
+    if n_observed is None:
+        raise ValueError("Imputer has no observation counts; it must be fitted with fit_imputer")
+    
+    values = np.asarray(data, dtype=float)
+    new_counts = (~np.isnan(values)).sum(axis=0)
+    new_sums = np.nansum(values, axis=0)
+    total_counts = n_observed + new_counts
+    
+    old_statistics = imputer.statistics_
+    old_sums = np.where(n_observed > 0, old_statistics * n_observed, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        merged = (old_sums + new_sums) / total_counts
+    
+    # Columns that were empty at fit time are dropped by the imputer, keep them that way
+    imputer.statistics_ = np.where(np.isnan(old_statistics), old_statistics, merged)
+    imputer.n_observed_ = total_counts
+    
+    return imputer
+
+def impute_numeric_features(data, imputer=None, strategy='mean', streaming=False):
     """
     Impute missing values in numeric features
     
@@ -49,14 +473,16 @@ def impute_numeric_features(data, imputer=None, strategy='mean'):
         Pre-fitted imputer. If None, a new one will be created and fitted
     strategy : str, default='mean'
         Imputation strategy if creating a new imputer
-        
+    streaming : bool, default=False
+        Create a StreamingImputer if creating a new imputer
+    
     Returns:
     --------
     tuple
         (imputed_data: pandas.DataFrame, imputer: sklearn.impute.SimpleImputer)
     """
     if imputer is None:
-        imputer = create_imputer(strategy=strategy)
+        imputer = create_imputer(strategy=strategy, streaming=streaming)
         imputer = fit_imputer(imputer, data)
     
     # Get column names to restore them after imputation
@@ -0,0 +1,228 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+from scipy.stats import rankdata
+
+SYNTHETIC_SPEC_VERSION = 1
+
+# Columns whose joint distribution is sampled as a whole (observed combinations only)
+GROUP_COLUMNS = ['industryFF12', 'year', 'exchange']
+
+# Ratios recomputed from the sampled columns so that they stay consistent: column -> (numerator, denominator)
+DERIVED_RATIOS = {'roa': ('netIncome', 'totalAssets')}
+
+# Quantile knots kept per numeric column
+N_KNOTS = 1001
+
+class SyntheticIPOGenerator:
+    """
+    Sampler of synthetic IPO rows that follow the distribution of a training file
+    
+    The model is a Gaussian copula:
+    - (industryFF12, year, exchange) is drawn from the observed joint frequencies.
+    - Every numeric column is mapped to normal scores through its empirical
+      distribution. The scores get an additive effect per year, industry and
+      exchange, fitted one factor after the other on the remaining residuals,
+      and the residuals a full covariance, so correlations between columns
+      (targets included) are kept.
+    - Sampled scores are mapped back through the column's quantile knots.
+      Integer and binary columns only take observed values.
+    - Ratios listed in DERIVED_RATIOS are recomputed from their sampled parts.
+    
+    The fitted model is a plain dict (to_dict/from_dict), so it can be saved
+    as JSON and sampled in worker processes.
+    """
+    def __init__(self, spec=None):
+        self.spec = spec
+        if spec is not None:
+            self._prepare()
+    
+    @classmethod
+    def fit(cls, data):
+        """
+        Fit the generator to raw IPO data
+        
+        Parameters:
+        -----------
+        data : pandas.DataFrame
+            Raw training data (as read from data/raw/training_data.csv)
+        
+        Returns:
+        --------
+        SyntheticIPOGenerator
+            Fitted generator
+        """
+        data = data.dropna(subset=GROUP_COLUMNS).reset_index(drop=True)
+        numeric = [column for column in data.columns
+                   if column not in GROUP_COLUMNS and column not in DERIVED_RATIOS
+                   and pd.api.types.is_numeric_dtype(data[column])]
+        
+        groups = data.groupby(GROUP_COLUMNS, sort=True).size()
+        levels = {column: sorted(data[column].unique().tolist()) for column in GROUP_COLUMNS}
+        
+        columns = {}
+        scores = np.empty((len(data), len(numeric)))
+        quantiles = np.linspace(0, 1, N_KNOTS)
+        for j, column in enumerate(numeric):
+            values = data[column].to_numpy(dtype=float)
+            observed = ~np.isnan(values)
+            is_integer = pd.api.types.is_integer_dtype(data[column])
+            knots = np.quantile(values[observed], quantiles, method='inverted_cdf' if is_integer else 'linear')
+            columns[column] = {
+                'integer': bool(is_integer),
+                'missing_rate': float(1 - observed.mean()),
+                'knots': knots.tolist()
+            }
+            # Normal scores from average ranks; missing values get the mean score
+            ranks = rankdata(values[observed])
+            scores[:, j] = 0.0
+            scores[observed, j] = ndtri(ranks / (observed.sum() + 1))
+        
+        effects = {}
+        residuals = scores - scores.mean(axis=0)
+        for column in ['year', 'industryFF12', 'exchange']:
+            codes = data[column].map({level: idx for idx, level in enumerate(levels[column])}).to_numpy()
+            means = np.zeros((len(levels[column]), len(numeric)))
+            for idx in range(len(levels[column])):
+                means[idx] = residuals[codes == idx].mean(axis=0)
+            residuals = residuals - means[codes]
+            effects[column] = means.tolist()
+        
+        # Square root of the residual covariance (clipped to be positive semi-definite)
+        eigenvalues, eigenvectors = np.linalg.eigh(np.cov(residuals, rowvar=False))
+        factor = eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+        
+        return cls({
+            'version': SYNTHETIC_SPEC_VERSION,
+            'columns': list(data.columns),
+            'dtypes': {column: str(data[column].dtype) for column in data.columns},
+            'numeric_columns': numeric,
+            'groups': {
+                'levels': levels,
+                'combinations': [list(key) for key in groups.index],
+                'frequencies': (groups / groups.sum()).tolist()
+            },
+            'numeric': columns,
+            'effects': effects,
+            'score_mean': scores.mean(axis=0).tolist(),
+            'factor': factor.tolist(),
+            'n_rows': int(len(data))
+        })
+    
+    def _prepare(self):
+        """Convert the spec's lists to arrays for sampling."""
+        spec = self.spec
+        self._frequencies = np.asarray(spec['groups']['frequencies'])
+        self._frequencies = self._frequencies / self._frequencies.sum()
+        combinations = spec['groups']['combinations']
+        self._group_codes = {}
+        for position, column in enumerate(GROUP_COLUMNS):
+            index = {level: idx for idx, level in enumerate(spec['groups']['levels'][column])}
+            self._group_codes[column] = np.array([index[key[position]] for key in combinations])
+        self._effects = {column: np.asarray(values) for column, values in spec['effects'].items()}
+        self._score_mean = np.asarray(spec['score_mean'])
+        self._factor = np.asarray(spec['factor'])
+        self._knots = {column: np.asarray(entry['knots']) for column, entry in spec['numeric'].items()}
+    
+    def to_dict(self):
+        """Return the fitted model as a JSON-serializable dict."""
+        return self.spec
+    
+    @classmethod
+    def from_dict(cls, spec):
+        """Create a generator from a dict returned by to_dict."""
+        if spec.get('version') != SYNTHETIC_SPEC_VERSION:
+            raise ValueError(f"Unsupported synthetic data spec version: {spec.get('version')}")
+        return cls(spec)
+    
+    def sample(self, n_rows, rng):
+        """
+        Draw synthetic rows
+        
+        Parameters:
+        -----------
+        n_rows : int
+            Number of rows
+        rng : numpy.random.Generator
+            Random generator (one per chunk for reproducible parallel generation)
+        
+        Returns:
+        --------
+        pandas.DataFrame
+            Rows with the columns and dtypes of the training data
+        """
+        spec = self.spec
+        combination = rng.choice(len(self._frequencies), size=n_rows, p=self._frequencies)
+        scores = self._score_mean + rng.standard_normal((n_rows, self._factor.shape[1])) @ self._factor.T
+        output = {}
+        for column in GROUP_COLUMNS:
+            codes = self._group_codes[column][combination]
+            scores += self._effects[column][codes]
+            output[column] = np.asarray(spec['groups']['levels'][column], dtype=object)[codes]
+        
+        positions = ndtr(scores) * (N_KNOTS - 1)
+        for j, column in enumerate(spec['numeric_columns']):
+            entry, knots = spec['numeric'][column], self._knots[column]
+            if entry['integer']:
+                values = knots[np.rint(positions[:, j]).astype(np.int64)]
+            else:
+                values = np.interp(positions[:, j], np.arange(N_KNOTS), knots)
+            if entry['missing_rate'] > 0:
+                values = values.astype(float)
+                values[rng.random(n_rows) < entry['missing_rate']] = np.nan
+            output[column] = values
+        
+        for column, (numerator, denominator) in DERIVED_RATIOS.items():
+            if column in spec['columns']:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    output[column] = output[numerator] / np.where(output[denominator] == 0, np.nan,
+                                                                  output[denominator])
+        
+        frame = pd.DataFrame({column: output[column] for column in spec['columns']})
+        for column, dtype in spec['dtypes'].items():
+            if dtype.startswith('int') and not frame[column].isna().any():
+                frame[column] = frame[column].astype(dtype)
+        return frame
+
+def chunk_rng(seed, chunk_index):
+    """Random generator of one chunk; chunks are independent and do not depend on the worker count."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+
+def save_generator(generator, path):
+    """Save a fitted generator as JSON."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(generator.to_dict(), f)
+
+def load_generator(path):
+    """Load a generator saved with save_generator."""
+    with open(path) as f:
+        return SyntheticIPOGenerator.from_dict(json.load(f))
+
+def read_columnar(path):
+    """
+    Open a columnar dataset written by scripts/generate_data.py
+    
+    Numeric columns are read-only memory maps; categorical columns are decoded
+    from their integer codes.
+    
+    Parameters:
+    -----------
+    path : str
+        Dataset directory (holds manifest.json and one .npy file per column)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        The dataset
+    """
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    data = {}
+    for column in manifest['columns']:
+        values = np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')
+        categories = manifest['categories'].get(column)
+        data[column] = pd.Categorical.from_codes(values, categories) if categories is not None else values
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+import hashlib
+import json
+import math
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.preprocessing import StandardScaler, RobustScaler
+from sklearn.metrics import mean_squared_error, r2_score
+from joblib import dump, load
+import sys
+
+# Add parent directory to path to enable relative imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing.impute_missing import impute_numeric_features
+from preprocessing.feature_store import FeatureStore, open_feature_store, take_rows
+from scripts.train import (FEATURE_COLUMNS, MODEL_TYPES, load_params_config, create_model, offer_model_types,
+                           out_of_fold_offer_predictions, with_offer_price_feature)
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Walk-forward backtest of IPO price models by year')
+    
+    parser.add_argument('--input-path', type=str, default='data/raw/training_data.csv',
+                        help='Path to the input CSV file')
+    parser.add_argument('--output-path', type=str, default='models/trained/backtest_report.json',
+                        help='Path to save the JSON report')
+    parser.add_argument('--cache-dir', type=str, default='models/trained/backtest_cache',
+                        help='Directory for the cached preprocessed fold matrices')
+    parser.add_argument('--feature-store', type=str, default='models/trained/feature_store',
+                        help='Directory of the memory-mapped feature stores shared with tune.py')
+    parser.add_argument('--model', type=str, default='all',
+                        choices=['xgboost', 'random_forest', 'gradient_boost', 'ensemble', 'all'],
+                        help='Model type to backtest')
+    parser.add_argument('--target', type=str, default='offerPrice',
+                        choices=['offerPrice', 'closeDay1'],
+                        help='Target variable to backtest')
+    parser.add_argument('--min-train-years', type=int, default=5,
+                        help='Number of years of history required before the first test year')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of folds evaluated in parallel')
+    parser.add_argument('--use-robust-scaler', action='store_true',
+                        help='Use RobustScaler instead of StandardScaler')
+    parser.add_argument('--apply-feature-engineering', action='store_true',
+                        help='Apply feature engineering')
+    parser.add_argument('--params-config', type=str, default=None,
+                        help='JSON file with tuned model parameters per target (written by scripts/tune.py)')
+    parser.add_argument('--offer-model', type=str, default='ensemble',
+                        choices=['xgboost', 'random_forest', 'gradient_boost', 'ensemble', 'all'],
+                        help='offerPrice models averaged into the predicted_offerPrice feature of closeDay1 '
+                             '(the --model the shipped models were trained with)')
+    
+    return parser.parse_args()
+
+def prepare_folds(args, executor, single_threaded):
+    """
+    Build the walk-forward folds and cache each fold's preprocessed matrices
+    
+    Every test year is scored by models trained on all earlier years. Folds that
+    are not cached yet are preprocessed by prepare_fold on the worker pool.
+    
+    Parameters:
+    -----------
+    args : argparse.Namespace
+        Command line arguments
+    executor : concurrent.futures.ProcessPoolExecutor
+        Worker pool the folds are prepared on
+    single_threaded : bool
+        Restrict XGBoost to one thread per worker
+    
+    Returns:
+    --------
+    list
+        (test year, path to the cached fold) for every fold
+    """
+    store = open_feature_store(args.feature_store, args.input_path, args.apply_feature_engineering, FEATURE_COLUMNS)
+    labelled = ~np.isnan(store.target(args.target))
+    years = store.years()
+    
+    data_hash = store.manifest['input_hash'][:16]
+    settings = f"{args.target}|{args.apply_feature_engineering}|{args.use_robust_scaler}|{store.manifest['preprocessing_version']}"
+    if args.target == 'closeDay1':
+        offer_params = load_params_config(args.params_config).get('offerPrice', {})
+        settings += f"|{json.dumps([offer_model_types(args.offer_model), offer_params], sort_keys=True)}"
+    settings_hash = hashlib.sha256(settings.encode()).hexdigest()[:8]
+    os.makedirs(args.cache_dir, exist_ok=True)
+    
+    unique_years = np.sort(np.unique(years[labelled]))
+    folds = []
+    for test_year in unique_years[args.min_train_years:]:
+        cache_path = os.path.join(args.cache_dir, f'fold_{test_year}_{data_hash}_{settings_hash}.joblib')
+        folds.append((int(test_year), cache_path))
+    
+    pending = [(test_year, cache_path) for test_year, cache_path in folds if not os.path.exists(cache_path)]
+    if pending:
+        print(f"Preprocessing {len(pending)} folds...")
+        # Later years have the most training rows, so they are started first
+        futures = [executor.submit(prepare_fold, args, store.path, test_year, cache_path, single_threaded)
+                   for test_year, cache_path in reversed(pending)]
+        for future in futures:
+            future.result()
+    
+    return folds
+
+def prepare_fold(args, store_path, test_year, cache_path, single_threaded):
+    """
+    Preprocess one walk-forward fold and cache its matrices
+    
+    Imputer and scaler are fitted on the training years only. The feature store
+    keeps its rows sorted by year, so the fold reads zero-copy row ranges of the
+    memory-mapped matrix.
+    
+    closeDay1 folds get the 'predicted_offerPrice' feature of the shipped closeDay1
+    model: the average of the offerPrice models train.py averages for --offer-model,
+    fitted on the training years (out of fold for the training rows).
+    """
+    store = FeatureStore(store_path)
+    y = store.target(args.target)
+    labelled = ~np.isnan(y)
+    years = store.years()
+    
+    train_rows = np.flatnonzero(labelled & (years < test_year))
+    test_rows = np.flatnonzero(labelled & (years == test_year))
+    X_train = store.frame(train_rows)
+    X_test = store.frame(test_rows)
+    if args.target == 'closeDay1':
+        offer_params = load_params_config(args.params_config).get('offerPrice', {})
+        offer_models = [create_model(model_type, offer_params, single_threaded)
+                        for model_type in offer_model_types(args.offer_model)]
+        train_offer, test_offer = out_of_fold_offer_predictions(
+            store.frame(), np.asarray(store.target('offerPrice')), np.flatnonzero(years < test_year),
+            train_rows, test_rows, offer_models)
+        X_train = with_offer_price_feature(X_train, train_offer)
+        X_test = with_offer_price_feature(X_test, test_offer)
+    X_train, imputer = impute_numeric_features(X_train)
+    X_test, _ = impute_numeric_features(X_test, imputer)
+    scaler = RobustScaler() if args.use_robust_scaler else StandardScaler()
+    dump({
+        'X_train': scaler.fit_transform(X_train),
+        'y_train': np.asarray(take_rows(y, train_rows)),
+        'X_test': scaler.transform(X_test),
+        'y_test': np.asarray(take_rows(y, test_rows))
+    }, cache_path)
+
+def run_fold(test_year, cache_path, model_types, params, single_threaded):
+    """
+    Fit and score every model type on one walk-forward fold
+    
+    Returns:
+    --------
+    dict
+        Per-model RMSE, R2, fit time and predict time for the test year
+    """
+    fold = load(cache_path, mmap_mode='r')
+    result = {'year': test_year, 'n_train': len(fold['y_train']), 'n_test': len(fold['y_test']), 'models': {}}
+    
+    for model_type in model_types:
+        model = create_model(model_type, params, single_threaded)
+        
+        start_time = time.perf_counter()
+        model.fit(fold['X_train'], fold['y_train'])
+        fit_time = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        predictions = model.predict(fold['X_test'])
+        predict_time = time.perf_counter() - start_time
+        
+        result['models'][model_type] = {
+            'rmse': math.sqrt(mean_squared_error(fold['y_test'], predictions)),
+            'r2': r2_score(fold['y_test'], predictions) if len(predictions) > 1 else None,
+            'fit_time': fit_time,
+            'predict_time': predict_time,
+            'predict_time_per_row': predict_time / len(predictions),
+            'squared_error_sum': float(np.sum((fold['y_test'] - predictions) ** 2))
+        }
+    
+    return result
+
+def summarize(results, model_types):
+    """Pool the per-year results into one summary per model."""
+    summary = {}
+    n_test = sum(result['n_test'] for result in results)
+    for model_type in model_types:
+        scores = [result['models'][model_type] for result in results]
+        summary[model_type] = {
+            'pooled_rmse': math.sqrt(sum(score['squared_error_sum'] for score in scores) / n_test),
+            'mean_year_rmse': float(np.mean([score['rmse'] for score in scores])),
+            'total_fit_time': float(sum(score['fit_time'] for score in scores)),
+            'mean_predict_time_per_row': float(np.mean([score['predict_time_per_row'] for score in scores]))
+        }
+    return summary
+
+def main():
+    """Main function to execute the backtest."""
+    args = parse_arguments()
+    start_time = time.time()
+    
+    model_types = MODEL_TYPES if args.model == 'all' else [args.model]
+    params = load_params_config(args.params_config).get(args.target, {})
+    single_threaded = args.workers > 1
+    
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        print(f"Loading data from {args.input_path}")
+        try:
+            folds = prepare_folds(args, executor, single_threaded)
+        except FileNotFoundError:
+            print(f"Error: File {args.input_path} not found")
+            return
+        
+        if not folds:
+            print(f"Error: Not enough years for --min-train-years {args.min_train_years}")
+            return
+        
+        print(f"Backtesting {model_types} for {args.target} on {len(folds)} walk-forward folds "
+              f"({folds[0][0]}-{folds[-1][0]}) with {args.workers} workers")
+        futures = [
+            executor.submit(run_fold, test_year, cache_path, model_types, params, single_threaded)
+            for test_year, cache_path in folds
+        ]
+        results = [future.result() for future in futures]
+    
+    header = f"{'year':>6} {'n_test':>7} " + " ".join(f"{model_type:>24}" for model_type in model_types)
+    print(f"\nRMSE / R2 per year:\n{header}")
+    for result in results:
+        cells = []
+        for model_type in model_types:
+            score = result['models'][model_type]
+            r2 = f"{score['r2']:.4f}" if score['r2'] is not None else 'n/a'
+            cells.append(f"{score['rmse']:>12.4f} / {r2:>9}")
+        print(f"{result['year']:>6} {result['n_test']:>7} {' '.join(cells)}")
+    
+    summary = summarize(results, model_types)
+    print(f"\n{'model':>16} {'pooled RMSE':>12} {'fit time (s)':>13} {'predict us/row':>15}")
+    for model_type, stats in summary.items():
+        print(f"{model_type:>16} {stats['pooled_rmse']:>12.4f} {stats['total_fit_time']:>13.2f} "
+              f"{stats['mean_predict_time_per_row'] * 1e6:>15.2f}")
+    
+    report = {
+        'target': args.target,
+        'input_path': args.input_path,
+        'min_train_years': args.min_train_years,
+        'folds': results,
+        'summary': summary
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output_path)), exist_ok=True)
+    with open(args.output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    print(f"\nReport saved to {args.output_path}")
+    print(f"Backtest completed in {time.time() - start_time:.1f}s")
+
+if __name__ == "__main__":
+    main()
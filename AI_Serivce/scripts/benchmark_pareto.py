@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+import json
+import math
+import pickle
+import time
+import tracemalloc
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import mean_squared_error
+from xgboost import XGBModel
+import sys
+
+# Add parent directory to path to enable relative imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing.impute_missing import impute_numeric_features
+from preprocessing.feature_store import open_feature_store
+from models.xgboost_model import create_xgboost_model
+from models.random_forest_model import create_random_forest_model
+from models.gradient_boost_model import create_gradient_boost_model
+from models.ensemble_model import create_ensemble_model
+from scripts.train import FEATURE_COLUMNS, load_params_config
+from scripts.predict import predict_with_model
+
+MODEL_FACTORIES = {
+    'xgboost': create_xgboost_model,
+    'random_forest': create_random_forest_model,
+    'gradient_boost': create_gradient_boost_model
+}
+
+# Measurements the frontier is computed on (lower is better for all of them)
+OBJECTIVES = ['rmse', 'p99_ms', 'resident_bytes']
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Pareto report of accuracy versus serving cost for model configurations')
+    
+    parser.add_argument('--input-path', type=str, default='data/raw/training_data.csv',
+                        help='Path to the input CSV file')
+    parser.add_argument('--output-path', type=str, default='models/trained/pareto_report.json',
+                        help='Path to save the JSON report')
+    parser.add_argument('--feature-store', type=str, default='models/trained/feature_store',
+                        help='Directory of the memory-mapped feature stores')
+    parser.add_argument('--target', type=str, default='offerPrice',
+                        choices=['offerPrice', 'closeDay1'],
+                        help='Target variable of the benchmarked models')
+    parser.add_argument('--models', type=str, nargs='+', default=['xgboost', 'random_forest', 'gradient_boost', 'ensemble'],
+                        choices=['xgboost', 'random_forest', 'gradient_boost', 'ensemble'],
+                        help='Model types to sweep')
+    parser.add_argument('--n-estimators', type=int, nargs='+', default=[25, 50, 100, 200],
+                        help='Values of n_estimators to sweep')
+    parser.add_argument('--max-depth', type=int, nargs='+', default=[3, 6, 10],
+                        help='Values of max_depth to sweep')
+    parser.add_argument('--params-config', type=str, default=None,
+                        help='JSON file with tuned model parameters per target (the swept values override them)')
+    parser.add_argument('--test-size', type=float, default=0.2,
+                        help='Proportion of data to use for testing')
+    parser.add_argument('--apply-feature-engineering', action='store_true',
+                        help='Apply feature engineering')
+    parser.add_argument('--single-rows', type=int, default=500,
+                        help='Number of timed single-row predictions (p50 and p99 are reported)')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='Number of timed batch predictions (the fastest is reported)')
+    
+    return parser.parse_args()
+
+def base_params(model_type, tuned):
+    """Parameters the sweep starts from: the tuned ones if given, otherwise the factory defaults."""
+    if tuned.get(model_type):
+        return dict(tuned[model_type])
+    return MODEL_FACTORIES[model_type]().get_params()
+
+def create_configured_model(model_type, n_estimators, max_depth, tuned):
+    """
+    Create an unfitted model with the swept settings
+    
+    The ensemble's base models all get the same n_estimators and max_depth.
+    
+    Returns:
+    --------
+    estimator
+        Unfitted model
+    """
+    def configured(name):
+        params = base_params(name, tuned)
+        params.update({'n_estimators': n_estimators, 'max_depth': max_depth})
+        return params
+    
+    if model_type == 'ensemble':
+        return create_ensemble_model(configured('xgboost'), configured('random_forest'), configured('gradient_boost'))
+    return MODEL_FACTORIES[model_type](configured(model_type))
+
+def _native_bytes(model):
+    """Size of the tree structures in a model that live outside the Python heap."""
+    if isinstance(model, XGBModel):
+        return len(model.get_booster().save_raw('ubj'))
+    if hasattr(model, 'tree_'):
+        state = model.tree_.__getstate__()
+        return state['nodes'].nbytes + state['values'].nbytes
+    estimators = getattr(model, 'estimators_', [])
+    if isinstance(estimators, np.ndarray):
+        # Gradient Boosting keeps its stage trees in a 2-d array
+        estimators = estimators.ravel()
+    return sum(_native_bytes(estimator) for estimator in estimators)
+
+def resident_size(payload):
+    """
+    Memory a model occupies once loaded
+    
+    The Python and NumPy allocations made while unpickling the model are traced.
+    Tree nodes are allocated natively and counted separately: scikit-learn trees
+    by their node and value arrays, XGBoost boosters by their UBJ size.
+    
+    Parameters:
+    -----------
+    payload : bytes
+        Pickled model
+    
+    Returns:
+    --------
+    int
+        Size in bytes
+    """
+    tracemalloc.start()
+    try:
+        model = pickle.loads(payload)
+        traced, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return traced + _native_bytes(model)
+
+def benchmark_setting(model_type, n_estimators, max_depth, data, tuned, args):
+    """
+    Train one configuration and measure its accuracy and serving cost
+    
+    Returns:
+    --------
+    dict
+        Settings, RMSE, p50/p99 single-row latency, batch throughput, serialized
+        and resident model size and training time
+    """
+    X_train, y_train, X_test, y_test = data
+    model = create_configured_model(model_type, n_estimators, max_depth, tuned)
+    start_time = time.perf_counter()
+    model.fit(X_train, y_train)
+    train_seconds = time.perf_counter() - start_time
+    
+    rmse = math.sqrt(mean_squared_error(y_test, predict_with_model(model, X_test)))
+    
+    batch_times = []
+    for _ in range(args.repeats):
+        start_time = time.perf_counter()
+        predict_with_model(model, X_test)
+        batch_times.append(time.perf_counter() - start_time)
+    
+    # One untimed call first, so lazy initialisation does not land in the tail
+    predict_with_model(model, X_test[:1])
+    single_times = []
+    for idx in range(args.single_rows):
+        row = X_test[idx % len(X_test):idx % len(X_test) + 1]
+        start_time = time.perf_counter()
+        predict_with_model(model, row)
+        single_times.append(time.perf_counter() - start_time)
+    
+    payload = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+    return {
+        'model': model_type,
+        'n_estimators': n_estimators,
+        'max_depth': max_depth,
+        'rmse': rmse,
+        'p50_ms': float(np.percentile(single_times, 50)) * 1e3,
+        'p99_ms': float(np.percentile(single_times, 99)) * 1e3,
+        'rows_per_second': len(X_test) / min(batch_times),
+        'model_bytes': len(payload),
+        'resident_bytes': resident_size(payload),
+        'train_seconds': train_seconds
+    }
+
+def pareto_frontier(results, objectives=OBJECTIVES):
+    """
+    Mark the configurations no other configuration beats on every objective
+    
+    A result is dominated if another one is at least as good on all objectives
+    and strictly better on one.
+    
+    Parameters:
+    -----------
+    results : list of dict
+        Benchmark results, updated in place with a 'pareto' flag
+    objectives : list of str
+        Keys to minimize
+    
+    Returns:
+    --------
+    list of dict
+        The non-dominated results, most accurate first
+    """
+    def values(result):
+        return [result[key] for key in objectives]
+    
+    for result in results:
+        own = values(result)
+        result['pareto'] = not any(
+            all(o <= v for o, v in zip(values(other), own)) and values(other) != own
+            for other in results if other is not result)
+    return sorted((result for result in results if result['pareto']), key=lambda result: result['rmse'])
+
+def print_table(results):
+    """Print benchmark results, frontier rows marked with '*'."""
+    print(f"\n  {'model':>14} {'trees':>5} {'depth':>5} {'rmse':>8} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'rows/s':>9} {'size kB':>8} {'mem kB':>8} {'train s':>7}")
+    for result in results:
+        print(f"{'*' if result['pareto'] else ' '} {result['model']:>14} {result['n_estimators']:>5} "
+              f"{result['max_depth']:>5} {result['rmse']:>8.4f} {result['p50_ms']:>7.3f} {result['p99_ms']:>7.3f} "
+              f"{result['rows_per_second']:>9.0f} {result['model_bytes'] / 1024:>8.0f} {result['resident_bytes'] / 1024:>8.0f} "
+              f"{result['train_seconds']:>7.2f}")
+
+def main():
+    """Main function to execute the sweep."""
+    args = parse_arguments()
+    
+    print(f"Loading data from {args.input_path}")
+    try:
+        store = open_feature_store(args.feature_store, args.input_path, args.apply_feature_engineering,
+                                   FEATURE_COLUMNS)
+    except FileNotFoundError:
+        print(f"Error: File {args.input_path} not found")
+        return
+    
+    y_all = store.target(args.target)
+    # Labelled rows in input file order, so the split does not depend on the store layout
+    positions = np.argsort(store.row_ids())
+    positions = positions[~np.isnan(y_all[positions])]
+    train_rows, test_rows = train_test_split(positions, test_size=args.test_size, random_state=42)
+    X_train, imputer = impute_numeric_features(store.frame(train_rows))
+    X_test, _ = impute_numeric_features(store.frame(test_rows), imputer)
+    scaler = StandardScaler()
+    data = (scaler.fit_transform(X_train), np.asarray(y_all[train_rows]),
+            scaler.transform(X_test), np.asarray(y_all[test_rows]))
+    tuned = load_params_config(args.params_config).get(args.target, {})
+    
+    settings = [(model_type, n_estimators, max_depth) for model_type in args.models
+                for n_estimators in args.n_estimators for max_depth in args.max_depth]
+    print(f"Benchmarking {len(settings)} configurations for {args.target} "
+          f"({len(train_rows)} training rows, {len(test_rows)} test rows)")
+    results = []
+    for idx, (model_type, n_estimators, max_depth) in enumerate(settings, 1):
+        print(f"[{idx}/{len(settings)}] {model_type} n_estimators={n_estimators} max_depth={max_depth}")
+        results.append(benchmark_setting(model_type, n_estimators, max_depth, data, tuned, args))
+    
+    frontier = pareto_frontier(results)
+    print_table(results)
+    print(f"\nPareto frontier on {', '.join(OBJECTIVES)} ({len(frontier)} of {len(results)} configurations):")
+    print_table(frontier)
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.output_path)), exist_ok=True)
+    with open(args.output_path, 'w') as f:
+        json.dump({'target': args.target, 'train_rows': int(len(train_rows)), 'test_rows': int(len(test_rows)),
+                   'objectives': OBJECTIVES, 'results': results, 'frontier': frontier}, f, indent=2)
+    print(f"\nPareto report saved to {args.output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+import contextlib
+import faulthandler
+import json
+import time
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+import sys
+
+# Add parent directory to path to enable relative imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing.synthetic_data import SyntheticIPOGenerator, chunk_rng, load_generator
+from scripts.predict import load_scorers, predict_chunked
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Throughput of predict.py --workers for increasing worker counts')
+    
+    parser.add_argument('--input-path', type=str, default=None,
+                        help='CSV file to score (default: --rows synthetic rows written to a temporary file)')
+    parser.add_argument('--rows', type=int, default=1000000,
+                        help='Number of synthetic rows to score if --input-path is not given')
+    parser.add_argument('--training-path', type=str, default='data/raw/training_data.csv',
+                        help='Training data the synthetic data generator is fitted to')
+    parser.add_argument('--spec-path', type=str, default=None,
+                        help='Fitted generator (JSON) saved by scripts/generate_data.py')
+    parser.add_argument('--output-path', type=str, default='models/trained/workers_benchmark.json',
+                        help='Path to save the JSON report')
+    parser.add_argument('--model-path', type=str, default='models/trained',
+                        help='Directory containing trained models and preprocessors')
+    parser.add_argument('--model-type', type=str, default='ensemble',
+                        choices=['xgboost', 'random_forest', 'gradient_boost', 'ensemble', 'all'],
+                        help='Type of model to use for prediction')
+    parser.add_argument('--target', type=str, default='both',
+                        choices=['offerPrice', 'closeDay1', 'both'],
+                        help='Target variable to predict')
+    parser.add_argument('--apply-feature-engineering', action='store_true',
+                        help='Apply feature engineering')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='Worker counts to measure (default: 1, 2, 4, ... up to the number of CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help='Rows per shard')
+    parser.add_argument('--warm-openmp', action='store_true',
+                        help='Run a multi-threaded XGBoost prediction in the parent before the workers are '
+                             'forked, to check that forking after OpenMP has started does not hang')
+    parser.add_argument('--timeout', type=float, default=3600,
+                        help='Abort with a traceback of every thread if one run takes longer (seconds)')
+    
+    return parser.parse_args()
+
+def default_worker_counts():
+    """1, 2, 4, ... and the number of CPUs."""
+    n_cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= n_cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != n_cpus:
+        counts.append(n_cpus)
+    return counts
+
+def write_synthetic_input(args, path):
+    """Write --rows synthetic rows without targets to path, chunk by chunk."""
+    if args.spec_path and os.path.exists(args.spec_path):
+        generator = load_generator(args.spec_path)
+    else:
+        generator = SyntheticIPOGenerator.fit(pd.read_csv(args.training_path))
+    columns = [column for column in generator.to_dict()['columns'] if column not in ('closeDay1', 'offerPrice')]
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(columns) + '\n')
+        for idx, start in enumerate(range(0, args.rows, 100000)):
+            rows = generator.sample(min(100000, args.rows - start), chunk_rng(42, idx))[columns]
+            f.write(rows.to_csv(header=False, index=False))
+
+def warm_openmp(state):
+    """Predict with every XGBoost model of the scoring state on all cores, which starts OpenMP's thread pool."""
+    _, scorers, bundle, _ = state
+    models = [model for _, by_name in scorers.values() for model in by_name.values()]
+    if bundle is not None:
+        models.append(bundle['model'])
+    X = None
+    for model in models:
+        for estimator in [model] + list(getattr(model, 'estimators_', None) or []):
+            if isinstance(estimator, XGBRegressor):
+                n_jobs = estimator.get_params()['n_jobs']
+                estimator.set_params(n_jobs=max(os.cpu_count() or 1, 4))
+                X = np.zeros((1000, estimator.n_features_in_))
+                estimator.predict(X)
+                estimator.set_params(n_jobs=n_jobs)
+    return X is not None
+
+def main():
+    """Main function to execute the benchmark."""
+    args = parse_arguments()
+    worker_counts = args.workers or default_worker_counts()
+    targets = ['offerPrice', 'closeDay1'] if args.target == 'both' else [args.target]
+    
+    with contextlib.ExitStack() as stack:
+        input_path = args.input_path
+        if input_path is None:
+            input_path = os.path.join(os.path.dirname(os.path.abspath(args.output_path)), '.workers_benchmark_input.csv')
+            os.makedirs(os.path.dirname(input_path), exist_ok=True)
+            print(f"Writing {args.rows} synthetic rows to {input_path}")
+            write_synthetic_input(args, input_path)
+            stack.callback(os.remove, input_path)
+        output_path = input_path + '.predictions.tmp'
+        stack.callback(lambda: os.path.exists(output_path) and os.remove(output_path))
+        
+        run_args = argparse.Namespace(input_path=input_path, output_path=output_path, model_path=args.model_path,
+                                      model_type=args.model_type, target=args.target,
+                                      apply_feature_engineering=args.apply_feature_engineering,
+                                      select_features=False, multi_output=False, chunk_size=args.chunk_size,
+                                      output_format='csv', id_column=None, row_number=False)
+        print(f"Loading models from {args.model_path}")
+        state = load_scorers(run_args, targets)
+        if state is None:
+            print("Error: No models could be loaded. Check the errors above.")
+            return
+        if args.warm_openmp and warm_openmp(state):
+            print("Started OpenMP in the parent process before forking the workers")
+        
+        results = []
+        for n_workers in worker_counts:
+            run_args.workers = n_workers
+            print(f"\n=== {n_workers} worker{'s' if n_workers > 1 else ''} ===")
+            # A hang (e.g. OpenMP after fork) aborts with the stack of every thread
+            faulthandler.dump_traceback_later(args.timeout, exit=True)
+            start_time = time.perf_counter()
+            n_rows = predict_chunked(run_args, targets, state)
+            elapsed = time.perf_counter() - start_time
+            faulthandler.cancel_dump_traceback_later()
+            results.append({'workers': n_workers, 'rows': n_rows, 'seconds': elapsed,
+                            'rows_per_second': n_rows / elapsed})
+    
+    base = results[0]['rows_per_second'] / results[0]['workers']
+    print(f"\n{'workers':>7} {'seconds':>8} {'rows/s':>9} {'speedup':>8} {'efficiency':>10}")
+    for result in results:
+        result['speedup'] = result['rows_per_second'] / base
+        result['efficiency'] = result['speedup'] / result['workers']
+        print(f"{result['workers']:>7} {result['seconds']:>8.1f} {result['rows_per_second']:>9,.0f} "
+              f"{result['speedup']:>8.2f} {result['efficiency']:>10.0%}")
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.output_path)), exist_ok=True)
+    with open(args.output_path, 'w') as f:
+        json.dump({'cpus': os.cpu_count(), 'model_type': args.model_type, 'chunk_size': args.chunk_size,
+                   'warm_openmp': args.warm_openmp, 'results': results}, f, indent=2)
+    print(f"\nWorkers benchmark saved to {args.output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+import json
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from joblib import dump, load
+import sys
+
+# Add parent directory to path to enable relative imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing.feature_store import open_feature_store
+from models.xgboost_model import train_xgboost_model, predict_xgboost, save_xgboost_model, load_xgboost_model
+from scripts.train import FEATURE_COLUMNS, load_params_config
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark pickled vs native XGBoost model files')
+    
+    parser.add_argument('--input-path', type=str, default='data/raw/training_data.csv',
+                        help='Path to the input CSV file')
+    parser.add_argument('--output-path', type=str, default='models/trained/xgboost_benchmark.json',
+                        help='Path to save the JSON report')
+    parser.add_argument('--feature-store', type=str, default='models/trained/feature_store',
+                        help='Directory of the memory-mapped feature stores')
+    parser.add_argument('--target', type=str, default='offerPrice',
+                        choices=['offerPrice', 'closeDay1'],
+                        help='Target variable of the benchmarked model')
+    parser.add_argument('--apply-feature-engineering', action='store_true',
+                        help='Apply feature engineering')
+    parser.add_argument('--params-config', type=str, default=None,
+                        help='JSON file with tuned model parameters per target (written by scripts/tune.py)')
+    parser.add_argument('--repeats', type=int, default=20,
+                        help='Number of timed loads and batch predictions (the median is reported)')
+    parser.add_argument('--single-rows', type=int, default=200,
+                        help='Number of timed single-row predictions (the median is reported)')
+    
+    return parser.parse_args()
+
+def median_seconds(function, repeats):
+    """Median wall time of repeated calls."""
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return float(np.median(times))
+
+def benchmark_format(name, path, load_model, predict, X, rows, reference, repeats):
+    """
+    Time loading a saved model and predicting with it
+    
+    Returns:
+    --------
+    dict
+        File size, load time, batch and single-row prediction time and the
+        largest deviation from the reference predictions
+    """
+    model = load_model(path)
+    paths = [path] + ([os.path.splitext(path)[0] + '.meta.json'] if name.startswith('native') else [])
+    row_iter = iter(rows)
+    return {
+        'format': name,
+        'file_bytes': int(sum(os.path.getsize(p) for p in paths)),
+        'load_ms': median_seconds(lambda: load_model(path), repeats) * 1e3,
+        'batch_ms': median_seconds(lambda: predict(model, X), repeats) * 1e3,
+        'single_row_us': median_seconds(lambda: predict(model, next(row_iter)), len(rows)) * 1e6,
+        'max_abs_diff': float(np.max(np.abs(predict(model, X) - reference)))
+    }
+
+def main():
+    """Main function to execute the benchmark."""
+    args = parse_arguments()
+    
+    print(f"Loading data from {args.input_path}")
+    try:
+        store = open_feature_store(args.feature_store, args.input_path, args.apply_feature_engineering,
+                                   FEATURE_COLUMNS)
+    except FileNotFoundError:
+        print(f"Error: File {args.input_path} not found")
+        return
+    
+    y = np.asarray(store.target(args.target))
+    mask = ~np.isnan(y)
+    X = np.ascontiguousarray(store.features()[mask])
+    X_frame = pd.DataFrame(X, columns=store.columns)
+    params = load_params_config(args.params_config).get(args.target, {})
+    print(f"Training XGBoost for {args.target} on {X.shape[0]} rows, {X.shape[1]} features")
+    model = train_xgboost_model(X, y[mask], params.get('xgboost'))
+    reference = model.predict(X)
+    rows = [X[idx % len(X):idx % len(X) + 1] for idx in range(args.single_rows)]
+    frame_rows = [X_frame.iloc[idx % len(X):idx % len(X) + 1] for idx in range(args.single_rows)]
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pickle_path = os.path.join(tmp_dir, 'xgboost.joblib')
+        dump(model, pickle_path)
+        ubj_path = os.path.join(tmp_dir, 'xgboost.ubj')
+        save_xgboost_model(model, ubj_path)
+        json_path = os.path.join(tmp_dir, 'xgboost.json')
+        save_xgboost_model(model, json_path)
+        
+        # The wrapper is timed on a DataFrame, as the models were called before,
+        # the native booster on the NumPy array
+        results = [
+            benchmark_format('joblib pickle', pickle_path, load, lambda m, data: m.predict(data),
+                             X_frame, frame_rows, reference, args.repeats),
+            benchmark_format('native ubj', ubj_path, load_xgboost_model, predict_xgboost,
+                             X, rows, reference, args.repeats),
+            benchmark_format('native json', json_path, load_xgboost_model, predict_xgboost,
+                             X, rows, reference, args.repeats)
+        ]
+    
+    print(f"\n{'format':>14} {'size (kB)':>10} {'load ms':>9} {'batch ms':>9} {'row us':>8} {'max diff':>9}")
+    for result in results:
+        print(f"{result['format']:>14} {result['file_bytes'] / 1024:>10.1f} {result['load_ms']:>9.2f} "
+              f"{result['batch_ms']:>9.2f} {result['single_row_us']:>8.1f} {result['max_abs_diff']:>9.2g}")
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.output_path)), exist_ok=True)
+    with open(args.output_path, 'w') as f:
+        json.dump({'target': args.target, 'rows': int(X.shape[0]), 'features': int(X.shape[1]),
+                   'results': results}, f, indent=2)
+    print(f"\nBenchmark report saved to {args.output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+import subprocess
+import tempfile
+import pandas as pd
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Check that the in-memory, chunked and parallel prediction paths agree')
+    
+    parser.add_argument('--input-path', type=str, default='data/raw/testing.csv',
+                        help='Input CSV file to score')
+    parser.add_argument('--model-path', type=str, default='models/trained',
+                        help='Directory containing trained models and preprocessors')
+    parser.add_argument('--model-type', type=str, default='ensemble',
+                        choices=['xgboost', 'random_forest', 'gradient_boost', 'ensemble', 'all'],
+                        help='Type of model to use for prediction')
+    parser.add_argument('--target', type=str, default='both',
+                        choices=['offerPrice', 'closeDay1', 'both'],
+                        help='Target variable to predict')
+    parser.add_argument('--apply-feature-engineering', action='store_true',
+                        help='Apply feature engineering')
+    parser.add_argument('--multi-output', action='store_true',
+                        help='Predict both targets with the joint model')
+    parser.add_argument('--chunk-size', type=int, default=100,
+                        help='Chunk size of the streaming runs (small, so several chunks are compared)')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Worker processes of the parallel run (1 skips it)')
+    parser.add_argument('--tolerance', type=float, default=1e-9,
+                        help='Largest accepted absolute difference')
+    
+    return parser.parse_args()
+
+def run_predict(args, output_path, extra=()):
+    """Run predict.py with the given mode options and return its predictions."""
+    command = [sys.executable, os.path.join(SCRIPT_DIR, 'predict.py'), '--input-path', args.input_path,
+               '--output-path', output_path, '--model-path', args.model_path, '--model-type', args.model_type,
+               '--target', args.target, *extra]
+    if args.apply_feature_engineering:
+        command.append('--apply-feature-engineering')
+    if args.multi_output:
+        command.append('--multi-output')
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0 or not os.path.exists(output_path):
+        raise RuntimeError(f"predict.py {' '.join(extra)} failed:\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+    return pd.read_csv(output_path, float_precision='round_trip')
+
+def main():
+    """Score the input with every path and compare the predictions."""
+    args = parse_arguments()
+    modes = {
+        'chunked': ['--chunk-size', str(args.chunk_size)],
+        'parallel': ['--chunk-size', str(args.chunk_size), '--workers', str(args.workers)]
+    }
+    if args.workers <= 1:
+        del modes['parallel']
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"Scoring {args.input_path} in memory")
+        reference = run_predict(args, os.path.join(tmp_dir, 'in_memory.csv'))
+        mismatches = 0
+        for mode, extra in modes.items():
+            print(f"Scoring {args.input_path} {mode} ({' '.join(extra)})")
+            predictions = run_predict(args, os.path.join(tmp_dir, f'{mode}.csv'), extra)
+            if list(predictions.columns) != list(reference.columns) or len(predictions) != len(reference):
+                print(f"  {mode}: columns or row count differ from the in-memory output "
+                      f"({list(predictions.columns)}, {len(predictions)} rows)")
+                mismatches += 1
+                continue
+            for column in reference.columns:
+                difference = (predictions[column] - reference[column]).abs()
+                both_missing = predictions[column].isna() & reference[column].isna()
+                max_difference = difference[~both_missing].max() if (~both_missing).any() else 0.0
+                if pd.isna(max_difference) or max_difference > args.tolerance:
+                    mismatches += 1
+                print(f"  {mode} {column}: max abs difference {max_difference:.3g}")
+    
+    if mismatches:
+        print(f"\nError: the prediction paths disagree ({mismatches} mismatches)")
+        sys.exit(1)
+    print(f"\nAll prediction paths agree on {len(reference)} rows")
+
+if __name__ == "__main__":
+    main()
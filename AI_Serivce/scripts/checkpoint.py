@@ -0,0 +1,117 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+from scipy import sparse
+
+from models.artifact_store import save_artifact, load_artifact
+
+class TrainingCheckpoint:
+    """
+    Completed units of work of a training run, kept until the run finishes
+    
+    A unit (e.g. the preprocessed data of a target, or one trained model) is
+    saved with save() once it is complete. Objects go to an artifact store in
+    the checkpoint directory; large matrices are written as .npy (or sparse
+    .npz) files and reopened memory-mapped. state.json lists the completed
+    units and is replaced atomically after each unit's files are written, so a
+    run killed at any point resumes from the last completed unit.
+    
+    Parameters:
+    -----------
+    path : str
+        Checkpoint directory
+    settings : str
+        Digest of the run settings; a checkpoint made with other settings is not resumed
+    """
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self.completed = []
+    
+    @classmethod
+    def open(cls, path, settings, resume=False):
+        """
+        Start a checkpoint, continuing a previous one if resume is set and the settings match
+        
+        Returns:
+        --------
+        TrainingCheckpoint
+            Checkpoint with the units completed so far
+        """
+        checkpoint = cls(path, settings)
+        state_path = os.path.join(path, 'state.json')
+        if resume and os.path.exists(state_path):
+            with open(state_path) as f:
+                state = json.load(f)
+            if state.get('settings') == settings:
+                checkpoint.completed = state['completed']
+                print(f"Resuming from checkpoint {path} ({len(checkpoint.completed)} completed units)")
+                return checkpoint
+            print(f"Warning: Checkpoint {path} was made with different settings or data, starting over")
+        elif resume:
+            print(f"No checkpoint found in {path}, starting from the beginning")
+        checkpoint.clear()
+        return checkpoint
+    
+    def has(self, unit):
+        """Whether a unit was completed."""
+        return unit in self.completed
+    
+    def save(self, unit, obj, matrices=None):
+        """
+        Save a completed unit
+        
+        Parameters:
+        -----------
+        unit : str
+            Unit name, e.g. 'xgboost_offerPrice'
+        obj : object
+            Picklable state of the unit
+        matrices : dict, optional
+            Dense or sparse matrices stored as separate files, by name
+        """
+        for name, X in (matrices or {}).items():
+            if sparse.issparse(X):
+                sparse.save_npz(os.path.join(self.path, f'{unit}.{name}.npz'), X.tocsr(), compressed=False)
+            else:
+                np.save(os.path.join(self.path, f'{unit}.{name}.npy'), X)
+        save_artifact(self.path, f'{unit}.joblib', {'state': obj, 'matrices': sorted(matrices or {})})
+        self.completed.append(unit)
+        self._write_state()
+    
+    def load(self, unit):
+        """
+        Load a completed unit
+        
+        Returns:
+        --------
+        tuple
+            (object, dict of matrices; dense ones are read-only memory maps)
+        """
+        saved = load_artifact(self.path, f'{unit}.joblib', shared=False)
+        matrices = {}
+        for name in saved['matrices']:
+            sparse_path = os.path.join(self.path, f'{unit}.{name}.npz')
+            if os.path.exists(sparse_path):
+                matrices[name] = sparse.load_npz(sparse_path)
+            else:
+                matrices[name] = np.load(os.path.join(self.path, f'{unit}.{name}.npy'), mmap_mode='r')
+        return saved['state'], matrices
+    
+    def _write_state(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix='.state_')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'settings': self.settings, 'completed': self.completed}, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, 'state.json'))
+    
+    def clear(self):
+        """Delete all saved units and start an empty checkpoint."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+        self.completed = []
+    
+    def remove(self):
+        """Delete the checkpoint directory (after the run completed)."""
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import subprocess
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    mode TEXT,
+    status TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    git_commit TEXT,
+    git_dirty INTEGER,
+    params TEXT,
+    data_path TEXT,
+    data_hash TEXT,
+    wall_seconds REAL,
+    cpu_seconds REAL,
+    peak_rss_mb REAL,
+    store_bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER,
+    position INTEGER,
+    stage TEXT,
+    wall_seconds REAL,
+    cpu_seconds REAL,
+    peak_rss_mb REAL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER,
+    target TEXT,
+    model TEXT,
+    metric TEXT,
+    value REAL
+);
+"""
+
+def file_sha256(path):
+    """Return the SHA-256 digest of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def git_revision():
+    """Return (commit hash, whether the working tree has uncommitted changes), or (None, None) outside git."""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=cwd, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+def _reset_peak_rss():
+    """Reset the kernel's peak RSS counter of this process (Linux); return whether it worked."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB (since the last reset on Linux), or None."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        # ru_maxrss is in kB on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / (1024 if os.uname().sysname == 'Darwin' else 1)
+    return None
+
+def measure_latency(model, X, n_repeats=5, n_single=50):
+    """
+    Time batch and single-row predictions of a model
+    
+    Parameters:
+    -----------
+    model : estimator
+        Trained model with a predict method
+    X : numpy.ndarray
+        Rows to predict
+    n_repeats : int, default=5
+        Batch predictions timed (the fastest is reported)
+    n_single : int, default=50
+        Single-row predictions timed (the median is reported)
+    
+    Returns:
+    --------
+    dict
+        batch_us_per_row and single_row_ms
+    """
+    batch_times = []
+    for _ in range(n_repeats):
+        start_time = time.perf_counter()
+        model.predict(X)
+        batch_times.append(time.perf_counter() - start_time)
+    single_times = []
+    for idx in range(n_single):
+        row = X[idx % X.shape[0]:idx % X.shape[0] + 1]
+        start_time = time.perf_counter()
+        model.predict(row)
+        single_times.append(time.perf_counter() - start_time)
+    return {
+        'batch_us_per_row': min(batch_times) / X.shape[0] * 1e6,
+        'single_row_ms': float(np.median(single_times)) * 1e3
+    }
+
+class ExperimentRun:
+    """
+    One tracked training run
+    
+    Stages are consecutive: start_stage closes the running stage and starts the
+    next one, so instrumenting a script only takes one call per stage boundary.
+    Every stage records its wall time, CPU time and peak RSS. Each write is
+    committed at once, so a crashed run keeps the stages it finished.
+    
+    Parameters:
+    -----------
+    store : ExperimentStore or None
+        Store to write to (None measures nothing and records nothing)
+    run_id : int, optional
+        Row of the run in the store
+    """
+    def __init__(self, store=None, run_id=None):
+        self.store = store
+        self.run_id = run_id
+        self._stage = None
+        self._n_stages = 0
+        self._start = (time.perf_counter(), time.process_time())
+        self._peak_rss = 0.0
+    
+    def start_stage(self, name):
+        """End the running stage (if any) and start measuring the next one."""
+        if self.store is None:
+            return
+        self._end_stage()
+        _reset_peak_rss()
+        self._stage = (name, time.perf_counter(), time.process_time())
+    
+    def _end_stage(self):
+        if self._stage is None:
+            return
+        name, wall_start, cpu_start = self._stage
+        peak_rss = _peak_rss_mb()
+        if peak_rss is not None:
+            self._peak_rss = max(self._peak_rss, peak_rss)
+        self.store.execute('INSERT INTO stages VALUES (?, ?, ?, ?, ?, ?)',
+                           (self.run_id, self._n_stages, name, time.perf_counter() - wall_start,
+                            time.process_time() - cpu_start, peak_rss))
+        self._n_stages += 1
+        self._stage = None
+    
+    def log_metrics(self, target, model, **metrics):
+        """Record named metric values of a (target, model) pair."""
+        if self.store is None:
+            return
+        for metric, value in metrics.items():
+            if value is not None:
+                self.store.execute('INSERT INTO metrics VALUES (?, ?, ?, ?, ?)',
+                                   (self.run_id, target, model, metric, float(value)))
+    
+    def finish(self, status='completed', store_bytes=None):
+        """
+        End the last stage and record the run's totals
+        
+        Parameters:
+        -----------
+        status : str, default='completed'
+            Final status, e.g. 'completed' or 'failed'
+        store_bytes : int, optional
+            Size of the saved models on disk
+        """
+        if self.store is None:
+            return
+        self._end_stage()
+        wall_start, cpu_start = self._start
+        self.store.execute('UPDATE runs SET status = ?, finished_at = ?, wall_seconds = ?, cpu_seconds = ?, '
+                           'peak_rss_mb = ?, store_bytes = ? WHERE run_id = ?',
+                           (status, time.strftime('%Y-%m-%d %H:%M:%S'), time.perf_counter() - wall_start,
+                            time.process_time() - cpu_start, self._peak_rss or None, store_bytes, self.run_id))
+
+class ExperimentStore:
+    """
+    SQLite database of training runs
+    
+    Tables:
+    - runs: one row per run with its parameters, input data hash, git commit,
+      status and total wall time, CPU time, peak RSS and model size on disk
+    - stages: wall time, CPU time and peak RSS of every stage of a run
+    - metrics: (target, model, metric, value) rows, e.g. test RMSE, model size
+      and batch/single-row prediction latency
+    
+    Parameters:
+    -----------
+    path : str
+        Database file (created if missing)
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+    
+    def execute(self, sql, parameters=()):
+        """Run one statement and commit it."""
+        cursor = self.connection.execute(sql, parameters)
+        self.connection.commit()
+        return cursor
+    
+    def start_run(self, params, data_path=None, name=None, mode='train'):
+        """
+        Register a new run
+        
+        Parameters:
+        -----------
+        params : dict
+            JSON-serializable run parameters (command line arguments, tuned parameters)
+        data_path : str, optional
+            Input data file, hashed so runs on different data are told apart
+        name : str, optional
+            Free-form label
+        mode : str, default='train'
+            Kind of run, e.g. 'train', 'incremental' or 'multi_output'
+        
+        Returns:
+        --------
+        ExperimentRun
+            Run to record stages and metrics into
+        """
+        commit, dirty = git_revision()
+        data_hash = file_sha256(data_path) if data_path and os.path.exists(data_path) else None
+        cursor = self.execute(
+            'INSERT INTO runs (name, mode, status, started_at, git_commit, git_dirty, params, data_path, data_hash) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (name, mode, 'running', time.strftime('%Y-%m-%d %H:%M:%S'), commit,
+             None if dirty is None else int(dirty), json.dumps(params, sort_keys=True, default=str),
+             data_path, data_hash))
+        return ExperimentRun(self, cursor.lastrowid)
+    
+    def runs(self, limit=None):
+        """Return the most recent runs first."""
+        sql = 'SELECT * FROM runs ORDER BY run_id DESC'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return [dict(row) for row in self.connection.execute(sql)]
+    
+    def run(self, run_id):
+        """Return a run as a dict, or None."""
+        row = self.connection.execute('SELECT * FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+        return dict(row) if row is not None else None
+    
+    def resolve(self, ref):
+        """
+        Find a run by id, or the latest completed run of a git commit (prefix)
+        
+        Returns:
+        --------
+        dict or None
+            The run
+        """
+        if str(ref).isdigit():
+            return self.run(int(ref))
+        row = self.connection.execute(
+            "SELECT * FROM runs WHERE git_commit LIKE ? AND status = 'completed' ORDER BY run_id DESC LIMIT 1",
+            (f'{ref}%',)).fetchone()
+        return dict(row) if row is not None else None
+    
+    def stages(self, run_id):
+        """Return the stages of a run in execution order."""
+        return [dict(row) for row in self.connection.execute(
+            'SELECT stage, wall_seconds, cpu_seconds, peak_rss_mb FROM stages WHERE run_id = ? ORDER BY position',
+            (run_id,))]
+    
+    def metrics(self, run_id):
+        """Return the metrics of a run as {(target, model, metric): value}."""
+        return {(row['target'], row['model'], row['metric']): row['value'] for row in self.connection.execute(
+            'SELECT target, model, metric, value FROM metrics WHERE run_id = ?', (run_id,))}
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+import json
+import sys
+
+# Add parent directory to path to enable relative imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.experiment_store import ExperimentStore
+
+# Relative increase of a value that counts as a regression, by kind of measurement
+METRIC_KINDS = {
+    'mse': 'accuracy',
+    'rmse': 'accuracy',
+    'new_rows_rmse_after': 'accuracy',
+    'batch_us_per_row': 'time',
+    'single_row_ms': 'time',
+    'model_bytes': 'size'
+}
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='List and compare training runs recorded by scripts/train.py')
+    parser.add_argument('--db', type=str, default='models/trained/experiments.db',
+                        help='Experiment store written by train.py (--experiment-db)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    list_parser = subparsers.add_parser('list', help='List recent runs')
+    list_parser.add_argument('--limit', type=int, default=20, help='Number of runs to show')
+    
+    show_parser = subparsers.add_parser('show', help='Show the parameters, stages and metrics of a run')
+    show_parser.add_argument('run', type=str, help='Run id or git commit (prefix)')
+    
+    compare_parser = subparsers.add_parser('compare', help='Compare two runs and flag regressions')
+    compare_parser.add_argument('base', type=str, nargs='?', default=None,
+                                help='Baseline run id or git commit (default: the completed run before candidate)')
+    compare_parser.add_argument('candidate', type=str, nargs='?', default=None,
+                                help='Candidate run id or git commit (default: the latest completed run)')
+    compare_parser.add_argument('--accuracy-tolerance', type=float, default=0.01,
+                                help='Allowed relative increase of MSE/RMSE')
+    compare_parser.add_argument('--time-tolerance', type=float, default=0.3,
+                                help='Allowed relative increase of stage times and prediction latency')
+    compare_parser.add_argument('--size-tolerance', type=float, default=0.05,
+                                help='Allowed relative increase of model size and peak RSS')
+    compare_parser.add_argument('--min-seconds', type=float, default=0.5,
+                                help='Stage and total time increases smaller than this are not flagged (timer noise)')
+    
+    return parser.parse_args()
+
+def format_bytes(n_bytes):
+    """Human-readable size."""
+    if n_bytes is None:
+        return '-'
+    for unit in ['B', 'kB', 'MB']:
+        if abs(n_bytes) < 1024:
+            return f"{n_bytes:.1f} {unit}"
+        n_bytes /= 1024
+    return f"{n_bytes:.1f} GB"
+
+def format_value(value):
+    if value is None:
+        return '-'
+    return f"{value:.4g}"
+
+def list_runs(store, limit):
+    """Print recent runs."""
+    print(f"{'run':>5} {'started':>19} {'mode':>12} {'status':>9} {'commit':>9} {'data':>8} "
+          f"{'wall s':>8} {'cpu s':>8} {'rss MB':>7} {'models':>9}  name")
+    for run in store.runs(limit):
+        commit = (run['git_commit'] or '-')[:7] + ('*' if run['git_dirty'] else '')
+        print(f"{run['run_id']:>5} {run['started_at']:>19} {run['mode']:>12} {run['status']:>9} {commit:>9} "
+              f"{(run['data_hash'] or '-')[:8]:>8} {format_value(run['wall_seconds']):>8} "
+              f"{format_value(run['cpu_seconds']):>8} {format_value(run['peak_rss_mb']):>7} "
+              f"{format_bytes(run['store_bytes']):>9}  {run['name'] or ''}")
+
+def show_run(store, run):
+    """Print the parameters, stages and metrics of a run."""
+    for key in ['run_id', 'name', 'mode', 'status', 'started_at', 'finished_at', 'git_commit', 'git_dirty',
+                'data_path', 'data_hash', 'wall_seconds', 'cpu_seconds', 'peak_rss_mb']:
+        print(f"{key:>13}: {run[key]}")
+    print(f"{'models':>13}: {format_bytes(run['store_bytes'])}")
+    print(f"\nParameters:\n{json.dumps(json.loads(run['params']), indent=2, sort_keys=True)}")
+    
+    print(f"\n{'stage':>32} {'wall s':>9} {'cpu s':>9} {'rss MB':>8}")
+    for stage in store.stages(run['run_id']):
+        print(f"{stage['stage']:>32} {stage['wall_seconds']:>9.3f} {stage['cpu_seconds']:>9.3f} "
+              f"{format_value(stage['peak_rss_mb']):>8}")
+    
+    print(f"\n{'target':>11} {'model':>15} {'metric':>20} {'value':>12}")
+    for (target, model, metric), value in sorted(store.metrics(run['run_id']).items()):
+        print(f"{target:>11} {model:>15} {metric:>20} {value:>12.5g}")
+
+def is_regression(kind, base, candidate, args):
+    """Whether candidate is worse than base by more than the tolerance of its kind (lower is better)."""
+    if kind is None or base is None or candidate is None or base <= 0:
+        return False
+    tolerance = {'accuracy': args.accuracy_tolerance, 'time': args.time_tolerance,
+                 'size': args.size_tolerance}[kind]
+    return candidate > base * (1 + tolerance)
+
+def comparison_row(label, base, candidate, kind, args):
+    """Format one compared value; return (line, is_regression)."""
+    change = '-'
+    if base is not None and candidate is not None and base != 0:
+        change = f"{(candidate - base) / abs(base):+.1%}"
+    regression = is_regression(kind, base, candidate, args)
+    return (f"{label:>48} {format_value(base):>11} {format_value(candidate):>11} {change:>8}"
+            f"{'  REGRESSION' if regression else ''}"), regression
+
+def compare_runs(store, base, candidate, args):
+    """
+    Print the metrics, stage timings and totals of two runs side by side
+    
+    Returns:
+    --------
+    int
+        Number of flagged regressions
+    """
+    print(f"Base: run {base['run_id']} ({(base['git_commit'] or '-')[:7]}, {base['started_at']})")
+    print(f"Candidate: run {candidate['run_id']} ({(candidate['git_commit'] or '-')[:7]}, {candidate['started_at']})")
+    if base['data_hash'] != candidate['data_hash']:
+        print("Warning: the runs used different input data")
+    base_params, candidate_params = json.loads(base['params']), json.loads(candidate['params'])
+    changed = sorted(key for key in set(base_params) | set(candidate_params)
+                     if key not in ('run_name', 'experiment_db') and base_params.get(key) != candidate_params.get(key))
+    for key in changed:
+        print(f"Warning: parameter {key} differs: {base_params.get(key)} -> {candidate_params.get(key)}")
+    
+    lines, n_regressions = [], 0
+    header = f"{'':>48} {'base':>11} {'candidate':>11} {'change':>8}"
+    
+    base_metrics, candidate_metrics = store.metrics(base['run_id']), store.metrics(candidate['run_id'])
+    lines.append(f"\nMetrics:\n{header}")
+    for key in sorted(set(base_metrics) | set(candidate_metrics)):
+        line, regression = comparison_row(' '.join(key), base_metrics.get(key), candidate_metrics.get(key),
+                                          METRIC_KINDS.get(key[2]), args)
+        lines.append(line)
+        n_regressions += regression
+    
+    base_stages = {stage['stage']: stage for stage in store.stages(base['run_id'])}
+    candidate_stages = {stage['stage']: stage for stage in store.stages(candidate['run_id'])}
+    lines.append(f"\nStages:\n{header}")
+    for name in list(base_stages) + [name for name in candidate_stages if name not in base_stages]:
+        base_stage, candidate_stage = base_stages.get(name, {}), candidate_stages.get(name, {})
+        for field, kind in [('wall_seconds', 'time'), ('cpu_seconds', 'time'), ('peak_rss_mb', 'size')]:
+            base_value, candidate_value = base_stage.get(field), candidate_stage.get(field)
+            if kind == 'time' and (candidate_value or 0) - (base_value or 0) < args.min_seconds:
+                kind = None
+            line, regression = comparison_row(f"{name} {field}", base_value, candidate_value, kind, args)
+            lines.append(line)
+            n_regressions += regression
+    
+    lines.append(f"\nTotals:\n{header}")
+    for field, kind in [('wall_seconds', 'time'), ('cpu_seconds', 'time'), ('peak_rss_mb', 'size'),
+                        ('store_bytes', 'size')]:
+        if kind == 'time' and (candidate[field] or 0) - (base[field] or 0) < args.min_seconds:
+            kind = None
+        line, regression = comparison_row(field, base[field], candidate[field], kind, args)
+        lines.append(line)
+        n_regressions += regression
+    
+    print('\n'.join(lines))
+    print(f"\n{n_regressions} regression(s) flagged")
+    return n_regressions
+
+def main():
+    """Main function of the experiment store CLI."""
+    args = parse_arguments()
+    if not os.path.exists(args.db):
+        print(f"Error: Experiment store {args.db} not found")
+        return 1
+    store = ExperimentStore(args.db)
+    
+    if args.command == 'list':
+        list_runs(store, args.limit)
+        return 0
+    
+    if args.command == 'show':
+        run = store.resolve(args.run)
+        if run is None:
+            print(f"Error: Run {args.run} not found")
+            return 1
+        show_run(store, run)
+        return 0
+    
+    completed = [run for run in store.runs() if run['status'] == 'completed']
+    candidate = store.resolve(args.candidate) if args.candidate else (completed[0] if completed else None)
+    if candidate is None:
+        print(f"Error: Candidate run {args.candidate or '(latest)'} not found")
+        return 1
+    if args.base:
+        base = store.resolve(args.base)
+    else:
+        earlier = [run for run in completed if run['run_id'] < candidate['run_id']]
+        base = earlier[0] if earlier else None
+    if base is None:
+        print(f"Error: Base run {args.base or '(previous)'} not found")
+        return 1
+    return 1 if compare_runs(store, base, candidate, args) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
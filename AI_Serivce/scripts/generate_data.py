@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from numpy.lib.format import open_memmap
+import sys
+
+# Add parent directory to path to enable relative imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing.synthetic_data import SyntheticIPOGenerator, chunk_rng, save_generator, load_generator
+from preprocessing.chunked_pipeline import ordered_map
+
+# Generator used by the worker processes
+_GENERATOR = None
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Generate synthetic IPO data for scale and load testing')
+    
+    parser.add_argument('--input-path', type=str, default='data/raw/training_data.csv',
+                        help='Training data the generator is fitted to')
+    parser.add_argument('--output-path', type=str, required=True,
+                        help='CSV file, or directory of the columnar dataset with --format npy')
+    parser.add_argument('--rows', type=int, required=True,
+                        help='Number of rows to generate')
+    parser.add_argument('--format', type=str, default='csv', choices=['csv', 'npy'],
+                        help='csv, or npy: one memory-mappable .npy file per column plus manifest.json')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed; the output depends only on the seed, rows and chunk size')
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help='Rows generated per chunk (the unit of parallel work)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of worker processes')
+    parser.add_argument('--spec-path', type=str, default=None,
+                        help='Fitted generator (JSON) to load if it exists, or to save after fitting')
+    parser.add_argument('--no-targets', action='store_true',
+                        help='Leave out closeDay1 and offerPrice (data to score rather than to train on)')
+    
+    return parser.parse_args()
+
+def _init_worker(spec):
+    """Build the generator once per worker process."""
+    global _GENERATOR
+    _GENERATOR = SyntheticIPOGenerator.from_dict(spec)
+
+def generate_chunk(chunk_index, start, n_rows, seed, columns):
+    """Draw the rows of one chunk."""
+    return _GENERATOR.sample(n_rows, chunk_rng(seed, chunk_index))[columns]
+
+def csv_chunk(chunk_index, start, n_rows, seed, columns):
+    """Draw one chunk and format it as CSV lines (without header)."""
+    return generate_chunk(chunk_index, start, n_rows, seed, columns).to_csv(header=False, index=False)
+
+def npy_chunk(chunk_index, start, n_rows, seed, columns, output_path, categories):
+    """Draw one chunk and write it into its row range of the preallocated column files."""
+    chunk = generate_chunk(chunk_index, start, n_rows, seed, columns)
+    for column in columns:
+        values = chunk[column]
+        if column in categories:
+            values = pd.Categorical(values, categories=categories[column]).codes
+        target = np.load(os.path.join(output_path, f'{column}.npy'), mmap_mode='r+')
+        target[start:start + n_rows] = values
+        target.flush()
+        del target
+    return n_rows
+
+def fit_generator(args):
+    """Load the generator from --spec-path, or fit it to the input data (and save it there)."""
+    if args.spec_path and os.path.exists(args.spec_path):
+        print(f"Loading generator from {args.spec_path}")
+        return load_generator(args.spec_path)
+    print(f"Fitting generator to {args.input_path}")
+    generator = SyntheticIPOGenerator.fit(pd.read_csv(args.input_path))
+    if args.spec_path:
+        save_generator(generator, args.spec_path)
+        print(f"Generator saved to {args.spec_path}")
+    return generator
+
+def main():
+    """Main function to generate the data."""
+    args = parse_arguments()
+    if args.rows <= 0 or args.chunk_size <= 0:
+        print("Error: --rows and --chunk-size must be positive")
+        return
+    
+    try:
+        generator = fit_generator(args)
+    except FileNotFoundError:
+        print(f"Error: File {args.input_path} not found")
+        return
+    spec = generator.to_dict()
+    columns = [column for column in spec['columns']
+               if not (args.no_targets and column in ('closeDay1', 'offerPrice'))]
+    
+    starts = range(0, args.rows, args.chunk_size)
+    chunks = [(idx, start, min(args.chunk_size, args.rows - start), args.seed, columns)
+              for idx, start in enumerate(starts)]
+    print(f"Generating {args.rows} rows in {len(chunks)} chunks with {args.workers} workers")
+    start_time = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(spec,)) as executor:
+        if args.format == 'csv':
+            os.makedirs(os.path.dirname(os.path.abspath(args.output_path)), exist_ok=True)
+            tmp_path = args.output_path + '.tmp'
+            with open(tmp_path, 'w', newline='') as f:
+                f.write(','.join(columns) + '\n')
+                for idx, text in enumerate(ordered_map(executor, csv_chunk, chunks, 2 * args.workers), 1):
+                    f.write(text)
+                    print(f"  chunk {idx}/{len(chunks)}", end='\r')
+            os.replace(tmp_path, args.output_path)
+        else:
+            os.makedirs(args.output_path, exist_ok=True)
+            sample = generator.sample(1, chunk_rng(args.seed, 0))
+            categories = {column: spec['groups']['levels'][column] for column in columns
+                          if not pd.api.types.is_numeric_dtype(sample[column])}
+            for column in columns:
+                dtype = np.int16 if column in categories else sample[column].to_numpy().dtype
+                open_memmap(os.path.join(args.output_path, f'{column}.npy'), mode='w+',
+                            dtype=dtype, shape=(args.rows,)).flush()
+            tasks = [chunk + (args.output_path, categories) for chunk in chunks]
+            for idx, _ in enumerate(ordered_map(executor, npy_chunk, tasks, 2 * args.workers), 1):
+                print(f"  chunk {idx}/{len(chunks)}", end='\r')
+            with open(os.path.join(args.output_path, 'manifest.json'), 'w') as f:
+                json.dump({'columns': columns, 'rows': args.rows, 'seed': args.seed,
+                           'chunk_size': args.chunk_size, 'categories': categories}, f, indent=2)
+    
+    elapsed = time.perf_counter() - start_time
+    print(f"\n{args.rows} rows written to {args.output_path} in {elapsed:.1f} s "
+          f"({args.rows / elapsed:,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
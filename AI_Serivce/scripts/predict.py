@@ -4,18 +4,33 @@ import os
 import argparse
 import pandas as pd
 import numpy as np
-from joblib import load
 import sys
 import math
+import time
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.metrics import mean_squared_error, r2_score
 
 # Add parent directory to path to enable relative imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from preprocessing.clean_data import clean_data
-from preprocessing.encode_categorical import encode_categorical_features
+from preprocessing.encode_categorical import (encode_categorical_features, load_categorical_encoder,
+                                              SparseOneHotEncoder, TargetEncoder)
 from preprocessing.impute_missing import impute_numeric_features
-from preprocessing.feature_engineering import apply_feature_engineering
+from preprocessing.feature_expressions import build_feature_set, feature_set_from_columns, load_feature_set
+from preprocessing.chunked_pipeline import (ChunkedPipeline, read_csv_chunks, read_csv_shards, parse_csv_shard,
+                                            ordered_map)
+from models.multi_output_model import predict_multi_output
+from models.xgboost_model import predict_xgboost
+from xgboost import XGBRegressor
+from models.artifact_store import artifact_exists, load_artifact, load_artifact_path
+from scripts.prediction_writers import (WRITERS, open_writer, write_predictions, output_frame, read_sample,
+                                        infer_output_format, parquet_available)
+
+# Loaded scoring state of the chunk workers (inherited from the parent when processes are forked)
+_SCORING_STATE = None
 
 def parse_arguments():
     """Parse command line arguments."""
@@ -24,7 +39,7 @@ def parse_arguments():
     parser.add_argument('--input-path', type=str, default='data/raw/testing.csv',
                         help='Path to the input CSV file')
     parser.add_argument('--output-path', type=str, default='data/predictions/predictions.csv',
-                        help='Path to save the output CSV file with predictions')
+                        help='Path to save the predictions (.csv, .ndjson/.jsonl or .parquet; .gz compresses text output)')
     parser.add_argument('--model-path', type=str, default='models/trained',
                         help='Directory containing trained models and preprocessors')
     parser.add_argument('--model-type', type=str, default='ensemble',
@@ -37,6 +52,19 @@ def parse_arguments():
                         help='Apply feature engineering')
     parser.add_argument('--select-features', action='store_true',
                         help='Use feature selection')
+    parser.add_argument('--multi-output', action='store_true',
+                        help='Predict both targets with the joint model (multi_output_model.joblib)')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Stream the input in chunks of this many rows, appending the predictions of each chunk')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Score chunks in this many parallel processes (streams in chunks of 10000 rows '
+                             'if --chunk-size is not given)')
+    parser.add_argument('--output-format', type=str, default=None, choices=list(WRITERS),
+                        help='Output format (default: from the --output-path extension, csv otherwise)')
+    parser.add_argument('--id-column', type=str, default=None,
+                        help='Input column copied to the output as the first column, to join predictions back')
+    parser.add_argument('--row-number', action='store_true',
+                        help='Add the 0-based input row position as a row_number column')
     
     return parser.parse_args()
 
@@ -52,16 +80,22 @@ def load_model(model_path, model_type, target):
         Type of model to load
     target : str
         Target variable
-        
+    
     Returns:
     --------
     object
         Loaded model
     """
     if model_type == 'all':
-        return load(os.path.join(model_path, f'{target}_models.joblib'))
+        return load_artifact(model_path, f'{target}_models.joblib')
     else:
-        return load(os.path.join(model_path, f'{model_type}_{target}.joblib'))
+        return load_artifact(model_path, f'{model_type}_{target}.joblib')
+
+def predict_with_model(model, X):
+    """Predict with a loaded model, using the native booster directly for XGBoost models."""
+    if isinstance(model, XGBRegressor):
+        return predict_xgboost(model, X)
+    return model.predict(X)
 
 def calculate_metrics(y_true, y_pred):
     """Calculate evaluation metrics if actual values are available."""
@@ -73,6 +107,340 @@ def calculate_metrics(y_true, y_pred):
     r2 = r2_score(y_true, y_pred)
     return mse, rmse, r2
 
+def predict_with_multi_output_model(args, data, numeric_features):
+    """
+    Predict offerPrice and closeDay1 in one pass with the joint multi-output model
+    
+    Adds 'predicted_{target}' columns to data for every target of the model.
+    
+    Returns:
+    --------
+    bool
+        True if predictions were made
+    """
+    if not artifact_exists(args.model_path, 'multi_output_model.joblib'):
+        print(f"Error: Multi-output model not found in {args.model_path}")
+        print("Please train it with train.py --multi-output")
+        return False
+    
+    bundle = load_artifact(args.model_path, 'multi_output_model.joblib')
+    feature_set = bundle.get('feature_set') or feature_set_from_columns(bundle['feature_names'])
+    X = feature_set.transform_frame(data)
+    
+    X_imputed, _ = impute_numeric_features(X, bundle['imputer'])
+    X_scaled = bundle['scaler'].transform(X_imputed)
+    predictions = predict_multi_output(bundle['model'], X_scaled)
+    
+    for idx, target in enumerate(bundle['targets']):
+        data[f'predicted_{target}'] = predictions[:, idx]
+        if target in data.columns:
+            mask = ~data[target].isna()
+            if mask.any():
+                mse, rmse, r2 = calculate_metrics(data.loc[mask, target], predictions[mask.to_numpy(), idx])
+                print(f"\nEvaluation metrics for {target}:")
+                print(f"  MSE: {mse:.4f}")
+                print(f"  RMSE: {rmse:.4f}")
+                print(f"  R2: {r2:.4f}")
+    
+    return True
+
+class RunningMetrics:
+    """
+    MSE, RMSE and R2 accumulated chunk by chunk
+    
+    Per-chunk means and sums of squares are merged with Chan's update, so the
+    result equals calculate_metrics on all rows without keeping them, whatever
+    order the chunks are merged in.
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sse = 0.0
+    
+    def update(self, y_true, y_pred):
+        """Add the labelled rows of a chunk (rows with missing actual values are skipped)."""
+        y_true = np.asarray(y_true, dtype=np.float64)
+        mask = ~np.isnan(y_true)
+        if not mask.any():
+            return
+        y_true, y_pred = y_true[mask], np.asarray(y_pred, dtype=np.float64)[mask]
+        chunk = RunningMetrics()
+        chunk.n, chunk.mean = len(y_true), y_true.mean()
+        chunk.m2 = ((y_true - chunk.mean) ** 2).sum()
+        chunk.sse = ((y_true - y_pred) ** 2).sum()
+        self.merge(chunk)
+    
+    def merge(self, other):
+        """Add the rows accumulated by another RunningMetrics (e.g. of a worker's chunk)."""
+        if other.n == 0:
+            return
+        delta = other.mean - self.mean
+        total = self.n + other.n
+        self.m2 += other.m2 + delta ** 2 * self.n * other.n / total
+        self.mean += delta * other.n / total
+        self.n = total
+        self.sse += other.sse
+    
+    def result(self):
+        """Return (mse, rmse, r2), or (None, None, None) without labelled rows."""
+        if self.n == 0:
+            return None, None, None
+        mse = self.sse / self.n
+        r2 = 1 - self.sse / self.m2 if self.m2 > 0 else float('nan')
+        return mse, math.sqrt(mse), r2
+
+def load_chunk_scorer(args, target, encoder):
+    """
+    Load the preprocessors and models of a target once for chunked scoring
+    
+    Returns:
+    --------
+    tuple or None
+        (ChunkedPipeline, dict of models by name), None if they cannot be used
+    """
+    try:
+        imputer = load_artifact(args.model_path, f'imputer_{target}.joblib')
+        scaler = load_artifact(args.model_path, f'scaler_{target}.joblib')
+    except FileNotFoundError as e:
+        print(f"Error loading preprocessors: {e}")
+        return None
+    if any(artifact_exists(args.model_path, f'{name}_{target}.joblib')
+           for name in ['category_encoder', 'missing_indicators']):
+        print(f"Error: Models for {target} use one-hot/target encoding or missing-value indicators, "
+              f"which --chunk-size does not support")
+        return None
+    feature_selector = None
+    if args.select_features and artifact_exists(args.model_path, f'feature_selector_{target}.joblib'):
+        feature_selector = load_artifact(args.model_path, f'feature_selector_{target}.joblib')
+    feature_set = load_feature_set(os.path.join(args.model_path, f'feature_set_{target}.joblib'),
+                                   list(imputer.feature_names_in_), load_artifact_path)
+    try:
+        models = load_model(args.model_path, args.model_type, target)
+    except FileNotFoundError as e:
+        print(f"Error loading model: {e}")
+        return None
+    if args.model_type != 'all':
+        models = {args.model_type: models}
+    return ChunkedPipeline(feature_set, imputer, scaler, encoder, feature_selector), models
+
+def score_chunk(chunk, encoder, scorers, bundle=None):
+    """
+    Run the prediction chain on one raw chunk
+    
+    The chunk is cleaned and encoded once and transformed by the pipeline of
+    every target; the offerPrice predictions are passed on as a feature of closeDay1.
+    
+    Parameters:
+    -----------
+    chunk : pandas.DataFrame
+        Raw input rows
+    encoder : CategoricalEncoder
+        Fitted categorical encoder
+    scorers : dict
+        (ChunkedPipeline, models) by target, in prediction order
+    bundle : dict, optional
+        Multi-output bundle; used instead of scorers when given
+    
+    Returns:
+    --------
+    tuple
+        (prepared chunk, dict of 'predicted_{target}' arrays)
+    """
+    prepared = encode_categorical_features(clean_data(chunk), encoder)
+    predictions = {}
+    if bundle is not None:
+        feature_set = bundle.get('feature_set') or feature_set_from_columns(bundle['feature_names'])
+        X_imputed, _ = impute_numeric_features(feature_set.transform_frame(prepared), bundle['imputer'])
+        Y = predict_multi_output(bundle['model'], bundle['scaler'].transform(X_imputed))
+        for idx, target in enumerate(bundle['targets']):
+            predictions[f'predicted_{target}'] = Y[:, idx]
+        return prepared, predictions
+    
+    for target, (pipeline, models) in scorers.items():
+        extra = None
+        if 'predicted_offerPrice' in predictions:
+            extra = {'predicted_offerPrice': predictions['predicted_offerPrice']}
+        X = pipeline.transform(prepared, extra)
+        predictions[f'predicted_{target}'] = sum(predict_with_model(model, X) for model in models.values()) / len(models)
+    return prepared, predictions
+
+def load_scorers(args, targets):
+    """
+    Load the encoder, preprocessors and models used to score chunks
+    
+    Returns:
+    --------
+    tuple or None
+        (encoder, scorers by target, multi-output bundle or None, predicted targets),
+        None if nothing can be predicted
+    """
+    encoder = load_categorical_encoder(os.path.join(args.model_path, 'categorical_encoder.joblib'), load_artifact_path)
+    if args.multi_output:
+        if not artifact_exists(args.model_path, 'multi_output_model.joblib'):
+            print(f"Error: Multi-output model not found in {args.model_path}")
+            print("Please train it with train.py --multi-output")
+            return None
+        bundle = load_artifact(args.model_path, 'multi_output_model.joblib')
+        return encoder, {}, bundle, list(bundle['targets'])
+    
+    scorers = {}
+    for target in targets:
+        scorer = load_chunk_scorer(args, target, encoder)
+        if scorer is not None:
+            scorers[target] = scorer
+    if not scorers:
+        return None
+    return encoder, scorers, None, list(scorers)
+
+def score_rows(chunk, offset, output, encoder, scorers, bundle, targets):
+    """
+    Score one raw chunk for output
+    
+    Parameters:
+    -----------
+    chunk : pandas.DataFrame
+        Raw input rows
+    offset : int
+        Input position of the chunk's first row
+    output : dict
+        Output options: format, id_column and row_number
+    
+    Returns:
+    --------
+    tuple
+        (chunk encoded by the output writer, RunningMetrics by target, number of rows)
+    """
+    prepared, predictions = score_chunk(chunk, encoder, scorers, bundle)
+    metrics = {target: RunningMetrics() for target in targets}
+    for target in targets:
+        if target in prepared.columns:
+            metrics[target].update(prepared[target], predictions[f'predicted_{target}'])
+    frame = output_frame(chunk, {f'predicted_{target}': predictions[f'predicted_{target}'] for target in targets},
+                         offset, output['id_column'], output['row_number'])
+    return WRITERS[output['format']].encode(frame), metrics, len(chunk)
+
+def _single_threaded(model):
+    """Limit XGBoost models (also inside an ensemble) to one thread, as every worker process scores on one core."""
+    if isinstance(model, XGBRegressor):
+        model.set_params(n_jobs=1)
+    estimators = getattr(model, 'estimators_', None)
+    if isinstance(estimators, list):
+        for estimator in estimators:
+            _single_threaded(estimator)
+
+def _init_worker(args, targets):
+    """Load the models in a worker process, unless they were inherited from the forked parent."""
+    global _SCORING_STATE
+    if _SCORING_STATE is None:
+        _SCORING_STATE = load_scorers(args, targets)
+    encoder, scorers, bundle, _ = _SCORING_STATE
+    for _, models in scorers.values():
+        for model in models.values():
+            _single_threaded(model)
+    if bundle is not None:
+        _single_threaded(bundle['model'])
+
+def _score_shard(header, block, n_records, offset, output):
+    """Parse, score and encode one shard in a worker process."""
+    return score_rows(parse_csv_shard(header, block, n_records), offset, output, *_SCORING_STATE)
+
+def _with_offsets(items, count):
+    """Pair every chunk or shard with the input position of its first row."""
+    offset = 0
+    for item in items:
+        yield offset, item
+        offset += count(item)
+
+def predict_chunked(args, targets, state=None):
+    """
+    Score the input in one streaming pass of --chunk-size rows
+    
+    Preprocessors and models are loaded once. Every chunk is read, run through
+    the whole offerPrice -> closeDay1 chain and appended to the output in
+    --output-format (a CSV or NDJSON block, or a Parquet row group), so memory
+    stays flat however large the input is. Evaluation metrics are accumulated
+    per chunk.
+    
+    With --workers N, the parent process splits the input into shards of raw
+    lines and N worker processes parse and score them in parallel. Where
+    processes are forked (Linux), the workers inherit the models loaded by the
+    parent and share their memory pages copy-on-write instead of loading their
+    own copies. The workers also encode their output, and results are written
+    in input order, with at most 2N shards in flight.
+    
+    Parameters:
+    -----------
+    args : argparse.Namespace
+        Command line arguments (input_path, output_path, output_format, id_column, row_number,
+        chunk_size, workers, ...)
+    targets : list
+        Targets to predict
+    state : tuple, optional
+        Result of load_scorers, to reuse models that are already loaded
+    
+    Returns:
+    --------
+    int or None
+        Number of rows scored (None if nothing could be predicted)
+    """
+    global _SCORING_STATE
+    if state is None:
+        state = load_scorers(args, targets)
+    if state is None:
+        return None
+    targets = state[3]
+    print(f"Scoring {args.input_path} in chunks of {args.chunk_size} rows for {', '.join(targets)}"
+          + (f" with {args.workers} workers" if args.workers > 1 else ""))
+    
+    output_options = {'format': args.output_format, 'id_column': args.id_column, 'row_number': args.row_number}
+    metrics = {target: RunningMetrics() for target in targets}
+    total_bytes = os.path.getsize(args.input_path)
+    n_rows = 0
+    start_time = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        source = stack.enter_context(open(args.input_path, 'rb'))
+        writer = open_writer(args.output_path, args.output_format)
+        stack.callback(writer.close)
+        if args.workers > 1:
+            _SCORING_STATE = state
+            context = (multiprocessing.get_context('fork')
+                       if 'fork' in multiprocessing.get_all_start_methods() else None)
+            executor = stack.enter_context(ProcessPoolExecutor(
+                max_workers=args.workers, mp_context=context, initializer=_init_worker, initargs=(args, targets)))
+            # Shards end on record boundaries and carry their row count, so the row
+            # offsets are known before the workers parse them
+            shards = ((header, block, n_records, offset, output_options)
+                      for offset, (header, block, n_records)
+                      in _with_offsets(read_csv_shards(source, args.chunk_size), lambda shard: shard[2]))
+            results = ordered_map(executor, _score_shard, shards, 2 * args.workers)
+        else:
+            chunks = read_csv_chunks(source, args.chunk_size)
+            # Close the reader before its file if scoring fails
+            stack.callback(chunks.close)
+            results = (score_rows(chunk, offset, output_options, *state)
+                       for offset, chunk in _with_offsets(chunks, len))
+        
+        for payload, chunk_metrics, n_chunk_rows in results:
+            writer.write(payload)
+            for target in targets:
+                metrics[target].merge(chunk_metrics[target])
+            n_rows += n_chunk_rows
+            elapsed = time.perf_counter() - start_time
+            print(f"  {n_rows} rows scored ({min(source.tell() / max(total_bytes, 1), 1):.0%} of input, "
+                  f"{n_rows / max(elapsed, 1e-9):,.0f} rows/s)", end='\r')
+    _SCORING_STATE = None
+    print()
+    
+    for target in targets:
+        mse, rmse, r2 = metrics[target].result()
+        if mse is not None:
+            print(f"\nEvaluation metrics for {target}:")
+            print(f"  MSE: {mse:.4f}")
+            print(f"  RMSE: {rmse:.4f}")
+            print(f"  R2: {r2:.4f}")
+    return n_rows
+
 def main():
     """Main function to execute the prediction process."""
     args = parse_arguments()
@@ -83,6 +451,33 @@ def main():
         print("Please ensure you have trained models in the specified directory")
         return
     
+    args.output_format = args.output_format or infer_output_format(args.output_path)
+    if args.output_format == 'parquet' and not parquet_available():
+        print("Error: Parquet output requires pyarrow (pip install pyarrow)")
+        return
+    
+    # Stream the input through the chunked preprocessing pipeline
+    if args.workers > 1 and not args.chunk_size:
+        args.chunk_size = 10000
+    if args.chunk_size:
+        if not os.path.exists(args.input_path):
+            print(f"Error: File {args.input_path} not found")
+            return
+        os.makedirs(os.path.dirname(args.output_path), exist_ok=True)
+        if args.id_column and args.id_column not in pd.read_csv(args.input_path, nrows=0).columns:
+            print(f"Error: ID column '{args.id_column}' not found in {args.input_path}")
+            return
+        targets = ['offerPrice', 'closeDay1'] if args.target == 'both' else [args.target]
+        n_rows = predict_chunked(args, targets)
+        if n_rows is None:
+            print("\nNo predictions were generated. Check the errors above.")
+            return
+        print(f"Saved predictions for {n_rows} rows to {args.output_path}")
+        print("\nSample of predictions:")
+        print(read_sample(args.output_path, args.output_format))
+        print("\nPrediction completed successfully!")
+        return
+    
     # Load data
     print(f"Loading data from {args.input_path}")
     try:
@@ -90,6 +485,11 @@ def main():
     except FileNotFoundError:
         print(f"Error: File {args.input_path} not found")
         return
+    if args.id_column and args.id_column not in data.columns:
+        print(f"Error: ID column '{args.id_column}' not found in {args.input_path}")
+        return
+    # Raw id column kept aside for the output, before preprocessing changes the data
+    row_ids = data[[args.id_column] if args.id_column else []].copy()
     
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(args.output_path), exist_ok=True)
@@ -102,25 +502,29 @@ def main():
                       'roa', 'leverage', 'vc', 'pe', 'prominence', 'nVCs', 'nExecutives',
                       'priorFinancing', 'reputationLeadMax', 'reputationAvg', 'nPatents',
                       'ipoSize', 'ipoSize_normalized']
-
+    
     # Add encoded columns if present in the data
     encoded_columns = [col for col in data.columns if col.startswith('exchange_encoded') or col.startswith('industry_')]
     all_features = potential_features + encoded_columns
-
-    # Add any missing columns with default value (NaN)
+    
+    # Add any missing columns with default value (NaN), except the source of a derived
+    # column the input already has: clean_data would recompute ipoSize_normalized from
+    # a NaN ipoSize and overwrite the supplied values (the chunked path leaves it as is)
+    derived_columns = {'ipoSize': 'ipoSize_normalized'}
     for col in all_features:
-        if col not in data.columns:
+        if col not in data.columns and derived_columns.get(col) not in data.columns:
             data[col] = np.nan
-
+    
     # Use all features that are now present
     numeric_features = [col for col in all_features if col in data.columns]
-
+    
     print(f"Using {len(numeric_features)} numeric features: {numeric_features}")
     
     # Preprocess data
     print("Preprocessing data...")
     data = clean_data(data)
-    data = encode_categorical_features(data)
+    encoder = load_categorical_encoder(os.path.join(args.model_path, 'categorical_encoder.joblib'), load_artifact_path)
+    data = encode_categorical_features(data, encoder)
     
     # Define targets
     targets = []
@@ -129,78 +533,75 @@ def main():
     if args.target in ['closeDay1', 'both']:
         targets.append('closeDay1')
     
-    for target_idx, target in enumerate(targets):
+    # The joint model predicts every target in one pass
+    if args.multi_output:
+        if not predict_with_multi_output_model(args, data, numeric_features):
+            return
+        targets = ['offerPrice', 'closeDay1']
+    
+    for target_idx, target in enumerate([] if args.multi_output else targets):
         print(f"\nMaking predictions for target: {target}")
         
-        # Prepare features
-        try:
-            # Create feature matrix
-            X = pd.DataFrame()
-            for col in numeric_features:
-                if col in data.columns:
-                    X[col] = data[col].copy()
-            
-            # Add predicted offer price for closeDay1 prediction
-            if target == 'closeDay1' and 'predicted_offerPrice' in data.columns:
-                X['predicted_offerPrice'] = data['predicted_offerPrice']
-                
-            print(f"Feature matrix X shape: {X.shape}")
-        except Exception as e:
-            print(f"Error creating feature matrix: {e}")
-            continue
-        
-        # Apply feature engineering if requested
-        if args.apply_feature_engineering:
-            print("Applying feature engineering...")
-            try:
-                X = apply_feature_engineering(X)
-                print(f"After feature engineering, X has shape {X.shape}")
-            except Exception as e:
-                print(f"Error during feature engineering: {e}")
-                print("Continuing without feature engineering")
-        
         # Load preprocessors
         try:
-            imputer_path = os.path.join(args.model_path, f'imputer_{target}.joblib')
-            scaler_path = os.path.join(args.model_path, f'scaler_{target}.joblib')
+            imputer_name = f'imputer_{target}.joblib'
+            scaler_name = f'scaler_{target}.joblib'
             
-            if not os.path.exists(imputer_path):
-                print(f"Error: Imputer file not found at {imputer_path}")
+            if not artifact_exists(args.model_path, imputer_name):
+                print(f"Error: Imputer {imputer_name} not found in {args.model_path}")
                 print("Please ensure you have trained the models first")
                 continue
-                
-            if not os.path.exists(scaler_path):
-                print(f"Error: Scaler file not found at {scaler_path}")
+            
+            if not artifact_exists(args.model_path, scaler_name):
+                print(f"Error: Scaler {scaler_name} not found in {args.model_path}")
                 print("Please ensure you have trained the models first")
                 continue
-                
-            imputer = load(imputer_path)
-            scaler = load(scaler_path)
-
-            # Subset X to only the columns the imputer was trained on
-            if hasattr(imputer, 'feature_names_in_'):
-                expected_features = list(imputer.feature_names_in_)
-                missing_features = [col for col in expected_features if col not in X.columns]
-                extra_features = [col for col in X.columns if col not in expected_features]
-                if missing_features:
-                    print(f"Warning: Missing features in test set: {missing_features}. Filling with NaN.")
-                    for col in missing_features:
-                        X[col] = np.nan
-                if extra_features:
-                    print(f"Note: Extra features in test set not used by model: {extra_features}. They will be ignored.")
-                X = X[expected_features]
+            
+            imputer = load_artifact(args.model_path, imputer_name)
+            scaler = load_artifact(args.model_path, scaler_name)
+            
+            # One-hot or target encoder for the nominal columns, if trained with one
+            category_encoder_name = f'category_encoder_{target}.joblib'
+            category_encoder = (load_artifact(args.model_path, category_encoder_name)
+                                if artifact_exists(args.model_path, category_encoder_name) else None)
+            missing_indicators_name = f'missing_indicators_{target}.joblib'
+            missing_indicators = (load_artifact(args.model_path, missing_indicators_name)
+                                  if artifact_exists(args.model_path, missing_indicators_name) else None)
         except Exception as e:
             print(f"Error loading preprocessors: {e}")
             print(f"Make sure the model files exist in {args.model_path}")
             continue
         
+        # Build the feature matrix with the feature definitions saved at training time
+        try:
+            if hasattr(imputer, 'feature_names_in_'):
+                expected_features = list(imputer.feature_names_in_)
+            else:
+                with_offer_predictions = target == 'closeDay1' and 'predicted_offerPrice' in data.columns
+                expected_features = build_feature_set(numeric_features, args.apply_feature_engineering,
+                                                      with_offer_predictions).output_columns_
+            feature_set = load_feature_set(os.path.join(args.model_path, f'feature_set_{target}.joblib'),
+                                           expected_features, load_artifact_path)
+            missing_features = [col for col, expression in feature_set.features
+                                if expression is None and col not in data.columns]
+            if missing_features:
+                print(f"Warning: Missing features in test set: {missing_features}. Filling with NaN.")
+            X = feature_set.transform_frame(data)
+            print(f"Feature matrix X shape: {X.shape}")
+        except Exception as e:
+            print(f"Error creating feature matrix: {e}")
+            continue
+        
         # Apply preprocessing
+        if isinstance(category_encoder, TargetEncoder):
+            X = category_encoder.transform(X)
+        indicators = missing_indicators.transform(X) if missing_indicators is not None else None
         X_imputed, _ = impute_numeric_features(X, imputer)
         
         # Apply feature selection if requested
         if args.select_features:
             try:
-                feature_selector = load(os.path.join(args.model_path, f'feature_selector_{target}.joblib'))
+                feature_selector = load_artifact(args.model_path, f'feature_selector_{target}.joblib')
                 X_selected = feature_selector.transform(X_imputed)
                 print(f"After feature selection, X has shape {X_selected.shape}")
             except FileNotFoundError:
@@ -243,22 +644,29 @@ def main():
                 print("Unable to make predictions for this target.")
                 continue
         
+        if indicators is not None:
+            X_scaled = missing_indicators.append_to(X_scaled, indicators)
+            print(f"After adding missing-value indicators, X has shape {X_scaled.shape}")
+        if isinstance(category_encoder, SparseOneHotEncoder):
+            X_scaled = category_encoder.append_to(X_scaled, data)
+            print(f"After one-hot encoding, X has shape {X_scaled.shape}")
+        
         # Load model and make predictions
         try:
             if args.model_type == 'all':
                 # When using all models, average the predictions
                 models = load_model(args.model_path, args.model_type, target)
                 
-                predictions = np.zeros(len(X_scaled))
+                predictions = np.zeros(X_scaled.shape[0])
                 for model_name, model in models.items():
-                    model_predictions = model.predict(X_scaled)
+                    model_predictions = predict_with_model(model, X_scaled)
                     predictions += model_predictions
                     print(f"  {model_name} predictions: mean={model_predictions.mean():.4f}, std={model_predictions.std():.4f}")
                 predictions /= len(models)
             else:
                 # Otherwise use the specified model
                 model = load_model(args.model_path, args.model_type, target)
-                predictions = model.predict(X_scaled)
+                predictions = predict_with_model(model, X_scaled)
             
             # Add predictions to the dataset
             data[f'predicted_{target}'] = predictions
@@ -281,9 +689,11 @@ def main():
     print(f"Saving predictions to {args.output_path}")
     prediction_cols = [f'predicted_{target}' for target in targets if f'predicted_{target}' in data.columns]
     if prediction_cols:
-        data[prediction_cols].to_csv(args.output_path, index=False)
+        frame = output_frame(row_ids, {col: data[col].to_numpy() for col in prediction_cols}, 0,
+                             args.id_column, args.row_number)
+        write_predictions(args.output_path, frame, args.output_format)
     else:
-        data.to_csv(args.output_path, index=False)
+        write_predictions(args.output_path, data, args.output_format)
     
     # Display a sample of predictions
     prediction_cols = [f'predicted_{target}' for target in targets if f'predicted_{target}' in data.columns]
@@ -0,0 +1,193 @@
+import gzip
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for --output-format parquet
+    pa = None
+    pq = None
+
+# Output formats and the file extension used when an output name is derived
+OUTPUT_EXTENSIONS = {'csv': '.csv', 'ndjson': '.ndjson', 'parquet': '.parquet'}
+
+# Name of the input row position column added by --row-number
+ROW_NUMBER_COLUMN = 'row_number'
+
+def infer_output_format(path):
+    """Output format implied by a file name (csv unless it ends in .parquet, .ndjson or .jsonl, optionally .gz)."""
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith(('.parquet', '.pq')):
+        return 'parquet'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+def parquet_available():
+    """Whether pyarrow is installed for Parquet output."""
+    return pq is not None
+
+def output_frame(chunk, predictions, offset, id_column=None, row_number=False):
+    """
+    Assemble the output rows of a chunk
+    
+    Parameters:
+    -----------
+    chunk : pandas.DataFrame
+        Raw input rows of the chunk
+    predictions : dict
+        'predicted_{target}' arrays
+    offset : int
+        Position of the chunk's first row in the input
+    id_column : str, optional
+        Input column copied to the output as the first column (e.g. an IPO identifier)
+    row_number : bool, default=False
+        Add the 0-based input row position as ROW_NUMBER_COLUMN
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        Row ids (if requested) followed by the prediction columns
+    
+    Raises:
+    -------
+    ValueError
+        If id_column is not in the input
+    """
+    columns = {}
+    if id_column is not None:
+        if id_column not in chunk.columns:
+            raise ValueError(f"ID column '{id_column}' not found in the input")
+        columns[id_column] = chunk[id_column].to_numpy()
+    if row_number:
+        columns[ROW_NUMBER_COLUMN] = np.arange(offset, offset + len(chunk), dtype=np.int64)
+    columns.update(predictions)
+    return pd.DataFrame(columns)
+
+def _open_text(path):
+    """Open a text output file, gzip-compressed if the name ends in .gz."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', newline='', compresslevel=1)
+    return open(path, 'w', newline='')
+
+class CsvWriter:
+    """CSV output with a header line."""
+    def __init__(self, path):
+        self.file = _open_text(path)
+        self.header = True
+    
+    @staticmethod
+    def encode(frame):
+        """Format a chunk as CSV lines (may run in a worker process)."""
+        return frame.columns.tolist(), frame.to_csv(header=False, index=False)
+    
+    def write(self, payload):
+        columns, text = payload
+        if self.header:
+            self.file.write(','.join(columns) + '\n')
+            self.header = False
+        self.file.write(text)
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
+class NdjsonWriter:
+    """Newline-delimited JSON output, one object per row (missing values as null)."""
+    def __init__(self, path):
+        self.file = _open_text(path)
+    
+    @staticmethod
+    def encode(frame):
+        """Format a chunk as JSON lines (may run in a worker process)."""
+        if frame.empty:
+            return ''
+        text = frame.to_json(orient='records', lines=True, double_precision=15)
+        return text if text.endswith('\n') else text + '\n'
+    
+    def write(self, payload):
+        self.file.write(payload)
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
+class ParquetWriter:
+    """
+    Parquet output, one zstd-compressed row group per chunk
+    
+    Float predictions are stored exactly. The schema is taken from the first
+    chunk; later chunks are cast to it.
+    """
+    def __init__(self, path):
+        if pq is None:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.path = path
+        self.writer = None
+    
+    @staticmethod
+    def encode(frame):
+        """Convert a chunk to an Arrow table (may run in a worker process)."""
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    
+    def write(self, table):
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema, compression='zstd')
+        elif not table.schema.equals(self.writer.schema):
+            table = table.cast(self.writer.schema)
+        self.writer.write_table(table)
+    
+    def close(self):
+        if self.writer is None:
+            # No rows: still leave a valid (empty) file
+            pq.write_table(pa.table({}), self.path)
+        else:
+            self.writer.close()
+
+WRITERS = {'csv': CsvWriter, 'ndjson': NdjsonWriter, 'parquet': ParquetWriter}
+
+def open_writer(path, output_format):
+    """
+    Open a streaming writer for predictions
+    
+    Chunks are converted with the writer class's encode (which may run in a
+    worker process) and appended in order with write(); close() finishes the file.
+    
+    Parameters:
+    -----------
+    path : str
+        Output file
+    output_format : str
+        'csv', 'ndjson' or 'parquet'
+    
+    Returns:
+    --------
+    CsvWriter, NdjsonWriter or ParquetWriter
+        Open writer
+    
+    Raises:
+    -------
+    ImportError
+        If the format needs an optional package that is not installed
+    """
+    return WRITERS[output_format](path)
+
+def write_predictions(path, frame, output_format):
+    """Write all output rows at once with the writer of a format."""
+    writer = open_writer(path, output_format)
+    try:
+        writer.write(WRITERS[output_format].encode(frame))
+    finally:
+        writer.close()
+
+def read_sample(path, output_format, n_rows=5):
+    """Read the first rows of a predictions file."""
+    if output_format == 'parquet':
+        parquet = pq.ParquetFile(path)
+        if parquet.num_row_groups == 0:
+            return pd.DataFrame()
+        return parquet.read_row_group(0).to_pandas().head(n_rows)
+    if output_format == 'ndjson':
+        return pd.read_json(path, lines=True, nrows=n_rows)
+    return pd.read_csv(path, nrows=n_rows)
@@ -4,24 +4,61 @@ import os
 import argparse
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from scipy import sparse
+from sklearn.model_selection import train_test_split, KFold
+from sklearn.base import clone
 from sklearn.preprocessing import StandardScaler, RobustScaler
 from sklearn.metrics import mean_squared_error, r2_score
 import math
-from joblib import dump
+import copy
+import json
+import time
+import shutil
+import hashlib
 import sys
 
 # Add parent directory to path to enable relative imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from preprocessing.clean_data import clean_data
-from preprocessing.encode_categorical import encode_categorical_features
-from preprocessing.impute_missing import impute_numeric_features
-from preprocessing.feature_engineering import apply_feature_engineering, select_features
-from models.xgboost_model import train_xgboost_model, save_xgboost_model
-from models.random_forest_model import train_random_forest_model, save_random_forest_model
-from models.gradient_boost_model import train_gradient_boost_model, save_gradient_boost_model
-from models.ensemble_model import train_ensemble_model, save_ensemble_model
+from preprocessing.clean_data import clean_data, Winsorizer
+from preprocessing.encode_categorical import (encode_categorical_features, CategoricalEncoder, load_categorical_encoder,
+                                              SparseOneHotEncoder, TargetEncoder, NOMINAL_COLUMNS)
+from preprocessing.impute_missing import impute_numeric_features, update_imputer, MissingIndicators
+from preprocessing.feature_engineering import select_features
+from preprocessing.feature_expressions import build_feature_set, feature_set_from_columns, RATIO_FEATURES
+from preprocessing.float32_pipeline import Float32Imputer, Float32Scaler, measure_resources
+from preprocessing.impute_missing import fit_streaming_imputer
+from preprocessing.chunked_pipeline import (ChunkedPipeline, read_csv_chunks, read_csv_column, clean_chunks,
+                                            encode_chunks, build_feature_chunks, transform_chunk, iter_row_blocks)
+from models.xgboost_model import create_xgboost_model, train_xgboost_model, update_xgboost_model
+from models.random_forest_model import create_random_forest_model, train_random_forest_model, update_random_forest_model
+from models.gradient_boost_model import create_gradient_boost_model, train_gradient_boost_model, update_gradient_boost_model
+from models.multi_output_model import MULTI_OUTPUT_TARGETS, train_multi_output_model, predict_multi_output
+from models.ensemble_model import create_ensemble_model, train_ensemble_model, update_ensemble_model, refit_meta_learner
+from models.ensemble_pruning import prune_ensemble_model, format_pruning_report
+from models.artifact_store import (save_artifact, load_artifact, load_artifact_path, artifact_exists, remove_artifact,
+                                   collect_garbage, artifact_size)
+from scripts.experiment_store import ExperimentStore, ExperimentRun, measure_latency, file_sha256
+from scripts.checkpoint import TrainingCheckpoint
+
+MODEL_TYPES = ['xgboost', 'random_forest', 'gradient_boost', 'ensemble']
+
+# Numeric/encoded input columns used as features when present in the data
+FEATURE_COLUMNS = ['egc', 'highTech', 'age', 'year', 'exchange', 'industryFF12', 'nUnderwriters',
+                   'sharesOfferedPerc', 'investmentReceived', 'amountOnProspectus',
+                   'commonEquity', 'sp2weeksBefore', 'blueSky', 'managementFee',
+                   'bookValue', 'totalAssets', 'totalRevenue', 'netIncome',
+                   'roa', 'leverage', 'vc', 'pe', 'prominence', 'nVCs', 'nExecutives',
+                   'priorFinancing', 'reputationLeadMax', 'reputationAvg', 'nPatents']
+
+# Number of trees/boosting rounds in the quick importance pass used for feature selection
+QUICK_PASS_ESTIMATORS = 25
+
+# Folds for the out-of-fold offerPrice predictions that closeDay1 is validated with
+OFFER_PREDICTION_FOLDS = 5
+
+# Minimum number of new labelled rows per base estimator before the meta-learner is refitted
+MIN_META_ROWS_PER_ESTIMATOR = 10
 
 def parse_arguments():
     """Parse command line arguments."""
@@ -31,20 +68,78 @@ def parse_arguments():
                         help='Path to the input CSV file')
     parser.add_argument('--output-path', type=str, default='models/trained',
                         help='Directory to save trained models')
-    parser.add_argument('--model', type=str, default='ensemble',
+    parser.add_argument('--model', type=str, default=None,
                         choices=['xgboost', 'random_forest', 'gradient_boost', 'ensemble', 'all'],
-                        help='Model type to train')
+                        help='Model type to train (default: ensemble, or xgboost with --multi-output)')
     parser.add_argument('--target', type=str, default='offerPrice',
                         choices=['offerPrice', 'closeDay1', 'both'],
                         help='Target variable to predict')
     parser.add_argument('--test-size', type=float, default=0.2,
                         help='Test set size as a fraction of the data')
+    parser.add_argument('--winsorize', action='store_true',
+                        help='Clip heavy-tailed features to quantile bounds learned on the training rows')
+    parser.add_argument('--winsorize-quantile', type=float, default=0.01,
+                        help='Clip below this quantile and above 1 minus it (default: 0.01)')
+    parser.add_argument('--imputation-strategy', type=str, default='mean', choices=['mean', 'median'],
+                        help='Statistic used to fill missing feature values')
+    parser.add_argument('--streaming-imputer', action='store_true',
+                        help='Fit the imputer from mergeable running statistics (exact mean, '
+                             'quantile sketch for the median) instead of SimpleImputer')
+    parser.add_argument('--missing-indicators', action='store_true',
+                        help='Add 0/1 missing-value indicators for the features with missing training values '
+                             'that the trees split on')
     parser.add_argument('--use-robust-scaler', action='store_true',
                         help='Use RobustScaler instead of StandardScaler')
     parser.add_argument('--select-features', action='store_true',
                         help='Use feature selection')
+    parser.add_argument('--selection-method', type=str, default='model',
+                        choices=['model', 'permutation'],
+                        help='Importances used for feature selection: a quick first pass of the model being '
+                             'trained, or cached permutation importances of that pass')
     parser.add_argument('--apply-feature-engineering', action='store_true',
                         help='Apply feature engineering')
+    parser.add_argument('--categorical-encoding', type=str, default='ordinal',
+                        choices=['ordinal', 'onehot', 'target'],
+                        help='Encoding of exchange and industryFF12: ordinal codes, a sparse one-hot block, '
+                             'or out-of-fold target encoding')
+    parser.add_argument('--target-encoding-folds', type=int, default=5,
+                        help='Folds for the out-of-fold target encoding')
+    parser.add_argument('--target-encoding-smoothing', type=float, default=10.0,
+                        help='Prior weight (in rows) of the smoothed target encoding')
+    parser.add_argument('--float32', action='store_true',
+                        help='Preprocess into a single float32 column buffer with in-place imputation '
+                             'and scaling (lower peak memory for large training sets)')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Stream the input in chunks of this many rows and write the preprocessed matrix to a '
+                             'memory-mapped file in <output-path>/chunk_cache (flat preprocessing memory)')
+    parser.add_argument('--multi-output', action='store_true',
+                        help='Train one joint model for offerPrice and closeDay1 with a shared feature '
+                             'transform (--model xgboost, random_forest or gradient_boost; default: xgboost)')
+    parser.add_argument('--params-config', type=str, default=None,
+                        help='JSON file with tuned model parameters per target (written by scripts/tune.py)')
+    parser.add_argument('--prune-ensemble', action='store_true',
+                        help='Greedily remove ensemble trees and base estimators while the held-out RMSE '
+                             'stays within --prune-tolerance')
+    parser.add_argument('--prune-tolerance', type=float, default=0.01,
+                        help='Allowed relative increase of the held-out RMSE when pruning the ensemble')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Update previously trained models with the new rows in --input-path '
+                             'instead of retraining from scratch')
+    parser.add_argument('--incremental-rounds', type=int, default=10,
+                        help='Trees/boosting rounds added to each model in incremental mode')
+    parser.add_argument('--cache-path', type=str, default=None,
+                        help='Path to the dataset cache used by incremental mode '
+                             '(default: <output-path>/training_cache.csv)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted run from the last completed (target, model) unit '
+                             'in <output-path>/checkpoint')
+    parser.add_argument('--experiment-db', type=str, default=None,
+                        help='SQLite experiment store the run is recorded in '
+                             '(default: <output-path>/experiments.db, compare runs with scripts/experiments.py)')
+    parser.add_argument('--run-name', type=str, default=None,
+                        help='Label of the run in the experiment store')
+    parser.add_argument('--no-tracking', action='store_true',
+                        help='Do not record the run in the experiment store')
     
     return parser.parse_args()
 
@@ -55,20 +150,1091 @@ def calculate_metrics(y_true, y_pred):
     r2 = r2_score(y_true, y_pred)
     return mse, rmse, r2
 
-def main():
-    """Main function to execute the training process."""
-    args = parse_arguments()
+def get_cache_path(args):
+    """Return the path of the dataset cache used for incremental training."""
+    return args.cache_path or os.path.join(args.output_path, 'training_cache.csv')
+
+def create_quick_estimator(model_type, params=None):
+    """
+    Create a reduced-budget version of a model for the feature selection importance pass
     
-    # Create output directory if it doesn't exist
-    os.makedirs(args.output_path, exist_ok=True)
+    Parameters:
+    -----------
+    model_type : str
+        'xgboost', 'random_forest' or 'gradient_boost'
+    params : dict, optional
+        Parameters for the model factory
+    
+    Returns:
+    --------
+    estimator object
+        Unfitted model with QUICK_PASS_ESTIMATORS trees
+    """
+    if model_type == 'random_forest':
+        estimator = create_random_forest_model(params).set_params(n_jobs=-1)
+    elif model_type == 'gradient_boost':
+        estimator = create_gradient_boost_model(params)
+    else:
+        estimator = create_xgboost_model(params)
+    return estimator.set_params(n_estimators=QUICK_PASS_ESTIMATORS)
+
+def load_params_config(path):
+    """
+    Load tuned model parameters written by scripts/tune.py
+    
+    Parameters:
+    -----------
+    path : str or None
+        Path to the JSON config
+    
+    Returns:
+    --------
+    dict
+        Mapping of target -> model type -> parameter dict (empty if no config)
+    """
+    if path is None:
+        return {}
+    
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        print(f"Warning: Parameter config {path} not found, using default parameters")
+        return {}
+    
+    return {target: entry.get('params', {}) for target, entry in config.items()}
+
+def create_model(model_type, params=None, single_threaded=False):
+    """
+    Create an unfitted model of a type in MODEL_TYPES
+    
+    Parameters:
+    -----------
+    model_type : str
+        'xgboost', 'random_forest', 'gradient_boost' or 'ensemble'
+    params : dict, optional
+        Mapping of model type -> parameters for its factory
+    single_threaded : bool, default=False
+        Restrict XGBoost to one thread (when the caller runs models in parallel processes)
+    
+    Returns:
+    --------
+    estimator object
+        Unfitted model
+    """
+    params = params or {}
+    if model_type == 'ensemble':
+        model = create_ensemble_model(params.get('xgboost'), params.get('random_forest'), params.get('gradient_boost'))
+        if single_threaded:
+            model.set_params(xgb__n_jobs=1)
+        return model
+    
+    factories = {
+        'xgboost': create_xgboost_model,
+        'random_forest': create_random_forest_model,
+        'gradient_boost': create_gradient_boost_model
+    }
+    model = factories[model_type](params.get(model_type))
+    if single_threaded and model_type == 'xgboost':
+        model.set_params(n_jobs=1)
+    return model
+
+def offer_model_types(model):
+    """
+    Model types whose average train() feeds closeDay1 as 'predicted_offerPrice'
+    
+    The average covers the base models trained for a --model choice. A stacking
+    ensemble is never part of it, only the base models it is built from.
+    """
+    if model in ['ensemble', 'all']:
+        return ['xgboost', 'random_forest', 'gradient_boost']
+    return [model]
+
+def out_of_fold_offer_predictions(X, y_offer, fit_rows, train_rows, test_rows, models, seed=42):
+    """
+    Predicted offer prices for validating a closeDay1 model outside train()
+    
+    train() feeds closeDay1 the average prediction of the offerPrice models as
+    'predicted_offerPrice'. Validation folds (backtest.py, tune.py) rebuild that
+    feature without their validation rows: the offerPrice models are fitted on
+    fit_rows only, and the closeDay1 training rows get out-of-fold predictions
+    from OFFER_PREDICTION_FOLDS folds of fit_rows.
+    
+    Parameters:
+    -----------
+    X : pandas.DataFrame
+        Features of all rows, without 'predicted_offerPrice'
+    y_offer : numpy.ndarray
+        Offer price of all rows (NaN where unknown)
+    fit_rows : numpy.ndarray
+        Rows the offerPrice models may be fitted on (must exclude test_rows)
+    train_rows : numpy.ndarray
+        Training rows of the closeDay1 fold
+    test_rows : numpy.ndarray
+        Validation rows of the closeDay1 fold
+    models : list
+        Unfitted offerPrice models whose predictions are averaged
+    seed : int, default=42
+        Random seed of the fold assignment
+    
+    Returns:
+    --------
+    tuple
+        (predictions for train_rows, predictions for test_rows)
+    """
+    fit_rows = fit_rows[~np.isnan(y_offer[fit_rows])]
+    
+    def fit_predict(fit, predict):
+        X_fit, imputer = impute_numeric_features(X.iloc[fit])
+        X_predict, _ = impute_numeric_features(X.iloc[predict], imputer)
+        scaler = StandardScaler()
+        X_fit = scaler.fit_transform(X_fit)
+        X_predict = scaler.transform(X_predict)
+        return np.mean([clone(model).fit(X_fit, y_offer[fit]).predict(X_predict) for model in models], axis=0)
+    
+    # Models fitted on all of fit_rows predict the test rows and the training rows they were not fitted on
+    predictions = fit_predict(fit_rows, np.concatenate([test_rows, train_rows]))
+    test_predictions = predictions[:len(test_rows)]
+    train_predictions = predictions[len(test_rows):]
+    
+    splitter = KFold(n_splits=min(OFFER_PREDICTION_FOLDS, len(fit_rows)), shuffle=True, random_state=seed)
+    for keep, held in splitter.split(fit_rows):
+        held_mask = np.isin(train_rows, fit_rows[held])
+        if held_mask.any():
+            train_predictions[held_mask] = fit_predict(fit_rows[keep], train_rows[held_mask])
+    return train_predictions, test_predictions
+
+def with_offer_price_feature(X, offer_predictions):
+    """Add 'predicted_offerPrice' to a feature frame at the position build_feature_set gives it."""
+    ratio_columns = {name for name, _ in RATIO_FEATURES}
+    position = next((idx for idx, col in enumerate(X.columns) if col in ratio_columns), X.shape[1])
+    X = X.copy()
+    X.insert(position, 'predicted_offerPrice', offer_predictions)
+    return X
+
+def build_feature_matrix(data, columns, offer_predictions=None):
+    """
+    Build a feature matrix with exactly the given columns from preprocessed data
+    
+    Parameters:
+    -----------
+    data : pandas.DataFrame
+        Cleaned and encoded data
+    columns : list
+        Feature columns expected by the fitted preprocessors, in order. Engineered
+        features are computed from their registered expressions
+    offer_predictions : numpy.ndarray, optional
+        Predicted offer prices to add as the 'predicted_offerPrice' feature
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        Feature matrix aligned to columns
+    """
+    extra = {'predicted_offerPrice': offer_predictions} if offer_predictions is not None else None
+    return feature_set_from_columns(columns).transform_frame(data, extra)
+
+def load_target_models(output_path, target):
+    """
+    Load all previously trained models for a target
+    
+    Returns:
+    --------
+    tuple
+        (models: dict of model type -> model, bundled: list of model types stored in
+        '{target}_models.joblib', standalone: list of model types stored in their own file)
+    """
+    models = {}
+    bundled = []
+    if artifact_exists(output_path, f'{target}_models.joblib'):
+        models.update(load_artifact(output_path, f'{target}_models.joblib', shared=False))
+        bundled = list(models.keys())
+    
+    standalone = []
+    for model_type in MODEL_TYPES:
+        model_file = f'{model_type}_{target}.joblib'
+        if artifact_exists(output_path, model_file):
+            standalone.append(model_type)
+            if model_type not in models:
+                models[model_type] = load_artifact(output_path, model_file, shared=False)
+    
+    return models, bundled, standalone
+
+def predict_average(models, X):
+    """Average the predictions of the base models (ensembles are excluded when base models exist)."""
+    base_models = [model for name, model in models.items() if name != 'ensemble'] or list(models.values())
+    predictions = np.zeros(len(X))
+    for model in base_models:
+        predictions += model.predict(X)
+    return predictions / len(base_models)
+
+def build_drift_report(target, models_before, models_after, X_before, X_after, y_new,
+                       X_new_selected, feature_names, running_scaler):
+    """
+    Compare the previous and updated models on the newly arrived rows
+    
+    Parameters:
+    -----------
+    target : str
+        Target variable
+    models_before, models_after : dict
+        Models before and after the incremental update
+    X_before, X_after : numpy.ndarray
+        New rows transformed with the previous and updated preprocessors
+    y_new : pandas.Series
+        Target values of the new rows
+    X_new_selected : pandas.DataFrame or numpy.ndarray
+        Imputed new rows after feature selection (the columns of running_scaler),
+        used for the feature drift statistics
+    feature_names : list
+        Names of the columns of X_new_selected
+    running_scaler : sklearn.preprocessing.StandardScaler or None
+        Scaler holding the running statistics before this batch
+    
+    Returns:
+    --------
+    dict
+        Drift report
+    """
+    # The updated models have been trained on the new rows, so their scores are in-sample
+    report = {
+        'target': target,
+        'new_rows': int(len(y_new)),
+        'evaluated_on': 'new rows (out-of-sample before the update, in-sample after)',
+        'models': {},
+        'feature_drift': {}
+    }
+    
+    for name in models_after:
+        before = models_before[name].predict(X_before)
+        after = models_after[name].predict(X_after)
+        _, rmse_before, r2_before = calculate_metrics(y_new, before)
+        _, rmse_after, r2_after = calculate_metrics(y_new, after)
+        report['models'][name] = {
+            'rmse_before': rmse_before,
+            'rmse_after': rmse_after,
+            'r2_before': r2_before,
+            'r2_after': r2_after,
+            'mean_abs_prediction_shift': float(np.mean(np.abs(after - before)))
+        }
+    
+    if running_scaler is not None and hasattr(running_scaler, 'mean_'):
+        new_means = np.nanmean(np.asarray(X_new_selected, dtype=float), axis=0)
+        shift = (new_means - running_scaler.mean_) / running_scaler.scale_
+        order = np.argsort(-np.abs(shift))[:10]
+        report['feature_drift'] = {str(feature_names[i]): float(shift[i]) for i in order}
+    
+    return report
+
+def start_experiment_run(args):
+    """Register the run in the experiment store (a run that records nothing with --no-tracking)."""
+    if args.no_tracking:
+        return ExperimentRun()
+    db_path = args.experiment_db or os.path.join(args.output_path, 'experiments.db')
+    params = dict(vars(args))
+    if args.params_config:
+        params['tuned_params'] = load_params_config(args.params_config)
+    mode = 'incremental' if args.incremental else 'multi_output' if args.multi_output else 'train'
+    run = ExperimentStore(db_path).start_run(params, args.input_path, args.run_name, mode)
+    print(f"Recording run {run.run_id} in {db_path}")
+    return run
+
+def checkpoint_settings(args):
+    """Digest of everything that determines a training run's results, used to match checkpoints."""
+    settings = {key: value for key, value in vars(args).items()
+                if key not in ('resume', 'run_name', 'experiment_db', 'no_tracking')}
+    settings['input_hash'] = file_sha256(args.input_path)
+    settings['tuned_params'] = load_params_config(args.params_config)
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+def record_model_benchmarks(run, output_path, target, models, X_test):
+    """Record the on-disk size and the batch and single-row prediction latency of the saved models."""
+    if run.store is None:
+        return
+    for model_type, model in models.items():
+        run.log_metrics(target, model_type, model_bytes=artifact_size(output_path, f'{model_type}_{target}.joblib'),
+                        **measure_latency(model, X_test))
+
+def remove_stale_blocks(output_path):
+    """Delete the artifact store blocks that no saved artifact refers to any more."""
+    n_blocks, n_bytes = collect_garbage(output_path)
+    if n_blocks:
+        print(f"Removed {n_blocks} stale artifact blocks ({n_bytes / 1e6:.1f} MB)")
+
+def remove_stale_multi_output_model(args):
+    """Remove the joint model of an earlier --multi-output run, which no longer matches the retrained models."""
+    if artifact_exists(args.output_path, 'multi_output_model.joblib'):
+        print("Removing multi_output_model.joblib of an earlier --multi-output run (stale after retraining)")
+        remove_artifact(args.output_path, 'multi_output_model.joblib')
+
+def run_incremental(args, run):
+    """
+    Update previously trained models with a batch of new rows
+    
+    The new rows are appended to the dataset cache, the imputer statistics are
+    merged with a running mean, XGBoost continues from its booster, Random Forest
+    and Gradient Boosting grow extra trees with warm start, and stacking ensembles
+    only refit their meta-learner on the new rows. The scaler used by the existing
+    trees is kept fixed (rescaling would shift their learned split thresholds);
+    its running mean/variance is tracked separately for the drift report.
+    
+    Returns:
+    --------
+    bool
+        True if the update ran
+    """
+    start_time = time.time()
+    run.start_stage('load_data')
+    cache_path = get_cache_path(args)
+    if not os.path.exists(cache_path):
+        print(f"Error: Dataset cache {cache_path} not found. Run a full training first.")
+        return False
+    
+    print(f"Loading new rows from {args.input_path}")
+    try:
+        new_raw = pd.read_csv(args.input_path)
+    except FileNotFoundError:
+        print(f"Error: File {args.input_path} not found")
+        return False
+    
+    cached_raw = pd.read_csv(cache_path)
+    combined_raw = pd.concat([cached_raw, new_raw], ignore_index=True)
+    print(f"Cache has {len(cached_raw)} rows, {len(new_raw)} new rows")
+    
+    encoder = load_categorical_encoder(os.path.join(args.output_path, 'categorical_encoder.joblib'), load_artifact_path)
+    new_data = encode_categorical_features(clean_data(new_raw), encoder)
+    all_data = encode_categorical_features(clean_data(combined_raw), encoder)
+    
+    targets = []
+    if args.target in ['offerPrice', 'both']:
+        targets.append('offerPrice')
+    if args.target in ['closeDay1', 'both']:
+        targets.append('closeDay1')
+    
+    # Offer price predictions (new rows, all rows) feeding the closeDay1 models
+    offer_predictions = None
+    
+    for target in targets:
+        print(f"\nUpdating models for target: {target}")
+        run.start_stage(f'update_{target}')
+        
+        imputer_name = f'imputer_{target}.joblib'
+        scaler_name = f'scaler_{target}.joblib'
+        if not artifact_exists(args.output_path, imputer_name) or not artifact_exists(args.output_path, scaler_name):
+            print(f"Error: Preprocessors for {target} not found in {args.output_path}")
+            continue
+        if artifact_exists(args.output_path, f'category_encoder_{target}.joblib'):
+            print(f"Error: Models for {target} use one-hot or target encoding, which incremental mode "
+                  f"does not support. Run a full training instead.")
+            continue
+        if artifact_exists(args.output_path, f'missing_indicators_{target}.joblib'):
+            print(f"Error: Models for {target} use missing-value indicators, which incremental mode "
+                  f"does not support. Run a full training instead.")
+            continue
+        
+        imputer = load_artifact(args.output_path, imputer_name, shared=False)
+        scaler = load_artifact(args.output_path, scaler_name, shared=False)
+        models, bundled, standalone = load_target_models(args.output_path, target)
+        if not models:
+            print(f"Error: No trained models for {target} found in {args.output_path}")
+            continue
+        
+        selector_name = f'feature_selector_{target}.joblib'
+        feature_selector = (load_artifact(args.output_path, selector_name)
+                            if artifact_exists(args.output_path, selector_name) else None)
+        
+        columns = list(imputer.feature_names_in_)
+        if 'predicted_offerPrice' in columns:
+            if offer_predictions is None:
+                offer_models, _, _ = load_target_models(args.output_path, 'offerPrice')
+                offer_imputer = load_artifact(args.output_path, 'imputer_offerPrice.joblib')
+                offer_scaler = load_artifact(args.output_path, 'scaler_offerPrice.joblib')
+                offer_selector = (load_artifact(args.output_path, 'feature_selector_offerPrice.joblib')
+                                  if artifact_exists(args.output_path, 'feature_selector_offerPrice.joblib') else None)
+                offer_predictions = []
+                for frame in [new_data, all_data]:
+                    X_offer = build_feature_matrix(frame, list(offer_imputer.feature_names_in_))
+                    X_offer, _ = impute_numeric_features(X_offer, offer_imputer)
+                    if offer_selector is not None:
+                        X_offer = offer_selector.transform(X_offer)
+                    offer_predictions.append(predict_average(offer_models, offer_scaler.transform(X_offer)))
+            new_offer, all_offer = offer_predictions
+        else:
+            new_offer, all_offer = None, None
+        
+        X_new = build_feature_matrix(new_data, columns, new_offer)
+        X_all = build_feature_matrix(all_data, columns, all_offer)
+        new_mask = ~new_data[target].isna() if target in new_data.columns else pd.Series(False, index=new_data.index)
+        all_mask = ~all_data[target].isna()
+        y_new = new_data.loc[new_mask, target]
+        y_all = all_data.loc[all_mask, target]
+        X_new = X_new[new_mask]
+        X_all = X_all[all_mask]
+        print(f"New labelled rows: {len(y_new)}, total labelled rows: {len(y_all)}")
+        
+        if len(y_new) == 0:
+            print(f"No new labelled rows for {target}, skipping")
+            continue
+        
+        def transform(X, fitted_imputer):
+            X_imputed, _ = impute_numeric_features(X, fitted_imputer)
+            X_selected = feature_selector.transform(X_imputed) if feature_selector is not None else X_imputed
+            return X_imputed, scaler.transform(X_selected)
+        
+        # Previous state, kept for the drift report
+        models_before = copy.deepcopy(models)
+        X_new_imputed, X_new_before = transform(X_new, imputer)
+        
+        running_scaler_name = f'scaler_running_{target}.joblib'
+        if artifact_exists(args.output_path, running_scaler_name):
+            running_scaler = load_artifact(args.output_path, running_scaler_name, shared=False)
+        else:
+            running_scaler = copy.deepcopy(scaler)
+        running_scaler_before = copy.deepcopy(running_scaler)
+        
+        # Update the imputer and running scaler statistics with the new rows
+        print("Updating imputer statistics...")
+        try:
+            imputer = update_imputer(imputer, X_new)
+        except ValueError as e:
+            print(f"Warning: {e}. Keeping previous imputer statistics.")
+        
+        X_new_imputed, X_new_scaled = transform(X_new, imputer)
+        _, X_all_scaled = transform(X_all, imputer)
+        
+        # The running scaler, like the model scaler, sees the selected columns only
+        X_running = feature_selector.transform(X_new_imputed) if feature_selector is not None else X_new_imputed
+        running_columns = list(X_new_imputed.columns)
+        if feature_selector is not None:
+            running_columns = [col for col, keep in zip(running_columns, feature_selector.get_support()) if keep]
+        if hasattr(running_scaler, 'partial_fit'):
+            running_scaler.partial_fit(X_running)
+        else:
+            print(f"Note: {type(running_scaler).__name__} has no streaming statistics, skipping running update")
+        
+        # The meta-learner is refitted on the new rows before the base models see them
+        if 'ensemble' in models:
+            n_base = len(models['ensemble'].estimators_)
+            if len(y_new) >= MIN_META_ROWS_PER_ESTIMATOR * n_base:
+                print("Refitting ensemble meta-learner...")
+                refit_meta_learner(models['ensemble'], X_new_scaled, y_new)
+            else:
+                print(f"Only {len(y_new)} new rows, keeping the previous ensemble meta-learner")
+        
+        updaters = {
+            'xgboost': update_xgboost_model,
+            'random_forest': update_random_forest_model,
+            'gradient_boost': update_gradient_boost_model,
+            'ensemble': update_ensemble_model
+        }
+        for model_type, model in models.items():
+            print(f"Adding {args.incremental_rounds} rounds to {model_type} model for {target}")
+            updaters[model_type](model, X_all_scaled, y_all, args.incremental_rounds)
+        
+        report = build_drift_report(target, models_before, models, X_new_before, X_new_scaled,
+                                    y_new, X_running, running_columns, running_scaler_before)
+        for name, stats in report['models'].items():
+            print(f"  {name}: RMSE on new rows {stats['rmse_before']:.4f} -> {stats['rmse_after']:.4f}, "
+                  f"mean prediction shift {stats['mean_abs_prediction_shift']:.4f}")
+            run.log_metrics(target, name, new_rows_rmse_before=stats['rmse_before'],
+                            new_rows_rmse_after=stats['rmse_after'])
+        with open(os.path.join(args.output_path, f'drift_report_{target}.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        # Save updated artifacts
+        save_artifact(args.output_path, imputer_name, imputer)
+        save_artifact(args.output_path, running_scaler_name, running_scaler)
+        for model_type in standalone:
+            save_artifact(args.output_path, f'{model_type}_{target}.joblib', models[model_type])
+        if bundled:
+            save_artifact(args.output_path, f'{target}_models.joblib', {name: models[name] for name in bundled})
+        
+        if target == 'offerPrice' and 'closeDay1' in targets:
+            offer_predictions = []
+            for frame in [new_data, all_data]:
+                X_offer = build_feature_matrix(frame, columns)
+                _, X_offer_scaled = transform(X_offer, imputer)
+                offer_predictions.append(predict_average(models, X_offer_scaled))
+    
+    remove_stale_multi_output_model(args)
+    run.start_stage('save_cache')
+    combined_raw.to_csv(cache_path, index=False)
+    print(f"\nAppended {len(new_raw)} rows to {cache_path}")
+    remove_stale_blocks(args.output_path)
+    print(f"Incremental update completed in {time.time() - start_time:.1f}s")
+    return True
+
+def run_multi_output(args, data, numeric_features, run):
+    """
+    Train a single model that predicts offerPrice and closeDay1 together
+    
+    Both targets share one imputer and scaler, and the model is saved with them as
+    one artifact ('multi_output_model.joblib'). The closeDay1 output does not use
+    a predicted offer price feature, since both targets are learned jointly.
+    
+    Parameters:
+    -----------
+    args : argparse.Namespace
+        Parsed command line arguments
+    data : pandas.DataFrame
+        Cleaned and encoded data
+    numeric_features : list
+        Candidate feature columns
+    run : ExperimentRun
+        Run the stages and metrics are recorded in
+    
+    Returns:
+    --------
+    bool
+        True if the model was trained
+    """
+    if args.model not in ['xgboost', 'random_forest', 'gradient_boost']:
+        print("Error: Multi-output mode supports the xgboost, random_forest and gradient_boost models")
+        return False
+    
+    missing_targets = [target for target in MULTI_OUTPUT_TARGETS if target not in data.columns]
+    if missing_targets:
+        print(f"Error: Targets {missing_targets} not found in data")
+        return False
+    
+    print(f"\nTraining multi-output {args.model} model for {MULTI_OUTPUT_TARGETS}")
+    run.start_stage('preprocess')
+    feature_set = build_feature_set(get_input_columns(data, numeric_features), args.apply_feature_engineering)
+    X = feature_set.transform_frame(data)
+    
+    # Keep rows where both targets are known
+    mask = data[MULTI_OUTPUT_TARGETS].notna().all(axis=1)
+    X_filtered = X[mask]
+    Y_filtered = data.loc[mask, MULTI_OUTPUT_TARGETS]
+    print(f"After filtering, X has {X_filtered.shape[0]} rows and {X_filtered.shape[1]} columns")
+    
+    X_train, X_test, Y_train, Y_test = train_test_split(
+        X_filtered, Y_filtered, test_size=args.test_size, random_state=42
+    )
+    
+    if args.winsorize:
+        X_train, X_test = winsorize_training_rows(args, feature_set, X_train, X_test)
+    
+    print("Imputing missing values...")
+    X_train_imputed, imputer = impute_numeric_features(X_train, strategy=args.imputation_strategy,
+                                                       streaming=args.streaming_imputer)
+    X_test_imputed, _ = impute_numeric_features(X_test, imputer)
+    
+    print("Scaling features...")
+    scaler = RobustScaler() if args.use_robust_scaler else StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train_imputed)
+    X_test_scaled = scaler.transform(X_test_imputed)
+    
+    run.start_stage('train')
+    start_time = time.time()
+    model = train_multi_output_model(X_train_scaled, Y_train, args.model)
+    print(f"Trained in {time.time() - start_time:.1f}s")
+    
+    start_time = time.time()
+    predictions = predict_multi_output(model, X_test_scaled)
+    print(f"Predicted {len(X_test_scaled)} rows for both targets in {time.time() - start_time:.4f}s")
+    
+    for idx, target in enumerate(MULTI_OUTPUT_TARGETS):
+        mse, rmse, r2 = calculate_metrics(Y_test[target], predictions[:, idx])
+        print(f"  {target} MSE: {mse:.4f}, RMSE: {rmse:.4f}, R2: {r2:.4f}")
+        run.log_metrics(target, args.model, mse=mse, rmse=rmse, r2=r2)
+    
+    bundle = {
+        'model': model,
+        'imputer': imputer,
+        'scaler': scaler,
+        'feature_names': list(X_train.columns),
+        'feature_set': feature_set,
+        'targets': MULTI_OUTPUT_TARGETS,
+        'model_type': args.model
+    }
+    save_artifact(args.output_path, 'multi_output_model.joblib', bundle)
+    run.log_metrics('both', args.model, model_bytes=artifact_size(args.output_path, 'multi_output_model.joblib'))
+    remove_stale_blocks(args.output_path)
+    print("\nTraining completed successfully!")
+    return True
+
+def winsorize_training_rows(args, feature_set, X_train, X_test):
+    """
+    Learn clip bounds on the training rows, clip both splits and store the bounds in the feature set
+    
+    The saved feature set applies the same clip when prediction and the API build features.
+    
+    Returns:
+    --------
+    tuple
+        (X_train, X_test) clipped
+    """
+    winsorizer = Winsorizer(args.winsorize_quantile).fit(X_train)
+    feature_set.set_clip_bounds(*winsorizer.bounds_)
+    print(f"Winsorized {len(winsorizer.sketches_)} heavy-tailed features at the "
+          f"{args.winsorize_quantile:.1%}/{1 - args.winsorize_quantile:.1%} quantiles")
+    return winsorizer.transform(X_train), winsorizer.transform(X_test)
+
+def preprocess_target(args, data, feature_set, target, offer_predictions=None, model_params=None):
+    """
+    Build, split, impute, select and scale the feature matrix for one target
+    
+    Parameters:
+    -----------
+    args : argparse.Namespace
+        Parsed command line arguments
+    data : pandas.DataFrame
+        Cleaned and encoded data
+    feature_set : FeatureSet
+        Compiled feature definitions for the target
+    target : str
+        Target variable
+    offer_predictions : numpy.ndarray, optional
+        Predicted offer prices for every row, added as a feature for closeDay1
+    model_params : dict, optional
+        Tuned parameters per model type, used for the feature selection pass
+    
+    Returns:
+    --------
+    tuple or None
+        (X_train_scaled, X_test_scaled, y_train, y_test, imputer, feature_selector, scaler,
+        category_encoder, missing_indicators), or None if the target could not be prepared
+    """
+    model_params = model_params or {}
+    
+    # Prepare features and target
+    try:
+        extra = {'predicted_offerPrice': offer_predictions} if offer_predictions is not None else None
+        X = feature_set.transform_frame(data, extra)
+        print(f"Feature matrix X shape: {X.shape}")
+    except Exception as e:
+        print(f"Error creating feature matrix: {e}")
+        return None
+    
+    # Drop rows with NaN in target
+    if target in data.columns:
+        mask = ~data[target].isna()
+        X_filtered = X[mask]
+        y_filtered = data.loc[mask, target]
+    else:
+        print(f"Error: Target '{target}' not found in data")
+        return None
+    
+    print(f"After filtering, X has {X_filtered.shape[0]} rows and {X_filtered.shape[1]} columns")
+    print(f"y has {len(y_filtered)} values")
+    
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_filtered, y_filtered, test_size=args.test_size, random_state=42
+    )
+    
+    if args.winsorize:
+        X_train, X_test = winsorize_training_rows(args, feature_set, X_train, X_test)
+    
+    # Target encode the nominal columns (out of fold on the training rows)
+    category_encoder = None
+    if args.categorical_encoding == 'target':
+        print("Target encoding nominal columns...")
+        category_encoder = TargetEncoder(n_folds=args.target_encoding_folds, smoothing=args.target_encoding_smoothing)
+        X_train = category_encoder.fit_transform(X_train, y_train)
+        X_test = category_encoder.transform(X_test)
+    
+    # Record which training cells are missing before imputation fills them
+    missing_indicators = MissingIndicators().fit(X_train) if args.missing_indicators else None
+    
+    # Impute missing values
+    print("Imputing missing values...")
+    X_train_imputed, imputer = impute_numeric_features(X_train, strategy=args.imputation_strategy,
+                                                       streaming=args.streaming_imputer)
+    X_test_imputed, _ = impute_numeric_features(X_test, imputer)
+    
+    # Feature selection if requested
+    if args.select_features:
+        print("Performing feature selection...")
+        try:
+            quick_type = args.model if args.model in ['xgboost', 'random_forest', 'gradient_boost'] else 'xgboost'
+            feature_selector = select_features(
+                X_train_imputed, y_train,
+                create_quick_estimator(quick_type, model_params.get(quick_type)),
+                method=args.selection_method,
+                cache_dir=os.path.join(args.output_path, 'selection_cache')
+            )
+            X_train_selected = feature_selector.transform(X_train_imputed)
+            X_test_selected = feature_selector.transform(X_test_imputed)
+            save_artifact(args.output_path, f'feature_selector_{target}.joblib', feature_selector)
+            with open(os.path.join(args.output_path, f'feature_selection_{target}.json'), 'w') as f:
+                json.dump(feature_selector.provenance, f, indent=2)
+            print(f"After feature selection, X_train has shape {X_train_selected.shape}")
+        except Exception as e:
+            print(f"Error during feature selection: {e}")
+            print("Continuing without feature selection")
+            X_train_selected = X_train_imputed
+            X_test_selected = X_test_imputed
+            feature_selector = None
+    else:
+        X_train_selected = X_train_imputed
+        X_test_selected = X_test_imputed
+        feature_selector = None
+    
+    # Scale features
+    print("Scaling features...")
+    if args.use_robust_scaler:
+        scaler = RobustScaler()
+    else:
+        scaler = StandardScaler()
+    
+    X_train_scaled = scaler.fit_transform(X_train_selected)
+    X_test_scaled = scaler.transform(X_test_selected)
+    print(f"After scaling, X_train has shape {X_train_scaled.shape}")
+    
+    # Append indicators for the missing-value patterns the trees can use
+    if missing_indicators is not None:
+        feature_names = list(X_train.columns)
+        if feature_selector is not None:
+            feature_names = [name for name, keep in zip(feature_names, feature_selector.get_support()) if keep]
+        missing_indicators = select_missing_indicators(args, missing_indicators, X_train_scaled, y_train,
+                                                       feature_names, model_params)
+        if missing_indicators is not None:
+            X_train_scaled = missing_indicators.append_to(X_train_scaled, missing_indicators.expand())
+            X_test_scaled = missing_indicators.append_to(X_test_scaled, missing_indicators.transform(X_test))
+            print(f"After adding missing-value indicators, X_train has shape {X_train_scaled.shape}")
+    
+    # Append the unscaled one-hot block (as CSR only where that is smaller than dense)
+    if args.categorical_encoding == 'onehot':
+        category_encoder = SparseOneHotEncoder().fit(data)
+        X_train_scaled = category_encoder.append_to(X_train_scaled, data.loc[X_train.index])
+        X_test_scaled = category_encoder.append_to(X_test_scaled, data.loc[X_test.index])
+        layout = 'CSR' if sparse.issparse(X_train_scaled) else 'dense'
+        print(f"After one-hot encoding, X_train has shape {X_train_scaled.shape} ({layout})")
+    
+    return (X_train_scaled, X_test_scaled, y_train, y_test, imputer, feature_selector, scaler, category_encoder,
+            missing_indicators)
+
+def select_missing_indicators(args, missing_indicators, X_train_scaled, y_train, feature_names, model_params):
+    """
+    Keep indicators only for features with missing training values that a quick model splits on
+    
+    Parameters:
+    -----------
+    args : argparse.Namespace
+        Parsed command line arguments
+    missing_indicators : MissingIndicators
+        Indicators fitted on the training rows before imputation
+    X_train_scaled : numpy.ndarray
+        Preprocessed training features
+    y_train : pandas.Series
+        Training target
+    feature_names : list
+        Names of the columns of X_train_scaled
+    model_params : dict
+        Tuned parameters per model type, used for the quick pass
+    
+    Returns:
+    --------
+    MissingIndicators or None
+        Indicators with their selected columns, or None if no column qualifies
+    """
+    candidates = [name for name, count in zip(missing_indicators.feature_names_in_, missing_indicators.missing_counts_)
+                  if count > 0 and name in feature_names]
+    if not candidates:
+        print("No missing values in the training features, skipping missing-value indicators")
+        return None
+    
+    quick_type = args.model if args.model in ['xgboost', 'random_forest', 'gradient_boost'] else 'xgboost'
+    estimator = create_quick_estimator(quick_type, model_params.get(quick_type)).fit(X_train_scaled, y_train)
+    split_features = [name for name, importance in zip(feature_names, estimator.feature_importances_)
+                      if importance > 0]
+    missing_indicators.select([name for name in candidates if name in split_features])
+    print(f"Missing-value indicators for {len(missing_indicators.columns_)} distinct patterns among "
+          f"{len(candidates)} features with missing values: {missing_indicators.columns_} "
+          f"(packed mask {missing_indicators.bits_.nbytes / 1e3:.1f} kB)")
+    return missing_indicators if missing_indicators.columns_ else None
+
+def get_input_columns(data, numeric_features):
+    """Return the input feature names present in raw or cleaned data, with the size feature last."""
+    columns = [col for col in numeric_features if col in data.columns and col != 'ipoSize']
+    if 'ipoSize' in data.columns or 'ipoSize_normalized' in data.columns:
+        columns.append('ipoSize_normalized')
+    return columns
+
+def preprocess_target_float32(args, data, feature_set, target, offer_predictions=None, model_params=None):
+    """
+    Float32 counterpart of preprocess_target working on a single column buffer
+    
+    The raw rows are cleaned, encoded and engineered straight into one float32
+    matrix laid out as [train rows, test rows], so the train and test sets are
+    views of it. Imputation and scaling then run in place, column by column.
+    
+    Parameters:
+    -----------
+    args : argparse.Namespace
+        Parsed command line arguments
+    data : pandas.DataFrame
+        Raw (not cleaned or encoded) data
+    feature_set : FeatureSet
+        Compiled feature definitions for the target
+    target : str
+        Target variable
+    offer_predictions : numpy.ndarray, optional
+        Predicted offer prices for every row, added as a feature for closeDay1
+    model_params : dict, optional
+        Tuned parameters per model type, used for the feature selection pass
+    
+    Returns:
+    --------
+    tuple or None
+        (X_train_scaled, X_test_scaled, y_train, y_test, imputer, feature_selector, scaler,
+        category_encoder, missing_indicators), or None if the target could not be prepared
+    """
+    model_params = model_params or {}
+    if target not in data.columns:
+        print(f"Error: Target '{target}' not found in data")
+        return None
+    
+    # Split row positions first so the buffer can be filled in [train, test] order
+    y = data[target].to_numpy(dtype=np.float64)
+    labelled = np.flatnonzero(~np.isnan(y))
+    train_rows, test_rows = train_test_split(labelled, test_size=args.test_size, random_state=42)
+    rows = np.concatenate([train_rows, test_rows])
+    n_train = len(train_rows)
+    y_train = pd.Series(y[train_rows])
+    y_test = pd.Series(y[test_rows])
+    
+    extra = {'predicted_offerPrice': offer_predictions} if offer_predictions is not None else None
+    
+    stats = {}
+    with measure_resources(stats):
+        X = feature_set.transform(data, extra, rows, dtype=np.float32)
+        feature_names = list(feature_set.output_columns_)
+        print(f"Feature matrix X shape: {X.shape} (float32)")
+        
+        if args.winsorize:
+            # One vectorized clip over the whole buffer
+            winsorizer = Winsorizer(args.winsorize_quantile).fit(X[:n_train], feature_names)
+            winsorizer.transform(X, copy=False)
+            feature_set.set_clip_bounds(*winsorizer.bounds_)
+            print(f"Winsorized {len(winsorizer.sketches_)} heavy-tailed features in place")
+        
+        print("Imputing missing values in place...")
+        imputer = Float32Imputer(args.imputation_strategy).fit(X[:n_train], feature_names)
+        imputer.transform(X, copy=False)
+        
+        feature_selector = None
+        if args.select_features:
+            print("Performing feature selection...")
+            quick_type = args.model if args.model in ['xgboost', 'random_forest', 'gradient_boost'] else 'xgboost'
+            feature_selector = select_features(
+                X[:n_train], y_train,
+                create_quick_estimator(quick_type, model_params.get(quick_type)),
+                method=args.selection_method,
+                cache_dir=os.path.join(args.output_path, 'selection_cache'),
+                feature_names=feature_names
+            )
+            save_artifact(args.output_path, f'feature_selector_{target}.joblib', feature_selector)
+            with open(os.path.join(args.output_path, f'feature_selection_{target}.json'), 'w') as f:
+                json.dump(feature_selector.provenance, f, indent=2)
+            X = np.asfortranarray(feature_selector.transform(X))
+            feature_names = [name for name, keep in zip(feature_names, feature_selector.get_support()) if keep]
+            print(f"After feature selection, X has shape {X.shape}")
+        
+        print("Scaling features in place...")
+        scaler = Float32Scaler('robust' if args.use_robust_scaler else 'standard').fit(X[:n_train], feature_names)
+        scaler.transform(X, copy=False)
+    
+    print(f"Float32 preprocessing: {stats['seconds']:.3f}s, peak memory {stats['peak_bytes'] / 1e6:.1f} MB, "
+          f"feature matrix {X.nbytes / 1e6:.1f} MB")
+    
+    return X[:n_train], X[n_train:], y_train, y_test, imputer, feature_selector, scaler, None, None
+
+def preprocess_target_chunked(args, encoder, feature_set, target, offer_predictions=None):
+    """
+    Out-of-core counterpart of preprocess_target streaming the input file in chunks
+    
+    The split is made on row positions from the target column alone. A first pass
+    over the file fits a StreamingImputer on the training rows (fit_streaming_imputer),
+    a second pass (ChunkedPipeline.transform_to_memmap) imputes every labelled row
+    into a memory-mapped matrix laid out as [train rows, test rows]. The scaler is then fitted and applied block by block on that matrix, so memory
+    use does not depend on the number of rows.
+    
+    Parameters:
+    -----------
+    args : argparse.Namespace
+        Parsed command line arguments
+    encoder : CategoricalEncoder
+        Fitted categorical encoder
+    feature_set : FeatureSet
+        Compiled feature definitions for the target
+    target : str
+        Target variable
+    offer_predictions : numpy.ndarray, optional
+        Predicted offer prices for every row, added as a feature for closeDay1
+    
+    Returns:
+    --------
+    tuple or None
+        (X_train_scaled, X_test_scaled, y_train, y_test, imputer, feature_selector, scaler,
+        category_encoder, missing_indicators), or None if the target could not be prepared
+    """
+    y = read_csv_column(args.input_path, target, args.chunk_size)
+    labelled = np.flatnonzero(~np.isnan(y))
+    if len(labelled) == 0:
+        print(f"Error: Target '{target}' not found in data")
+        return None
+    train_rows, test_rows = train_test_split(labelled, test_size=args.test_size, random_state=42)
+    n_train = len(train_rows)
+    y_train = pd.Series(y[train_rows])
+    y_test = pd.Series(y[test_rows])
+    
+    # Position of every file row in the [train, test] matrix (-1 for unlabelled rows)
+    slots = np.full(len(y), -1, dtype=np.int64)
+    slots[train_rows] = np.arange(n_train)
+    slots[test_rows] = n_train + np.arange(len(test_rows))
+    
+    dtype = np.float32 if args.float32 else np.float64
+    extra = {'predicted_offerPrice': offer_predictions} if offer_predictions is not None else None
+    columns = feature_set.output_columns_
+    
+    def feature_chunks():
+        chunks = encode_chunks(clean_chunks(read_csv_chunks(args.input_path, args.chunk_size)), encoder)
+        offset = 0
+        for _, X in build_feature_chunks(chunks, feature_set, extra, dtype):
+            yield X, slots[offset:offset + len(X)]
+            offset += len(X)
+    
+    stats = {}
+    with measure_resources(stats):
+        if args.winsorize:
+            # The bounds are stored in the feature set, so the later passes produce clipped chunks
+            print("Fitting winsorization bounds over chunks...")
+            winsorizer = Winsorizer(args.winsorize_quantile)
+            for X, chunk_slots in feature_chunks():
+                winsorizer.partial_fit(X[(chunk_slots >= 0) & (chunk_slots < n_train)], columns)
+            feature_set.set_clip_bounds(*winsorizer.bounds_)
+        
+        print("Fitting imputer over chunks...")
+        train_chunks = (pd.DataFrame(X[(chunk_slots >= 0) & (chunk_slots < n_train)], columns=columns)
+                        for X, chunk_slots in feature_chunks())
+        imputer = fit_streaming_imputer(train_chunks, args.imputation_strategy)
+        
+        print("Imputing into memory-mapped matrix...")
+        cache_dir = os.path.join(args.output_path, 'chunk_cache')
+        os.makedirs(cache_dir, exist_ok=True)
+        # The scaler is fitted on the imputed matrix, so the pipeline stops before scaling
+        pipeline = ChunkedPipeline(feature_set, imputer, None, encoder, dtype=dtype)
+        X_all = pipeline.transform_to_memmap(read_csv_chunks(args.input_path, args.chunk_size), len(labelled),
+                                             os.path.join(cache_dir, f'X_{target}.npy'), extra, slots)
+        
+        print("Scaling features block by block...")
+        scaler = StandardScaler()
+        for block in iter_row_blocks(X_all[:n_train], args.chunk_size):
+            scaler.partial_fit(pd.DataFrame(block, columns=columns))
+        for start in range(0, len(labelled), args.chunk_size):
+            X_all[start:start + args.chunk_size] = transform_chunk(scaler, np.array(X_all[start:start + args.chunk_size]))
+        X_all.flush()
+    
+    print(f"Feature matrix X shape: {X_all.shape} ({np.dtype(dtype).name}, memory-mapped)")
+    print(f"Chunked preprocessing: {stats['seconds']:.3f}s, peak memory {stats['peak_bytes'] / 1e6:.1f} MB, "
+          f"feature matrix {X_all.nbytes / 1e6:.1f} MB on disk")
+    
+    return X_all[:n_train], X_all[n_train:], y_train, y_test, imputer, None, scaler, None, None
+
+def predict_full_dataset_chunked(args, encoder, feature_set, imputer, scaler, trained_models):
+    """Average the predictions of the trained models for every row of the input file, chunk by chunk."""
+    pipeline = ChunkedPipeline(feature_set, imputer, scaler, encoder,
+                               dtype=np.float32 if args.float32 else np.float64)
+    predictions = []
+    for _, X in pipeline.stream(read_csv_chunks(args.input_path, args.chunk_size)):
+        chunk_predictions = np.zeros(len(X))
+        for model in trained_models.values():
+            chunk_predictions += model.predict(X)
+        predictions.append(chunk_predictions / len(trained_models))
+    return np.concatenate(predictions)
+
+def transform_full_dataset(args, data, feature_set, imputer, feature_selector, scaler, category_encoder=None,
+                           missing_indicators=None):
+    """
+    Apply the fitted preprocessors to every row of the data
+    
+    Used to produce the offer price predictions that feed the closeDay1 models.
+    
+    Returns:
+    --------
+    numpy.ndarray
+        Scaled feature matrix for all rows
+    """
+    if args.float32:
+        X_full = feature_set.transform(data, dtype=np.float32)
+        imputer.transform(X_full, copy=False)
+        if feature_selector is not None:
+            X_full = np.asfortranarray(feature_selector.transform(X_full))
+        return scaler.transform(X_full, copy=False)
+    
+    X_full = feature_set.transform_frame(data)
+    if isinstance(category_encoder, TargetEncoder):
+        X_full = category_encoder.transform(X_full)
+    
+    indicators = missing_indicators.transform(X_full) if missing_indicators is not None else None
+    X_full_imputed, _ = impute_numeric_features(X_full, imputer)
+    
+    if feature_selector is not None:
+        try:
+            X_full_selected = feature_selector.transform(X_full_imputed)
+        except Exception as e:
+            print(f"Error during feature selection for full dataset: {e}")
+            X_full_selected = X_full_imputed
+    else:
+        X_full_selected = X_full_imputed
+    
+    X_full_scaled = scaler.transform(X_full_selected)
+    if indicators is not None:
+        X_full_scaled = missing_indicators.append_to(X_full_scaled, indicators)
+    if isinstance(category_encoder, SparseOneHotEncoder):
+        X_full_scaled = category_encoder.append_to(X_full_scaled, data)
+    
+    return X_full_scaled
+
+def train(args, run):
+    """
+    Execute the training process
+    
+    Parameters:
+    -----------
+    args : argparse.Namespace
+        Parsed command line arguments
+    run : ExperimentRun
+        Run the stages and metrics are recorded in
+    
+    Returns:
+    --------
+    bool
+        True if training ran, False if it stopped on an error
+    """
+    if args.resume and (args.incremental or args.multi_output):
+        print("Error: --resume is not supported with --incremental or --multi-output")
+        return False
+    
+    if args.incremental:
+        return run_incremental(args, run)
+    
+    if args.categorical_encoding != 'ordinal' and (args.float32 or args.multi_output):
+        print("Error: --categorical-encoding onehot/target is not supported with --float32 or --multi-output")
+        return False
+    
+    if args.missing_indicators and (args.float32 or args.multi_output):
+        print("Error: --missing-indicators is not supported with --float32 or --multi-output")
+        return False
+    
+    if args.chunk_size and (args.multi_output or args.select_features or args.use_robust_scaler
+                            or args.categorical_encoding != 'ordinal' or args.missing_indicators):
+        print("Error: --chunk-size supports the default preprocessing only (no --multi-output, --select-features, "
+              "--use-robust-scaler, --categorical-encoding onehot/target or --missing-indicators)")
+        return False
     
     # Load data
+    run.start_stage('load_data')
     print(f"Loading data from {args.input_path}")
     try:
-        data = pd.read_csv(args.input_path)
+        # In chunked mode only the first chunk is loaded, to discover the columns
+        data = pd.read_csv(args.input_path, nrows=args.chunk_size)
     except FileNotFoundError:
         print(f"Error: File {args.input_path} not found")
-        return
+        return False
     
     # Print column names to help with debugging
     print("Available columns in dataset:")
@@ -84,12 +1250,7 @@ def main():
     numeric_features = []
     
     # Check if columns exist and add them to the list
-    for col in ['egc', 'highTech', 'age', 'year', 'exchange', 'industryFF12', 'nUnderwriters',
-               'sharesOfferedPerc', 'investmentReceived', 'amountOnProspectus',
-               'commonEquity', 'sp2weeksBefore', 'blueSky', 'managementFee',
-               'bookValue', 'totalAssets', 'totalRevenue', 'netIncome',
-               'roa', 'leverage', 'vc', 'pe', 'prominence', 'nVCs', 'nExecutives',
-               'priorFinancing', 'reputationLeadMax', 'reputationAvg', 'nPatents']:
+    for col in FEATURE_COLUMNS:
         if col in data.columns:
             numeric_features.append(col)
     
@@ -111,10 +1272,29 @@ def main():
     print("\nSelected numeric features:", numeric_features)
     print(f"Total: {len(numeric_features)} features")
     
-    # Preprocess data
-    print("\nPreprocessing data...")
-    data = clean_data(data)
-    data = encode_categorical_features(data)
+    # Keep the raw rows for the incremental training cache
+    raw_data = data
+    
+    # Categories are fixed by the schema; the fitted encoder records the training counts
+    run.start_stage('fit_encoder')
+    if args.chunk_size:
+        encoder = CategoricalEncoder()
+        for chunk in read_csv_chunks(args.input_path, args.chunk_size):
+            encoder.partial_fit(chunk)
+    else:
+        encoder = CategoricalEncoder().fit(data)
+    save_artifact(args.output_path, 'categorical_encoder.joblib', encoder)
+    
+    if args.multi_output:
+        return run_multi_output(args, encode_categorical_features(clean_data(data), encoder), numeric_features, run)
+    remove_stale_multi_output_model(args)
+    
+    # Preprocess data (the float32 and chunked modes clean and encode while building their matrices)
+    if not args.float32 and not args.chunk_size:
+        print("\nPreprocessing data...")
+        run.start_stage('clean_encode')
+        data = clean_data(data)
+        data = encode_categorical_features(data, encoder)
     
     # Define targets
     targets = []
@@ -125,98 +1305,62 @@ def main():
     
     print(f"\nTarget variables: {targets}")
     
+    tuned_params = load_params_config(args.params_config)
+    
+    # Completed units (preprocessed data, trained models, offer price predictions) of this run
+    checkpoint = TrainingCheckpoint.open(os.path.join(args.output_path, 'checkpoint'), checkpoint_settings(args),
+                                         args.resume)
+    
     # Dictionary to store predictions for second-stage model
     offer_predictions = None
     
     for target_idx, target in enumerate(targets):
         print(f"\nTraining models for target: {target}")
+        run.start_stage(f'preprocess_{target}')
         
-        # Prepare features and target
-        try:
-            # We'll create X more carefully
-            X = pd.DataFrame()
-            for col in numeric_features:
-                if col in data.columns:
-                    X[col] = data[col].copy()
-                else:
-                    print(f"Warning: Column {col} not found in data")
-            
-            if 'ipoSize_normalized' in data.columns:
-                X['ipoSize_normalized'] = data['ipoSize_normalized']
-            
-            # Add predicted offer price for closeDay1 prediction
-            if target == 'closeDay1' and target_idx > 0 and offer_predictions is not None:
-                X['predicted_offerPrice'] = offer_predictions
-                
-            print(f"Feature matrix X shape: {X.shape}")
-        except Exception as e:
-            print(f"Error creating feature matrix: {e}")
-            continue
-        
-        # Apply feature engineering if requested
-        if args.apply_feature_engineering:
-            print("Applying feature engineering...")
-            try:
-                X = apply_feature_engineering(X)
-                print(f"After feature engineering, X has shape {X.shape}")
-            except Exception as e:
-                print(f"Error during feature engineering: {e}")
-                print("Continuing without feature engineering")
-        
-        # Drop rows with NaN in target
-        if target in data.columns:
-            mask = ~data[target].isna()
-            X_filtered = X[mask]
-            y_filtered = data.loc[mask, target]
-        else:
-            print(f"Error: Target '{target}' not found in data")
-            continue
-        
-        print(f"After filtering, X has {X_filtered.shape[0]} rows and {X_filtered.shape[1]} columns")
-        print(f"y has {len(y_filtered)} values")
+        # Tuned parameters for this target (None falls back to the factory defaults)
+        model_params = tuned_params.get(target, {})
+        if model_params:
+            print(f"Using tuned parameters for: {list(model_params.keys())}")
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X_filtered, y_filtered, test_size=args.test_size, random_state=42
-        )
+        # Compiled feature definitions, saved so prediction and the API build the same matrix
+        with_offer_predictions = target == 'closeDay1' and offer_predictions is not None
+        input_columns = get_input_columns(data, numeric_features)
+        if args.categorical_encoding == 'onehot':
+            # The nominal columns enter the model as the one-hot block only
+            input_columns = [col for col in input_columns if col not in NOMINAL_COLUMNS]
+        feature_set = build_feature_set(input_columns, args.apply_feature_engineering, with_offer_predictions)
         
-        # Impute missing values
-        print("Imputing missing values...")
-        X_train_imputed, imputer = impute_numeric_features(X_train)
-        X_test_imputed, _ = impute_numeric_features(X_test, imputer)
-        
-        # Feature selection if requested
-        if args.select_features:
-            print("Performing feature selection...")
-            try:
-                feature_selector = select_features(X_train_imputed, y_train)
-                X_train_selected = feature_selector.transform(X_train_imputed)
-                X_test_selected = feature_selector.transform(X_test_imputed)
-                dump(feature_selector, os.path.join(args.output_path, f'feature_selector_{target}.joblib'))
-                print(f"After feature selection, X_train has shape {X_train_selected.shape}")
-            except Exception as e:
-                print(f"Error during feature selection: {e}")
-                print("Continuing without feature selection")
-                X_train_selected = X_train_imputed
-                X_test_selected = X_test_imputed
+        unit = f'preprocess_{target}'
+        if checkpoint.has(unit):
+            print(f"Restored preprocessed data for {target} from checkpoint")
+            state, matrices = checkpoint.load(unit)
+            prepared = (matrices['X_train'], matrices['X_test']) + tuple(state)
         else:
-            X_train_selected = X_train_imputed
-            X_test_selected = X_test_imputed
-        
-        # Scale features
-        print("Scaling features...")
-        if args.use_robust_scaler:
-            scaler = RobustScaler()
-        else:
-            scaler = StandardScaler()
-        
-        X_train_scaled = scaler.fit_transform(X_train_selected)
-        X_test_scaled = scaler.transform(X_test_selected)
-        print(f"After scaling, X_train has shape {X_train_scaled.shape}")
+            if args.chunk_size:
+                prepared = preprocess_target_chunked(args, encoder, feature_set, target, offer_predictions)
+            elif args.float32:
+                prepared = preprocess_target_float32(args, data, feature_set, target, offer_predictions, model_params)
+            else:
+                prepared = preprocess_target(args, data, feature_set, target, offer_predictions, model_params)
+            if prepared is None:
+                continue
+            checkpoint.save(unit, prepared[2:], {'X_train': prepared[0], 'X_test': prepared[1]})
+        (X_train_scaled, X_test_scaled, y_train, y_test, imputer, feature_selector, scaler, category_encoder,
+         missing_indicators) = prepared
         
         # Save preprocessors
-        dump(imputer, os.path.join(args.output_path, f'imputer_{target}.joblib'))
-        dump(scaler, os.path.join(args.output_path, f'scaler_{target}.joblib'))
+        save_artifact(args.output_path, f'feature_set_{target}.joblib', feature_set)
+        save_artifact(args.output_path, f'imputer_{target}.joblib', imputer)
+        save_artifact(args.output_path, f'scaler_{target}.joblib', scaler)
+        if category_encoder is not None:
+            save_artifact(args.output_path, f'category_encoder_{target}.joblib', category_encoder)
+        else:
+            remove_artifact(args.output_path, f'category_encoder_{target}.joblib')
+        if missing_indicators is not None:
+            save_artifact(args.output_path, f'missing_indicators_{target}.joblib', missing_indicators)
+        else:
+            remove_artifact(args.output_path, f'missing_indicators_{target}.joblib')
         
         # Train models based on specified model type
         models_to_train = []
@@ -234,11 +1378,25 @@ def main():
         model_predictions = {}
         
         for model_type in models_to_train:
+            run.start_stage(f'train_{model_type}_{target}')
+            unit = f'{model_type}_{target}'
+            if checkpoint.has(unit):
+                state, _ = checkpoint.load(unit)
+                model = state['model']
+                trained_models.update(state['trained_models'])
+                model_predictions.update(state['predictions'])
+                save_artifact(args.output_path, f'{model_type}_{target}.joblib', model)
+                run.log_metrics(target, model_type, **state['metrics'])
+                print(f"Restored {model_type} model for {target} from checkpoint "
+                      f"(RMSE: {state['metrics']['rmse']:.4f})")
+                continue
+            
             print(f"Training {model_type} model for {target}")
+            known_models, known_predictions = set(trained_models), set(model_predictions)
             
             if model_type == 'xgboost':
-                model = train_xgboost_model(X_train_scaled, y_train)
-                save_xgboost_model(model, os.path.join(args.output_path, f'xgboost_{target}.joblib'))
+                model = train_xgboost_model(X_train_scaled, y_train, model_params.get('xgboost'))
+                save_artifact(args.output_path, f'xgboost_{target}.joblib', model)
                 trained_models['xgboost'] = model
                 
                 # Evaluate the model
@@ -246,10 +1404,11 @@ def main():
                 model_predictions['xgboost'] = predictions
                 mse, rmse, r2 = calculate_metrics(y_test, predictions)
                 print(f"  MSE: {mse:.4f}, RMSE: {rmse:.4f}, R2: {r2:.4f}")
-                
+                run.log_metrics(target, model_type, mse=mse, rmse=rmse, r2=r2)
+            
             elif model_type == 'random_forest':
-                model = train_random_forest_model(X_train_scaled, y_train)
-                save_random_forest_model(model, os.path.join(args.output_path, f'random_forest_{target}.joblib'))
+                model = train_random_forest_model(X_train_scaled, y_train, model_params.get('random_forest'))
+                save_artifact(args.output_path, f'random_forest_{target}.joblib', model)
                 trained_models['random_forest'] = model
                 
                 # Evaluate the model
@@ -257,10 +1416,11 @@ def main():
                 model_predictions['random_forest'] = predictions
                 mse, rmse, r2 = calculate_metrics(y_test, predictions)
                 print(f"  MSE: {mse:.4f}, RMSE: {rmse:.4f}, R2: {r2:.4f}")
-                
+                run.log_metrics(target, model_type, mse=mse, rmse=rmse, r2=r2)
+            
             elif model_type == 'gradient_boost':
-                model = train_gradient_boost_model(X_train_scaled, y_train)
-                save_gradient_boost_model(model, os.path.join(args.output_path, f'gradient_boost_{target}.joblib'))
+                model = train_gradient_boost_model(X_train_scaled, y_train, model_params.get('gradient_boost'))
+                save_artifact(args.output_path, f'gradient_boost_{target}.joblib', model)
                 trained_models['gradient_boost'] = model
                 
                 # Evaluate the model
@@ -268,80 +1428,133 @@ def main():
                 model_predictions['gradient_boost'] = predictions
                 mse, rmse, r2 = calculate_metrics(y_test, predictions)
                 print(f"  MSE: {mse:.4f}, RMSE: {rmse:.4f}, R2: {r2:.4f}")
-                
+                run.log_metrics(target, model_type, mse=mse, rmse=rmse, r2=r2)
+            
             elif model_type == 'ensemble':
                 # If we're only training the ensemble, we need to train the base models first
                 if 'xgboost' not in trained_models:
-                    xgb_model = train_xgboost_model(X_train_scaled, y_train)
+                    xgb_model = train_xgboost_model(X_train_scaled, y_train, model_params.get('xgboost'))
                     trained_models['xgboost'] = xgb_model
                     model_predictions['xgboost'] = xgb_model.predict(X_test_scaled)
                 
                 if 'random_forest' not in trained_models:
-                    rf_model = train_random_forest_model(X_train_scaled, y_train)
+                    rf_model = train_random_forest_model(X_train_scaled, y_train, model_params.get('random_forest'))
                     trained_models['random_forest'] = rf_model
                     model_predictions['random_forest'] = rf_model.predict(X_test_scaled)
                 
                 if 'gradient_boost' not in trained_models:
-                    gb_model = train_gradient_boost_model(X_train_scaled, y_train)
+                    gb_model = train_gradient_boost_model(X_train_scaled, y_train, model_params.get('gradient_boost'))
                     trained_models['gradient_boost'] = gb_model
                     model_predictions['gradient_boost'] = gb_model.predict(X_test_scaled)
                 
                 # Train the ensemble model
-                model = train_ensemble_model(X_train_scaled, y_train)
-                save_ensemble_model(model, os.path.join(args.output_path, f'ensemble_{target}.joblib'))
+                model = train_ensemble_model(
+                    X_train_scaled, y_train,
+                    xgb_params=model_params.get('xgboost'),
+                    rf_params=model_params.get('random_forest'),
+                    gb_params=model_params.get('gradient_boost')
+                )
+                pruning_report_path = os.path.join(args.output_path, f'ensemble_pruning_{target}.json')
+                if args.prune_ensemble:
+                    print(f"Pruning ensemble (tolerance {args.prune_tolerance:.1%})...")
+                    model, report = prune_ensemble_model(model, X_test_scaled, y_test, args.prune_tolerance)
+                    print(format_pruning_report(report))
+                    with open(pruning_report_path, 'w') as f:
+                        json.dump(report, f, indent=2)
+                elif os.path.exists(pruning_report_path):
+                    os.remove(pruning_report_path)
+                save_artifact(args.output_path, f'ensemble_{target}.joblib', model)
                 
                 # Evaluate the model
                 predictions = model.predict(X_test_scaled)
-                mse, rmse, r2 = calculate_metrics(y_test, predictions)
+                if args.prune_ensemble:
+                    # The meta-learner was refitted on the validation half of the test set,
+                    # so only the evaluation half is out of sample
+                    mse, rmse, r2 = (report['after'][key] for key in ['mse', 'rmse', 'r2'])
+                    print(f"  Evaluated on the {report['evaluation_rows']} test rows not used for pruning")
+                else:
+                    mse, rmse, r2 = calculate_metrics(y_test, predictions)
                 print(f"  MSE: {mse:.4f}, RMSE: {rmse:.4f}, R2: {r2:.4f}")
+                run.log_metrics(target, model_type, mse=mse, rmse=rmse, r2=r2)
+            
+            # The unit's model, the base models it trained and their held-out predictions
+            checkpoint.save(unit, {
+                'model': model,
+                'trained_models': {name: trained_models[name] for name in trained_models if name not in known_models},
+                'predictions': {name: model_predictions[name] for name in model_predictions
+                                if name not in known_predictions},
+                'test_predictions': predictions,
+                'metrics': {'mse': mse, 'rmse': rmse, 'r2': r2}
+            })
         
         # Save all models in a dictionary if 'all' or 'ensemble' is specified
         if args.model in ['all', 'ensemble']:
-            dump(trained_models, os.path.join(args.output_path, f'{target}_models.joblib'))
+            save_artifact(args.output_path, f'{target}_models.joblib', trained_models)
+        
+        run.start_stage(f'benchmark_{target}')
+        saved_models = {name: trained_models[name] for name in models_to_train if name in trained_models}
+        if 'ensemble' in models_to_train:
+            # The ensemble is trained last
+            saved_models['ensemble'] = model
+        record_model_benchmarks(run, args.output_path, target, saved_models, X_test_scaled)
         
         # Create average prediction for all trained models if we need it for closeDay1
         if target == 'offerPrice' and 'closeDay1' in targets:
             # Make predictions on the full dataset for closeDay1 model
+            run.start_stage('predict_offerPrice_full')
+            if checkpoint.has('offer_predictions'):
+                offer_predictions, _ = checkpoint.load('offer_predictions')
+                print("Restored offerPrice predictions for closeDay1 from checkpoint")
+                continue
             try:
-                X_full = pd.DataFrame()
-                for col in numeric_features:
-                    if col in data.columns:
-                        X_full[col] = data[col].copy()
-                
-                if 'ipoSize_normalized' in data.columns:
-                    X_full['ipoSize_normalized'] = data['ipoSize_normalized']
-                
-                if args.apply_feature_engineering:
-                    try:
-                        X_full = apply_feature_engineering(X_full)
-                    except Exception as e:
-                        print(f"Error during feature engineering for full dataset: {e}")
-                    
-                X_full_imputed, _ = impute_numeric_features(X_full, imputer)
-                
-                if args.select_features and 'feature_selector' in locals():
-                    try:
-                        X_full_selected = feature_selector.transform(X_full_imputed)
-                    except Exception as e:
-                        print(f"Error during feature selection for full dataset: {e}")
-                        X_full_selected = X_full_imputed
-                else:
-                    X_full_selected = X_full_imputed
-                    
-                X_full_scaled = scaler.transform(X_full_selected)
+                if args.chunk_size:
+                    offer_predictions = predict_full_dataset_chunked(args, encoder, feature_set, imputer, scaler,
+                                                                     trained_models)
+                    checkpoint.save('offer_predictions', offer_predictions)
+                    continue
+                X_full_scaled = transform_full_dataset(args, data, feature_set, imputer, feature_selector, scaler,
+                                                       category_encoder, missing_indicators)
                 
                 # Generate predictions from all trained models
-                full_predictions = np.zeros(len(X_full_scaled))
+                full_predictions = np.zeros(X_full_scaled.shape[0])
                 for model in trained_models.values():
                     full_predictions += model.predict(X_full_scaled)
                 full_predictions /= len(trained_models)
                 
                 # Store predictions for use in closeDay1 model
                 offer_predictions = full_predictions
+                checkpoint.save('offer_predictions', offer_predictions)
             except Exception as e:
                 print(f"Error making predictions for closeDay1: {e}")
     
+    run.start_stage('save_cache')
+    if args.chunk_size:
+        shutil.copyfile(args.input_path, get_cache_path(args))
+    else:
+        raw_data.to_csv(get_cache_path(args), index=False)
+    
+    checkpoint.remove()
+    remove_stale_blocks(args.output_path)
     print("\nTraining completed successfully!")
+    return True
+
+def main():
+    """Main function to execute the training process."""
+    args = parse_arguments()
+    # The joint model is a single model type, so the default ensemble does not apply
+    if args.model is None:
+        args.model = 'xgboost' if args.multi_output else 'ensemble'
+    
+    # Create output directory if it doesn't exist
+    os.makedirs(args.output_path, exist_ok=True)
+    
+    run = start_experiment_run(args)
+    try:
+        completed = train(args, run)
+    except BaseException:
+        run.finish('failed')
+        raise
+    run.finish('completed' if completed else 'failed', artifact_size(args.output_path))
 
 if __name__ == "__main__":
     main()
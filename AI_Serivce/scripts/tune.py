@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import queue
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import mean_squared_error
+from joblib import dump, load
+import sys
+
+# Add parent directory to path to enable relative imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing.impute_missing import impute_numeric_features
+from preprocessing.feature_store import FeatureStore, open_feature_store
+from models.xgboost_model import create_xgboost_model
+from models.random_forest_model import create_random_forest_model
+from models.gradient_boost_model import create_gradient_boost_model
+from scripts.train import (FEATURE_COLUMNS, load_params_config, create_model, offer_model_types,
+                           out_of_fold_offer_predictions, with_offer_price_feature)
+
+MODEL_FACTORIES = {
+    'xgboost': create_xgboost_model,
+    'random_forest': create_random_forest_model,
+    'gradient_boost': create_gradient_boost_model
+}
+
+# Fold matrices shared by the worker processes (memory-mapped from the fold cache)
+_FOLDS = None
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Successive-halving hyperparameter search for IPO price models')
+    
+    parser.add_argument('--input-path', type=str, default='data/raw/training_data.csv',
+                        help='Path to the input CSV file')
+    parser.add_argument('--output-path', type=str, default='models/trained/tuned_params.json',
+                        help='JSON config to write the winning parameters to (read by train.py --params-config)')
+    parser.add_argument('--cache-dir', type=str, default='models/trained/tune_cache',
+                        help='Directory for the cached preprocessed folds')
+    parser.add_argument('--feature-store', type=str, default='models/trained/feature_store',
+                        help='Directory of the memory-mapped feature stores shared with backtest.py')
+    parser.add_argument('--model', type=str, default='all',
+                        choices=['xgboost', 'random_forest', 'gradient_boost', 'all'],
+                        help='Model factory to tune')
+    parser.add_argument('--target', type=str, default='offerPrice',
+                        choices=['offerPrice', 'closeDay1'],
+                        help='Target variable to tune for')
+    parser.add_argument('--n-candidates', type=int, default=27,
+                        help='Number of sampled configurations in the first rung')
+    parser.add_argument('--eta', type=int, default=3,
+                        help='Halving rate: keep 1/eta of the candidates and multiply the budget by eta per rung')
+    parser.add_argument('--min-rows', type=int, default=300,
+                        help='Training rows per fold in the first rung')
+    parser.add_argument('--min-rounds', type=int, default=20,
+                        help='Boosting rounds (trees for random forest) in the first rung')
+    parser.add_argument('--max-rounds', type=int, default=300,
+                        help='Maximum boosting rounds (trees for random forest)')
+    parser.add_argument('--n-folds', type=int, default=3,
+                        help='Number of cross-validation folds')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Number of worker processes')
+    parser.add_argument('--time-budget', type=float, default=600,
+                        help='Wall-clock budget in seconds for the whole search')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed for sampling and fold assignment')
+    parser.add_argument('--apply-feature-engineering', action='store_true',
+                        help='Apply feature engineering')
+    parser.add_argument('--offer-model', type=str, default='ensemble',
+                        choices=['xgboost', 'random_forest', 'gradient_boost', 'ensemble', 'all'],
+                        help='offerPrice models averaged into the predicted_offerPrice feature of closeDay1 '
+                             '(the --model of train.py)')
+    parser.add_argument('--params-config', type=str, default=None,
+                        help='JSON file with tuned offerPrice parameters for the --offer-model models')
+    
+    return parser.parse_args()
+
+def sample_params(model_type, rng):
+    """
+    Sample a candidate parameter set for a model factory
+    
+    The number of estimators is the search budget and is set per rung.
+    
+    Parameters:
+    -----------
+    model_type : str
+        One of 'xgboost', 'random_forest', 'gradient_boost'
+    rng : numpy.random.Generator
+        Random generator
+    
+    Returns:
+    --------
+    dict
+        Parameters for the model factory (without n_estimators)
+    """
+    def log_uniform(low, high):
+        return float(math.exp(rng.uniform(math.log(low), math.log(high))))
+    
+    if model_type == 'xgboost':
+        return {
+            'learning_rate': log_uniform(0.01, 0.3),
+            'max_depth': int(rng.integers(3, 11)),
+            'subsample': float(rng.uniform(0.5, 1.0)),
+            'colsample_bytree': float(rng.uniform(0.5, 1.0)),
+            'min_child_weight': log_uniform(1, 10),
+            'random_state': 42
+        }
+    if model_type == 'random_forest':
+        return {
+            'max_depth': [None, 6, 8, 10, 14, 20][int(rng.integers(6))],
+            'min_samples_split': int(rng.integers(2, 21)),
+            'min_samples_leaf': int(rng.integers(1, 11)),
+            'max_features': [1.0, 'sqrt', 0.5][int(rng.integers(3))],
+            'random_state': 42
+        }
+    return {
+        'learning_rate': log_uniform(0.01, 0.3),
+        'max_depth': int(rng.integers(2, 7)),
+        'subsample': float(rng.uniform(0.5, 1.0)),
+        'min_samples_leaf': int(rng.integers(1, 21)),
+        'random_state': 42
+    }
+
+def prepare_folds(args):
+    """
+    Preprocess the data once per fold and cache the fold matrices on disk
+    
+    The folds are preprocessed in parallel by prepare_fold.
+    
+    Returns:
+    --------
+    str
+        Path to the cached folds (reused when the input and settings are unchanged)
+    """
+    with open(args.input_path, 'rb') as f:
+        digest = hashlib.sha256(f.read())
+    digest.update(f"{args.target}|{args.n_folds}|{args.seed}|{args.apply_feature_engineering}".encode())
+    if args.target == 'closeDay1':
+        offer_params = load_params_config(args.params_config).get('offerPrice', {})
+        digest.update(json.dumps([offer_model_types(args.offer_model), offer_params], sort_keys=True).encode())
+    cache_path = os.path.join(args.cache_dir, f'folds_{digest.hexdigest()[:16]}.joblib')
+    
+    if os.path.exists(cache_path):
+        print(f"Using cached folds from {cache_path}")
+        return cache_path
+    
+    print(f"Preprocessing {args.n_folds} folds...")
+    store = open_feature_store(args.feature_store, args.input_path, args.apply_feature_engineering, FEATURE_COLUMNS)
+    n_workers = max(1, min(args.workers, args.n_folds))
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        folds = list(executor.map(prepare_fold, [args] * args.n_folds, [store.path] * args.n_folds,
+                                  range(args.n_folds), [n_workers > 1] * args.n_folds))
+    
+    os.makedirs(args.cache_dir, exist_ok=True)
+    dump(folds, cache_path)
+    return cache_path
+
+def prepare_fold(args, store_path, fold_idx, single_threaded):
+    """
+    Preprocess one cross-validation fold
+    
+    For closeDay1 the fold gets the 'predicted_offerPrice' feature that train.py
+    feeds the closeDay1 model: the average of the offerPrice models train.py
+    averages for --offer-model, fitted without the fold's validation rows.
+    
+    Returns:
+    --------
+    dict
+        Scaled training and validation matrices and targets
+    """
+    store = FeatureStore(store_path)
+    y_all = store.target(args.target)
+    # Labelled rows in input file order, so the shuffled folds do not depend on the store layout
+    order = np.argsort(store.row_ids())
+    labelled = np.flatnonzero(~np.isnan(y_all[order]))
+    positions = order[labelled]
+    X = store.frame(positions)
+    y = np.asarray(y_all[positions])
+    
+    splitter = KFold(n_splits=args.n_folds, shuffle=True, random_state=args.seed)
+    train_idx, valid_idx = list(splitter.split(X))[fold_idx]
+    X_train = X.iloc[train_idx]
+    X_valid = X.iloc[valid_idx]
+    if args.target == 'closeDay1':
+        offer_params = load_params_config(args.params_config).get('offerPrice', {})
+        offer_models = [create_model(model_type, offer_params, single_threaded)
+                        for model_type in offer_model_types(args.offer_model)]
+        train_offer, valid_offer = out_of_fold_offer_predictions(
+            store.frame(order), np.asarray(store.target('offerPrice'))[order],
+            np.setdiff1d(np.arange(len(order)), labelled[valid_idx]), labelled[train_idx], labelled[valid_idx],
+            offer_models, args.seed)
+        X_train = with_offer_price_feature(X_train, train_offer)
+        X_valid = with_offer_price_feature(X_valid, valid_offer)
+    X_train, imputer = impute_numeric_features(X_train)
+    X_valid, _ = impute_numeric_features(X_valid, imputer)
+    scaler = StandardScaler()
+    return {
+        'X_train': scaler.fit_transform(X_train),
+        'y_train': y[train_idx],
+        'X_valid': scaler.transform(X_valid),
+        'y_valid': y[valid_idx]
+    }
+
+def _init_worker(cache_path):
+    """Open the cached folds once per worker process."""
+    global _FOLDS
+    _FOLDS = load(cache_path, mmap_mode='r')
+
+def evaluate_candidate(model_type, params, n_rows, n_rounds):
+    """
+    Cross-validate one candidate on the first n_rows training rows of each fold
+    
+    Returns:
+    --------
+    tuple
+        (mean validation RMSE, fit time in seconds)
+    """
+    start_time = time.time()
+    rmses = []
+    for fold in _FOLDS:
+        model = MODEL_FACTORIES[model_type]({**params, 'n_estimators': n_rounds})
+        if model_type == 'xgboost':
+            # One thread per candidate, the process pool provides the parallelism
+            model.set_params(n_jobs=1)
+        model.fit(fold['X_train'][:n_rows], fold['y_train'][:n_rows])
+        predictions = model.predict(fold['X_valid'])
+        rmses.append(math.sqrt(mean_squared_error(fold['y_valid'], predictions)))
+    return float(np.mean(rmses)), time.time() - start_time
+
+def evaluate_rung(pool, model_type, candidates, n_rows, n_rounds, deadline):
+    """
+    Evaluate one rung's candidates on the pool until they finish or the deadline passes
+    
+    Returns:
+    --------
+    tuple
+        (list of (RMSE, params) for the finished candidates, whether all finished)
+    """
+    finished = queue.Queue()
+    for params in candidates:
+        pool.apply_async(evaluate_candidate, (model_type, params, n_rows, n_rounds),
+                         callback=lambda result, params=params: finished.put((result, params)),
+                         error_callback=lambda error: finished.put((error, None)))
+    
+    results = []
+    while len(results) < len(candidates):
+        try:
+            result, params = finished.get(timeout=max(0.0, deadline - time.time()))
+        except queue.Empty:
+            break
+        if params is None:
+            raise result
+        results.append((result[0], params))
+    return results, len(results) == len(candidates)
+
+def successive_halving(model_type, args, pool, n_train_rows, deadline, rng):
+    """
+    Run successive halving for one model factory
+    
+    Each rung keeps the best 1/eta of the candidates and multiplies both the
+    training rows and the boosting rounds by eta, until the full budget is reached
+    or the deadline passes. When the deadline passes, the pool is terminated so
+    no candidate keeps fitting past the budget.
+    
+    The winner comes from the last rung in which every candidate finished: the
+    first finishers of a partial rung are the fastest candidates, not the best.
+    Only when no rung finished is the best of the partial first rung kept. The
+    winner's parameters always use --max-rounds estimators, the budget train.py
+    fits with, whatever rung it was evaluated at.
+    
+    Parameters:
+    -----------
+    pool : multiprocessing.pool.Pool
+        Worker pool owned by the caller, initialized with the cached folds
+    
+    Returns:
+    --------
+    dict or None
+        Best candidate found ('params', 'rmse', 'rows', 'rounds', 'rung', 'final_rung'),
+        None if no candidate finished in time
+    """
+    n_rungs = 1
+    while args.n_candidates // args.eta ** n_rungs >= 1 and n_rungs < 10:
+        n_rungs += 1
+    
+    candidates = [sample_params(model_type, rng) for _ in range(args.n_candidates)]
+    best = None
+    
+    for rung in range(n_rungs):
+        scale = args.eta ** (rung - n_rungs + 1)
+        n_rows = int(min(n_train_rows, max(args.min_rows, n_train_rows * scale)))
+        n_rounds = int(min(args.max_rounds, max(args.min_rounds, args.max_rounds * scale)))
+        print(f"  [{model_type}] rung {rung}: {len(candidates)} candidates, {n_rows} rows, {n_rounds} rounds")
+        
+        results, complete = evaluate_rung(pool, model_type, candidates, n_rows, n_rounds, deadline)
+        if not complete:
+            # Stop the candidates that are still fitting
+            pool.terminate()
+        results.sort(key=lambda item: item[0])
+        
+        if results and (complete or best is None):
+            best = {
+                'params': {**results[0][1], 'n_estimators': args.max_rounds},
+                'rmse': results[0][0],
+                'rows': n_rows,
+                'rounds': n_rounds,
+                'rung': rung,
+                'final_rung': rung == n_rungs - 1 and complete
+            }
+            print(f"  [{model_type}] rung {rung} best RMSE: {best['rmse']:.4f} "
+                  f"({len(results)}/{len(candidates)} evaluated)")
+        elif results:
+            print(f"  [{model_type}] rung {rung} unfinished ({len(results)}/{len(candidates)} evaluated), "
+                  f"keeping the winner of rung {best['rung']}")
+        
+        if not complete or time.time() >= deadline:
+            print(f"  [{model_type}] time budget exhausted")
+            break
+        
+        candidates = [params for _, params in results[:max(1, len(results) // args.eta)]]
+    
+    return best
+
+def write_config(path, target, winners, args):
+    """Merge the winning parameters for a target into the JSON config."""
+    config = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            config = json.load(f)
+    
+    entry = config.get(target, {'params': {}, 'search': {}})
+    for model_type, best in winners.items():
+        entry['params'][model_type] = best['params']
+        entry['search'][model_type] = {
+            'cv_rmse': best['rmse'],
+            'rows': best['rows'],
+            'rounds': best['rounds'],
+            'rung': best['rung'],
+            # False if the time budget ran out before the full-budget rung finished;
+            # cv_rmse is then measured on fewer rows and rounds than train.py uses
+            'final_rung': best['final_rung'],
+            'n_candidates': args.n_candidates,
+            'eta': args.eta,
+            'input_path': args.input_path
+        }
+    config[target] = entry
+    
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+
+def main():
+    """Main function to execute the hyperparameter search."""
+    args = parse_arguments()
+    start_time = time.time()
+    deadline = start_time + args.time_budget
+    
+    try:
+        cache_path = prepare_folds(args)
+    except FileNotFoundError:
+        print(f"Error: File {args.input_path} not found")
+        return
+    
+    folds = load(cache_path, mmap_mode='r')
+    n_train_rows = min(len(fold['y_train']) for fold in folds)
+    del folds
+    
+    model_types = list(MODEL_FACTORIES) if args.model == 'all' else [args.model]
+    rng = np.random.default_rng(args.seed)
+    
+    # Split the remaining time evenly between the model factories; each gets its
+    # own pool, since a factory that runs out of time terminates its workers
+    winners = {}
+    for idx, model_type in enumerate(model_types):
+        remaining = deadline - time.time()
+        model_deadline = time.time() + remaining / (len(model_types) - idx)
+        print(f"\nTuning {model_type} for {args.target} ({remaining / (len(model_types) - idx):.0f}s budget)")
+        with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(cache_path,)) as pool:
+            best = successive_halving(model_type, args, pool, n_train_rows, model_deadline, rng)
+        if best is None:
+            print(f"  No {model_type} candidate finished within the time budget")
+            continue
+        if not best['final_rung']:
+            print(f"  {model_type} winner comes from rung {best['rung']}, below the full budget "
+                  f"({best['rows']} rows, {best['rounds']} rounds); n_estimators set to {args.max_rounds}")
+        winners[model_type] = best
+    
+    if winners:
+        write_config(args.output_path, args.target, winners, args)
+        print(f"\nWinning parameters written to {args.output_path}")
+        for model_type, best in winners.items():
+            print(f"  {model_type}: CV RMSE {best['rmse']:.4f} -> {best['params']}")
+    
+    print(f"\nSearch completed in {time.time() - start_time:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+import fnmatch
+import json
+import queue
+import signal
+import time
+import pandas as pd
+import sys
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # optional, the directory is polled without it
+    Observer = None
+    FileSystemEventHandler = object
+
+# Add parent directory to path to enable relative imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.predict import load_scorers, predict_chunked
+from preprocessing.feature_expressions import feature_set_from_columns
+from scripts.experiment_store import file_sha256
+from scripts.prediction_writers import WRITERS, OUTPUT_EXTENSIONS, parquet_available
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Score CSV files dropped into a directory as they arrive')
+    
+    parser.add_argument('--watch-dir', type=str, required=True,
+                        help='Directory to watch for input CSV files')
+    parser.add_argument('--output-dir', type=str, default='data/predictions',
+                        help='Directory to write {name}_predictions.{csv,ndjson,parquet} files to')
+    parser.add_argument('--ledger-path', type=str, default=None,
+                        help='Processed-file ledger (default: {output-dir}/processed.jsonl)')
+    parser.add_argument('--model-path', type=str, default='models/trained',
+                        help='Directory containing trained models and preprocessors')
+    parser.add_argument('--model-type', type=str, default='ensemble',
+                        choices=['xgboost', 'random_forest', 'gradient_boost', 'ensemble', 'all'],
+                        help='Type of model to use for prediction')
+    parser.add_argument('--target', type=str, default='both',
+                        choices=['offerPrice', 'closeDay1', 'both'],
+                        help='Target variable to predict')
+    parser.add_argument('--select-features', action='store_true',
+                        help='Use feature selection')
+    parser.add_argument('--multi-output', action='store_true',
+                        help='Predict both targets with the joint model (multi_output_model.joblib)')
+    parser.add_argument('--output-format', type=str, default='csv', choices=list(WRITERS),
+                        help='Format of the prediction files')
+    parser.add_argument('--id-column', type=str, default=None,
+                        help='Input column copied to the output as the first column, to join predictions back')
+    parser.add_argument('--row-number', action='store_true',
+                        help='Add the 0-based input row position as a row_number column')
+    parser.add_argument('--pattern', type=str, default='*.csv',
+                        help='Glob pattern of the file names to score')
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help='Rows scored per chunk')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes scoring the chunks of a file in parallel')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help='Seconds between directory scans (without watchdog, or as a safety net with it)')
+    parser.add_argument('--settle-seconds', type=float, default=1.0,
+                        help='A file is scored once it has not been modified for this long (still being copied)')
+    parser.add_argument('--once', action='store_true',
+                        help='Score the files already in the directory and exit')
+    parser.add_argument('--no-watchdog', action='store_true',
+                        help='Poll the directory even if watchdog is installed')
+    
+    return parser.parse_args()
+
+class ProcessedLedger:
+    """
+    Append-only record of the scored input files
+    
+    One JSON line per file version: name, SHA-256 of the content, status
+    ('completed' or 'failed'), output file and time. A file is skipped when its
+    current content is in the ledger, so a restarted daemon does not score
+    completed files again, while a file replaced with new content is scored anew.
+    Failed files are retried only when their content changes.
+    
+    Parameters:
+    -----------
+    path : str
+        Ledger file (created if missing)
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by a crash
+                        continue
+                    self.entries[(entry['name'], entry['sha256'])] = entry
+    
+    def contains(self, name, digest):
+        """Whether this content of a file was processed."""
+        return (name, digest) in self.entries
+    
+    def record(self, name, digest, status, output=None, rows=None, error=None):
+        """Append an entry and flush it to disk."""
+        entry = {'name': name, 'sha256': digest, 'status': status, 'output': output, 'rows': rows,
+                 'error': error, 'processed_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries[(name, digest)] = entry
+
+class _ChangeHandler(FileSystemEventHandler):
+    """Wakes the daemon up on any change in the watched directory."""
+    def __init__(self, events):
+        self.events = events
+    
+    def on_any_event(self, event):
+        self.events.put(event)
+
+def model_signature(model_path):
+    """Modification times of the model directory and its artifact manifests, to notice retrained models."""
+    signature = []
+    for directory in [model_path, os.path.join(model_path, 'artifacts', 'manifests')]:
+        if os.path.isdir(directory):
+            for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+                if entry.is_file():
+                    signature.append((entry.name, entry.stat().st_mtime_ns))
+    return signature
+
+def pending_files(args, ledger, seen):
+    """
+    Input files ready to score
+    
+    Returns:
+    --------
+    tuple
+        (list of (name, path, sha256) to score, seconds until the next file settles or None)
+    """
+    ready, next_check = [], None
+    now = time.time()
+    for entry in sorted(os.scandir(args.watch_dir), key=lambda entry: entry.name):
+        if not entry.is_file() or entry.name.startswith('.') or not fnmatch.fnmatch(entry.name, args.pattern):
+            continue
+        stat = entry.stat()
+        age = now - stat.st_mtime
+        if age < args.settle_seconds:
+            wait = args.settle_seconds - age
+            next_check = wait if next_check is None else min(next_check, wait)
+            continue
+        # Hash a file only once per (size, mtime)
+        key = (entry.name, stat.st_size, stat.st_mtime_ns)
+        if key not in seen:
+            seen[key] = file_sha256(entry.path)
+        if not ledger.contains(entry.name, seen[key]):
+            ready.append((entry.name, entry.path, seen[key]))
+    return ready, next_check
+
+def check_columns(state, path):
+    """
+    Compare the header of an input file with the models' input columns
+    
+    Returns:
+    --------
+    tuple
+        (model input columns the file lacks, all model input columns)
+    """
+    columns = pd.read_csv(path, nrows=0).columns
+    _, scorers, bundle, _ = state
+    if bundle is not None:
+        feature_sets = [bundle.get('feature_set') or feature_set_from_columns(bundle['feature_names'])]
+    else:
+        feature_sets = [pipeline.feature_set for pipeline, _ in scorers.values()]
+    missing, required = [], []
+    for feature_set in feature_sets:
+        # predicted_offerPrice is computed from the offerPrice predictions, not read
+        for col in feature_set.missing_inputs([], extra=['predicted_offerPrice']):
+            if col not in required:
+                required.append(col)
+        for col in feature_set.missing_inputs(columns, extra=['predicted_offerPrice']):
+            if col not in missing:
+                missing.append(col)
+    return missing, required
+
+def score_file(args, targets, state, name, path, digest, ledger):
+    """Score one input file, write its output atomically and record it in the ledger."""
+    stem = os.path.splitext(name)[0]
+    output_path = os.path.join(args.output_dir, f'{stem}_predictions{OUTPUT_EXTENSIONS[args.output_format]}')
+    # Hidden name in the output directory, so the finished file can be renamed into place
+    tmp_path = os.path.join(args.output_dir, f'.{stem}_predictions.{os.getpid()}.tmp')
+    file_args = argparse.Namespace(**vars(args))
+    file_args.input_path, file_args.output_path = path, tmp_path
+    
+    print(f"\n[{time.strftime('%H:%M:%S')}] Scoring {name}")
+    start_time = time.perf_counter()
+    try:
+        # Without any model column every row would be scored from imputed values only
+        missing, required = check_columns(state, path)
+        if len(missing) == len(required):
+            n_rows, error = None, f"input has none of the model columns ({', '.join(required[:5])}, ...)"
+        else:
+            if missing:
+                print(f"Warning: {name} lacks model columns {', '.join(missing)}; they are imputed")
+            n_rows = predict_chunked(file_args, targets, state)
+            error = None if n_rows is not None else 'no predictions were generated'
+    except Exception as e:
+        n_rows, error = None, f"{type(e).__name__}: {e}"
+    
+    if error is not None:
+        # The writer may not have created the file (e.g. the input vanished)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"Error scoring {name}: {error}")
+        ledger.record(name, digest, 'failed', error=error)
+        return
+    os.replace(tmp_path, output_path)
+    ledger.record(name, digest, 'completed', output=output_path, rows=n_rows)
+    print(f"Wrote {n_rows} predictions to {output_path} in {time.perf_counter() - start_time:.2f} s")
+
+def main():
+    """Main function of the watch-folder daemon."""
+    args = parse_arguments()
+    if not os.path.isdir(args.watch_dir):
+        print(f"Error: Watch directory '{args.watch_dir}' does not exist")
+        return
+    if not os.path.exists(args.model_path):
+        print(f"Error: Models directory '{args.model_path}' does not exist")
+        return
+    if args.output_format == 'parquet' and not parquet_available():
+        print("Error: Parquet output requires pyarrow (pip install pyarrow)")
+        return
+    os.makedirs(args.output_dir, exist_ok=True)
+    ledger = ProcessedLedger(args.ledger_path or os.path.join(args.output_dir, 'processed.jsonl'))
+    targets = ['offerPrice', 'closeDay1'] if args.target == 'both' else [args.target]
+    
+    print(f"Loading models from {args.model_path}")
+    signature = model_signature(args.model_path)
+    state = load_scorers(args, targets)
+    if state is None:
+        print("Error: No models could be loaded. Check the errors above.")
+        return
+    
+    events = queue.Queue()
+    observer = None
+    if not args.once:
+        if Observer is not None and not args.no_watchdog:
+            observer = Observer()
+            observer.schedule(_ChangeHandler(events), args.watch_dir, recursive=False)
+            observer.start()
+            print(f"Watching {args.watch_dir} for {args.pattern} (filesystem notifications)")
+        else:
+            print(f"Watching {args.watch_dir} for {args.pattern} (polling every {args.poll_interval:g} s)")
+    
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    seen = {}
+    try:
+        while not stopping:
+            ready, next_check = pending_files(args, ledger, seen)
+            for name, path, digest in ready:
+                if stopping:
+                    break
+                current = model_signature(args.model_path)
+                if current != signature:
+                    print(f"\nModels in {args.model_path} changed, reloading")
+                    reloaded = load_scorers(args, targets)
+                    if reloaded is not None:
+                        state, signature = reloaded, current
+                score_file(args, targets, state, name, path, digest, ledger)
+            if args.once:
+                if next_check is None:
+                    break
+                time.sleep(next_check)
+                continue
+            timeout = args.poll_interval if next_check is None else min(args.poll_interval, next_check)
+            try:
+                events.get(timeout=timeout)
+                # Let a burst of events (e.g. a file being written) settle into one scan
+                while True:
+                    events.get(timeout=0.1)
+            except queue.Empty:
+                pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+    print("\nStopped")
+
+if __name__ == "__main__":
+    main()